@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# backtest.py - Barrido en paralelo de pesos de confianza y umbrales de señal sobre el histórico
+
+import argparse
+import csv
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import db
+import settings_snapshot
+from config import Config
+
+logger = logging.getLogger("backtest")
+
+# Orden de los factores (y de los pesos) de ScoringSystem.compute_confidence
+FACTORS = ("trader_quality", "whale_activity", "holder_growth", "liquidity_health", "technical_factors")
+TIMEFRAMES = ("3m", "5m", "10m", "30m", "1h", "2h", "4h", "24h")
+
+def _codes(values, index):
+    """Convierte claves (bytes/str) a enteros usando y ampliando `index`."""
+    return np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64, count=len(values))
+
+def load_history(days=None, timeframe="1h"):
+    """
+    Lee el histórico una sola vez en arrays columnares: transacciones
+    ordenadas por (token, fecha), señales con su rendimiento en `timeframe`
+    y el score actual de cada wallet.
+
+    Args:
+        days: Días hacia atrás (None para todo el histórico)
+        timeframe: Ventana de signal_performance usada como retorno
+
+    Returns:
+        dict: Arrays numpy tx_*, signal_*, wallet_score
+    """
+    def since(column):
+        return f"{column} > NOW() - make_interval(days => %s)" if days else "TRUE"
+    params = (days,) if days else ()
+    with db.get_connection(db.query_routes[db.QUERY_REPORTING]) as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT wallet, token, tx_type, amount_usd, EXTRACT(EPOCH FROM created_at)
+            FROM transactions
+            WHERE {since("created_at")}
+            ORDER BY token, created_at
+        """, params)
+        transactions = cur.fetchall()
+        cur.execute(f"""
+            SELECT s.token, EXTRACT(EPOCH FROM s.created_at), s.market_cap, s.volume, p.percent_change
+            FROM signals s
+            JOIN signal_performance p ON p.signal_id = s.id AND p.timeframe = %s
+            WHERE {since("s.created_at")}
+            ORDER BY s.created_at
+        """, (timeframe,) + params)
+        signals = cur.fetchall()
+        cur.execute("SELECT wallet, score FROM wallet_scores")
+        wallet_scores = cur.fetchall()
+        conn.rollback()
+
+    # Las direcciones de transactions/wallet_scores son BYTEA; las de signals, texto base58
+    tokens, wallets = {}, {}
+    wallet_code = _codes([bytes(row[0]) for row in transactions], wallets)
+    token_code = _codes([bytes(row[1]) for row in transactions], tokens)
+    signal_token = _codes([db.encode_address(row[0]) for row in signals], tokens)
+    score_wallet = _codes([bytes(row[0]) for row in wallet_scores], wallets)
+
+    wallet_score = np.full(len(wallets), settings_snapshot.get().default_score)
+    wallet_score[score_wallet] = [float(row[1]) for row in wallet_scores]
+    return {
+        "tx_wallet": wallet_code,
+        "tx_token": token_code,
+        "tx_buy": np.array([row[2] == "BUY" for row in transactions], dtype=bool),
+        "tx_amount": np.array([float(row[3] or 0) for row in transactions]),
+        "tx_time": np.array([float(row[4]) for row in transactions]),
+        "signal_token": signal_token,
+        "signal_time": np.array([float(row[1]) for row in signals]),
+        "signal_market_cap": np.array([float(row[2] or 0) for row in signals]),
+        "signal_volume": np.array([float(row[3] or 0) for row in signals]),
+        "signal_return": np.array([float(row[4]) for row in signals]),
+        "wallet_score": wallet_score,
+    }
+
+def build_factors(history, window, whale_threshold):
+    """
+    Calcula una vez los cinco factores de compute_confidence para cada señal
+    a partir de las transacciones del token en los `window` segundos previos
+    (y la ventana anterior como referencia de crecimiento).
+
+    No hay histórico de holders ni de scores, así que se usan aproximaciones:
+    el crecimiento de holders es el de compradores distintos entre ventanas y
+    la calidad de traders usa el score actual de cada wallet.
+
+    Returns:
+        tuple: (factores n x 5, traders distintos por señal)
+    """
+    tx_token, tx_time = history["tx_token"], history["tx_time"]
+    n = len(history["signal_time"])
+    factors = np.zeros((n, len(FACTORS)))
+    trader_count = np.zeros(n, dtype=np.int64)
+    # Transacciones ordenadas por (token, fecha): cada token es un tramo contiguo
+    token_bounds = np.searchsorted(tx_token, np.arange(tx_token.max() + 2)) if len(tx_token) else None
+    quality = np.minimum(history["wallet_score"] / 10, 1.0) ** 1.5
+
+    for i in range(n):
+        token, ts = history["signal_token"][i], history["signal_time"][i]
+        if token_bounds is None or token + 1 >= len(token_bounds):
+            lo = hi = 0  # Token sin transacciones: sólo cuenta el factor de liquidez
+        else:
+            lo, hi = token_bounds[token], token_bounds[token + 1]
+        times = tx_time[lo:hi]
+        start, prev_start, end = np.searchsorted(times, [ts - window, ts - 2 * window, ts], side="right") + lo
+        current, previous = slice(start, end), slice(prev_start, start)
+
+        buyers = np.unique(history["tx_wallet"][current][history["tx_buy"][current]])
+        previous_buyers = np.unique(history["tx_wallet"][previous][history["tx_buy"][previous]])
+        trader_count[i] = len(buyers)
+        amounts, previous_amounts = history["tx_amount"][current], history["tx_amount"][previous]
+
+        trader_quality = quality[buyers].mean() if len(buyers) else 0.0
+        whale_factor = 1.0 if (amounts >= whale_threshold).any() else 0.0
+        holder_growth = (len(buyers) - len(previous_buyers)) / max(len(previous_buyers), 1) * 100
+        holder_factor = min(max(holder_growth / 100.0, 0), 1)
+
+        market_cap = history["signal_market_cap"][i]
+        if market_cap <= 0:
+            liquidity_factor = 0.5
+        else:
+            liquidity_factor = max(0, min(1, 1 - (market_cap / 100_000_000)))
+            volume_1h = history["signal_volume"][i] / 24
+            if volume_1h > 0 and volume_1h / max(market_cap, 1) > 0.1:
+                liquidity_factor *= 0.8
+
+        volume, previous_volume = amounts.sum(), previous_amounts.sum()
+        volume_growth = (volume - previous_volume) / previous_volume if previous_volume > 0 else 0.0
+        volume_acceleration = len(amounts) / max(len(previous_amounts), 1)
+        technical_factor = (min(max(volume_growth, 0), 3) / 3) * 0.7 + min(volume_acceleration / 10.0, 1) * 0.3
+
+        factors[i] = (trader_quality, whale_factor, holder_factor, liquidity_factor, technical_factor)
+    return factors, trader_count
+
+def confidence(factors, weights):
+    """
+    Confianza de cada señal (filas) para cada juego de pesos (columnas), con
+    la misma sigmoide, recorte y redondeo que ScoringSystem.compute_confidence.
+    """
+    composite = factors @ np.atleast_2d(weights).T
+    normalized = 1 / (1 + np.exp(-8 * (composite - 0.5)))
+    return np.round(np.clip(normalized, 0.1, 0.95), 3)
+
+def weight_grid(steps):
+    """Combinaciones de pesos normalizadas a suma 1, sin duplicados."""
+    seen = set()
+    grid = []
+    for combo in itertools.product(steps, repeat=len(FACTORS)):
+        total = sum(combo)
+        if total <= 0:
+            continue
+        weights = tuple(round(w / total, 6) for w in combo)
+        if weights not in seen:
+            seen.add(weights)
+            grid.append(weights)
+    return np.array(grid)
+
+_shared = {}
+
+def _init_worker(factors, trader_count, returns):
+    # Cada proceso recibe los arrays una sola vez al arrancar
+    _shared.update(factors=factors, trader_count=trader_count, returns=returns)
+
+def _evaluate_chunk(task):
+    """
+    Evalúa un bloque de juegos de pesos contra todos los umbrales.
+
+    Returns:
+        list: (pesos, umbral de confianza, mínimo de traders, señales, aciertos, retorno acumulado)
+    """
+    weights, thresholds, min_traders = task
+    returns = _shared["returns"]
+    wins = returns > 0
+    conf = confidence(_shared["factors"], weights)  # señales x pesos
+    eligible = {traders: _shared["trader_count"] >= traders for traders in min_traders}
+    rows = []
+    for j, w in enumerate(weights):
+        for traders in min_traders:
+            selected = (conf[:, j][None, :] >= thresholds[:, None]) & eligible[traders]  # umbrales x señales
+            counts = selected.sum(axis=1)
+            hits = (selected & wins).sum(axis=1)
+            totals = selected @ returns
+            for t, threshold in enumerate(thresholds):
+                rows.append((tuple(float(x) for x in w), float(threshold), traders, int(counts[t]), int(hits[t]), float(totals[t])))
+    return rows
+
+def run_sweep(factors, trader_count, returns, weights, thresholds, min_traders, workers=None, chunk_size=256):
+    """
+    Reparte la rejilla de pesos en bloques entre un pool de procesos.
+
+    Returns:
+        list: Dicts con weights, threshold, min_traders, signals, hit_rate, avg_return, total_return
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    tasks = [(weights[i:i + chunk_size], thresholds, min_traders) for i in range(0, len(weights), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(factors, trader_count, returns)) as executor:
+        for rows in executor.map(_evaluate_chunk, tasks):
+            for w, threshold, traders, count, hits, total in rows:
+                results.append({
+                    "weights": w,
+                    "threshold": threshold,
+                    "min_traders": traders,
+                    "signals": count,
+                    "hit_rate": hits / count if count else 0.0,
+                    "avg_return": total / count if count else 0.0,
+                    "total_return": total,
+                })
+    return results
+
+def _floats(value):
+    return [float(v) for v in value.split(",") if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Barrido de pesos de confianza y umbrales de señal sobre el histórico")
+    parser.add_argument("--days", type=int, default=None, help="Días de histórico (por defecto todo)")
+    parser.add_argument("--timeframe", choices=TIMEFRAMES, default="1h", help="Rendimiento de signal_performance a evaluar")
+    parser.add_argument("--window", type=float, default=float(Config.SIGNAL_WINDOW_SECONDS),
+                        help="Segundos de transacciones previas a cada señal")
+    parser.add_argument("--weight-steps", type=_floats, default=[0, 0.1, 0.2, 0.3, 0.4, 0.5],
+                        help="Valores por peso antes de normalizar (separados por comas)")
+    parser.add_argument("--thresholds", type=_floats, default=[0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--min-traders", type=lambda v: [int(x) for x in _floats(v)], default=[1, 2, 3])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--min-signals", type=int, default=20, help="Señales mínimas para aparecer en el ranking")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", choices=("avg_return", "hit_rate", "total_return"), default="avg_return")
+    parser.add_argument("--csv", help="Guarda todas las combinaciones en este archivo")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    history = load_history(args.days, args.timeframe)
+    settings = settings_snapshot.get()
+    factors, trader_count = build_factors(history, args.window, settings.whale_transaction_threshold)
+    returns = history["signal_return"]
+    print(f"Histórico: {len(history['tx_time'])} transacciones, {len(returns)} señales con rendimiento "
+          f"{args.timeframe} ({time.perf_counter() - start:.1f}s)")
+    if not len(returns):
+        return
+
+    current = (settings.trader_quality_weight, settings.whale_activity_weight, settings.holder_growth_weight,
+               settings.liquidity_health_weight, settings.technical_factors_weight)
+    weights = np.vstack([current, weight_grid(args.weight_steps)])
+    start = time.perf_counter()
+    results = run_sweep(factors, trader_count, returns, weights, args.thresholds, args.min_traders,
+                        args.workers, args.chunk_size)
+    print(f"{len(results)} combinaciones evaluadas en {time.perf_counter() - start:.1f}s "
+          f"({len(weights)} juegos de pesos x {len(args.thresholds)} umbrales x {len(args.min_traders)} mínimos de traders)")
+
+    baseline = [r for r in results[:len(args.thresholds) * len(args.min_traders)]
+                if r["threshold"] == float(Config.MIN_CONFIDENCE_THRESHOLD)
+                and r["min_traders"] == int(Config.MIN_TRADERS_FOR_SIGNAL)]
+    header = f"{'pesos (' + '/'.join(f[:5] for f in FACTORS) + ')':<44} {'umbral':>6} {'trad':>4} {'señales':>7} {'acierto':>8} {'ret. medio':>10}"
+    print(header)
+
+    def show(r):
+        weights_text = "/".join(f"{w:.2f}" for w in r["weights"])
+        print(f"{weights_text:<44} {r['threshold']:>6.2f} {r['min_traders']:>4} {r['signals']:>7} "
+              f"{r['hit_rate'] * 100:>7.1f}% {r['avg_return']:>9.2f}%")
+
+    for r in baseline:
+        print("actual:")
+        show(r)
+    ranked = sorted((r for r in results if r["signals"] >= args.min_signals), key=lambda r: r[args.sort], reverse=True)
+    print(f"mejores por {args.sort} (mínimo {args.min_signals} señales):")
+    for r in ranked[:args.top]:
+        show(r)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(FACTORS) + ["threshold", "min_traders", "signals", "hit_rate", "avg_return", "total_return"])
+            for r in results:
+                writer.writerow(list(r["weights"]) + [r["threshold"], r["min_traders"], r["signals"],
+                                                      r["hit_rate"], r["avg_return"], r["total_return"]])
+        print(f"Resultados guardados en {args.csv}")
+
+if __name__ == "__main__":
+    main()
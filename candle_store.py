@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# candle_store.py - Velas OHLCV por token (1m/5m/1h) en ring buffers de numpy, actualizadas incrementalmente
+
+import time
+import logging
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger("candle_store")
+
+# Columnas de cada vela
+OPEN, HIGH, LOW, CLOSE, VOLUME, BUY_VOLUME, TRADES, MARKET_VOLUME_1H = range(8)
+N_FIELDS = 8
+
+# (nombre, segundos por vela, velas guardadas): 2h en 1m, 12h en 5m, 3 días en 1h
+RESOLUTIONS = (("1m", 60, 120), ("5m", 300, 144), ("1h", 3600, 72))
+
+class CandleSeries:
+    """
+    Serie de velas de una resolución en un ring buffer de tamaño fijo.
+
+    La vela actual está en `head`; al avanzar el tiempo se rellenan las velas
+    intermedias sin actividad con el último cierre y volumen 0, de modo que
+    la posición en el buffer siempre corresponde a un intervalo de tiempo.
+    MARKET_VOLUME_1H guarda el último volumen 1h reportado por DexScreener
+    en esa vela (NaN si no hubo snapshot).
+    """
+
+    def __init__(self, period, capacity):
+        self.period = period
+        self.capacity = capacity
+        self.data = np.full((capacity, N_FIELDS), np.nan)
+        self.head = 0
+        self.size = 0
+        self.current_start = None
+
+    def _new_candle_row(self, price):
+        return (price, price, price, price, 0.0, 0.0, 0.0, np.nan)
+
+    def _advance(self, bucket):
+        """Avanza la vela actual hasta `bucket`, rellenando huecos."""
+        if self.current_start is None:
+            self.current_start = bucket
+            self.data[self.head] = self._new_candle_row(np.nan)
+            self.size = 1
+            return
+        steps = (bucket - self.current_start) // self.period
+        if steps <= 0:
+            return
+        last_close = self.data[self.head, CLOSE]
+        if steps >= self.capacity:
+            self.data[:] = self._new_candle_row(last_close)
+            self.head = 0
+            self.size = self.capacity
+        else:
+            idx = (self.head + np.arange(1, steps + 1)) % self.capacity
+            self.data[idx] = self._new_candle_row(last_close)
+            self.head = int(idx[-1])
+            self.size = min(self.capacity, self.size + steps)
+        self.current_start = bucket
+
+    def _row_for(self, ts):
+        """Índice de la vela que contiene `ts` (None si es anterior al buffer)."""
+        bucket = int(ts) - int(ts) % self.period
+        if self.current_start is None or bucket >= self.current_start:
+            self._advance(bucket)
+            return self.head
+        back = (self.current_start - bucket) // self.period
+        if back >= self.size:
+            return None
+        return (self.head - back) % self.capacity
+
+    def _apply_price(self, row, price):
+        candle = self.data[row]
+        if np.isnan(candle[OPEN]):
+            candle[OPEN] = candle[HIGH] = candle[LOW] = price
+        else:
+            candle[HIGH] = max(candle[HIGH], price)
+            candle[LOW] = min(candle[LOW], price)
+        candle[CLOSE] = price
+
+    def update_price(self, ts, price):
+        row = self._row_for(ts)
+        if row is not None and price > 0:
+            self._apply_price(row, price)
+
+    def add_trade(self, ts, amount_usd, is_buy, price=None):
+        row = self._row_for(ts)
+        if row is None:
+            return
+        candle = self.data[row]
+        candle[VOLUME] += amount_usd
+        candle[TRADES] += 1
+        if is_buy:
+            candle[BUY_VOLUME] += amount_usd
+        if price:
+            self._apply_price(row, price)
+
+    def set_market_volume(self, ts, volume_1h):
+        row = self._row_for(ts)
+        if row is not None:
+            self.data[row, MARKET_VOLUME_1H] = volume_1h
+
+    def window(self, n, now=None):
+        """Últimas `n` velas (o menos si no hay tantas) en orden cronológico."""
+        if now is not None and self.current_start is not None:
+            self._advance(int(now) - int(now) % self.period)
+        n = min(n, self.size)
+        if n == 0:
+            return self.data[:0]
+        idx = (self.head - np.arange(n - 1, -1, -1)) % self.capacity
+        return self.data[idx]
+
+class CandleStore:
+    """
+    Velas por token y resolución, alimentadas por snapshots de mercado y por
+    cada trade observado. Acotado a max_tokens (se expulsa el token usado
+    hace más tiempo).
+    """
+
+    def __init__(self, max_tokens=1000):
+        self.max_tokens = max_tokens
+        self.tokens = OrderedDict()  # token -> {resolución: CandleSeries}
+
+    def _series(self, token):
+        series = self.tokens.get(token)
+        if series is None:
+            series = self.tokens[token] = {
+                name: CandleSeries(period, capacity) for name, period, capacity in RESOLUTIONS
+            }
+            if len(self.tokens) > self.max_tokens:
+                self.tokens.popitem(last=False)
+        else:
+            self.tokens.move_to_end(token)
+        return series
+
+    def record_snapshot(self, token, market_data, ts=None):
+        """Registra un snapshot de DexScreener (precio y volumen 1h reportado)."""
+        if not market_data:
+            return
+        ts = ts or time.time()
+        price = market_data.get("price") or 0
+        volume_1h = market_data.get("volume") or 0
+        for candles in self._series(token).values():
+            if price > 0:
+                candles.update_price(ts, price)
+            if volume_1h > 0:
+                candles.set_market_volume(ts, volume_1h)
+
+    def record_trade(self, token, amount_usd, tx_type, ts=None, price=None):
+        """Registra un trade observado de una wallet seguida."""
+        ts = ts or time.time()
+        is_buy = str(tx_type).upper() == "BUY"
+        for candles in self._series(token).values():
+            candles.add_trade(ts, amount_usd, is_buy, price)
+
+    def get_candles(self, token, resolution="5m", n=12, now=None):
+        """Matriz (n, N_FIELDS) de las últimas velas, o None si el token no tiene historial."""
+        series = self.tokens.get(token)
+        if series is None:
+            return None
+        return series[resolution].window(n, now)
+
+    def get_features(self, token, now=None):
+        """
+        Features de volumen a partir de las velas de 5m, sin red ni BD.
+
+        - volume_acceleration: volumen de la última vela de 5m frente a la media
+          de las 11 anteriores (volumen de trades observados).
+        - recent_volume_growth: crecimiento del volumen 1h reportado por
+          DexScreener respecto a hace una hora; si no hay snapshots
+          suficientes, volumen de trades de la última hora frente a la anterior.
+
+        Returns:
+            dict: volume_acceleration, recent_volume_growth, trades_1h, buy_ratio_1h
+        """
+        features = {"volume_acceleration": 0.0, "recent_volume_growth": 0.0, "trades_1h": 0, "buy_ratio_1h": 0.0}
+        series = self.tokens.get(token)
+        if series is None:
+            return features
+        now = now or time.time()
+        candles = series["5m"].window(24, now)
+        last_hour = candles[-12:]
+
+        volumes = candles[:, VOLUME]
+        if len(volumes) > 1:
+            baseline = np.mean(volumes[-12:-1])
+            if baseline > 0:
+                features["volume_acceleration"] = float(volumes[-1] / baseline)
+
+        gauge = candles[:, MARKET_VOLUME_1H]
+        current = gauge[-12:][~np.isnan(gauge[-12:])]
+        previous = gauge[:-12][~np.isnan(gauge[:-12])]
+        if len(current) and len(previous) and previous[-1] > 0:
+            features["recent_volume_growth"] = float(current[-1] / previous[-1] - 1)
+        elif len(volumes) > 12 and volumes[:-12].sum() > 0:
+            features["recent_volume_growth"] = float(volumes[-12:].sum() / volumes[:-12].sum() - 1)
+
+        hour_volume = last_hour[:, VOLUME].sum()
+        features["trades_1h"] = int(last_hour[:, TRADES].sum())
+        if hour_volume > 0:
+            features["buy_ratio_1h"] = float(last_hour[:, BUY_VOLUME].sum() / hour_volume)
+        return features
@@ -16,6 +16,8 @@ class Config:
     # Configuración para DexScreener
     DEXSCREENER_BASE_URL = os.environ.get("DEXSCREENER_BASE_URL", "https://api.dexscreener.com")
     DEXSCREENER_API_KEY = os.environ.get("DEXSCREENER_API_KEY", "")
+    DEXSCREENER_RATE_LIMIT = os.environ.get("DEXSCREENER_RATE_LIMIT", "300")
+    DEXSCREENER_RATE_BURST = os.environ.get("DEXSCREENER_RATE_BURST", "10")
     
     # Parámetros de transacción y umbrales
     MIN_TRANSACTION_USD = os.environ.get("MIN_TRANSACTION_USD", "200")
@@ -24,10 +26,54 @@ class Config:
     MIN_CONFIDENCE_THRESHOLD = os.environ.get("MIN_CONFIDENCE_THRESHOLD", "0.3")
     MCAP_THRESHOLD = os.environ.get("MCAP_THRESHOLD", "100000")
     VOLUME_THRESHOLD = os.environ.get("VOLUME_THRESHOLD", "200000")
+    BLOCKED_TOKENS = os.environ.get("BLOCKED_TOKENS", "")
+    FAILED_TOKEN_RECHECK_SECONDS = os.environ.get("FAILED_TOKEN_RECHECK_SECONDS", "600")
     
     # Configuración de caché
     HELIUS_CACHE_DURATION = os.environ.get("HELIUS_CACHE_DURATION", "300")
     DEXSCREENER_CACHE_DURATION = os.environ.get("DEXSCREENER_CACHE_DURATION", "300")
+    DEXSCREENER_CACHE_FRESH_TTL = os.environ.get("DEXSCREENER_CACHE_FRESH_TTL", "60")
+    DEXSCREENER_CACHE_STALE_TTL = os.environ.get("DEXSCREENER_CACHE_STALE_TTL", "900")
+    DEXSCREENER_CACHE_MAX_ENTRIES = os.environ.get("DEXSCREENER_CACHE_MAX_ENTRIES", "5000")
+    MARKET_CACHE_SNAPSHOT_PATH = os.environ.get("MARKET_CACHE_SNAPSHOT_PATH", "market_cache.json")
+    MARKET_CACHE_SNAPSHOT_INTERVAL = os.environ.get("MARKET_CACHE_SNAPSHOT_INTERVAL", "60")
+    
+    # Pool HTTP compartido
+    HTTP_POOL_LIMIT = os.environ.get("HTTP_POOL_LIMIT", "50")
+    HTTP_POOL_LIMIT_PER_HOST = os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "10")
+    HTTP_KEEPALIVE_TIMEOUT = os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "60")
+    HTTP_DNS_CACHE_TTL = os.environ.get("HTTP_DNS_CACHE_TTL", "300")
+    HTTP_TIMEOUT = os.environ.get("HTTP_TIMEOUT", "15")
+    
+    # Refresco de watchlist
+    WATCHLIST_MAX_CONCURRENCY = os.environ.get("WATCHLIST_MAX_CONCURRENCY", "8")
+    WATCHLIST_MIN_INTERVAL = os.environ.get("WATCHLIST_MIN_INTERVAL", "60")
+    WATCHLIST_MAX_INTERVAL = os.environ.get("WATCHLIST_MAX_INTERVAL", "600")
+    
+    # Historial de velas por token
+    CANDLE_STORE_MAX_TOKENS = os.environ.get("CANDLE_STORE_MAX_TOKENS", "1000")
+    
+    # Indicadores técnicos vectorizados (un tick para todos los tokens vigilados)
+    INDICATOR_TICK_SECONDS = os.environ.get("INDICATOR_TICK_SECONDS", "60")
+    INDICATOR_WINDOW = os.environ.get("INDICATOR_WINDOW", "60")
+    
+    # Estimación de liquidez y slippage por token
+    LIQUIDITY_CACHE_TTL = os.environ.get("LIQUIDITY_CACHE_TTL", "300")
+    LIQUIDITY_FLUSH_INTERVAL = os.environ.get("LIQUIDITY_FLUSH_INTERVAL", "60")
+    
+    # Sondeo de tokens en tendencia
+    TRENDING_POLL_INTERVAL = os.environ.get("TRENDING_POLL_INTERVAL", "300")
+    TRENDING_TTL_HOURS = os.environ.get("TRENDING_TTL_HOURS", "6")
+    
+    # Features por token para el scoring
+    FEATURE_STORE_REFRESH_SECONDS = os.environ.get("FEATURE_STORE_REFRESH_SECONDS", "300")
+    SCORE_BATCH_WINDOW = os.environ.get("SCORE_BATCH_WINDOW", "0.05")
+    
+    # Ledger de posiciones FIFO: segundos entre escrituras de operaciones cerradas
+    POSITION_LEDGER_FLUSH_INTERVAL = os.environ.get("POSITION_LEDGER_FLUSH_INTERVAL", "30")
+    
+    # Segundos entre comprobaciones de cambios en bot_settings
+    SETTINGS_POLL_INTERVAL = os.environ.get("SETTINGS_POLL_INTERVAL", "30")
     
     # Configuración de salud de fuentes
     SOURCE_HEALTH_CHECK_INTERVAL = os.environ.get("SOURCE_HEALTH_CHECK_INTERVAL", "60")
@@ -36,6 +82,11 @@ class Config:
     
     # Configuración de base de datos
     DATABASE_PATH = os.environ.get("DATABASE_PATH", "")
+    DATABASE_READ_PATH = os.environ.get("DATABASE_READ_PATH", "")
+    DB_QUERY_ROUTES = os.environ.get("DB_QUERY_ROUTES", "")
+    SPILL_JOURNAL_DIR = os.environ.get("SPILL_JOURNAL_DIR", "spill_journal")
+    SPILL_JOURNAL_FSYNC_INTERVAL = os.environ.get("SPILL_JOURNAL_FSYNC_INTERVAL", "0.2")
+    SPILL_JOURNAL_REPLAY_INTERVAL = os.environ.get("SPILL_JOURNAL_REPLAY_INTERVAL", "5")
     
     # Configuración de logging
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
@@ -142,6 +193,11 @@ class Config:
             except Exception as e:
                 logger = logging.getLogger("config")
                 logger.warning(f"Error actualizando ajuste en BD: {e}")
+            
+            # Publicar un snapshot nuevo para los caminos calientes (sin leer la BD:
+            # SettingsWatcher recarga el resto al detectar la nueva versión)
+            import settings_snapshot
+            settings_snapshot.apply(key, value)
                 
             logger = logging.getLogger("config")
             logger.info(f"Actualizado ajuste {key} = {value}")
@@ -10,9 +10,11 @@ import logging
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from config import Config
+from spill_journal import SpillJournal
 import threading
 import random
 import json
+from functools import lru_cache
 
 logger = logging.getLogger("database")
 handler = logging.StreamHandler()
@@ -21,15 +23,114 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
-# Pool de conexiones y variables para la caché de consultas
+# Pools de conexiones (primario para escrituras y lecturas críticas, réplica
+# de sólo lectura para consultas analíticas) y variables para la caché de consultas
+PRIMARY = "primary"
+REPLICA = "replica"
 pool = None
+read_pool = None
 pool_lock = threading.Lock()
 
+# Clases de consulta y destino por defecto. Se pueden sobreescribir con
+# DB_QUERY_ROUTES ("analytics=primary,reporting=replica") o set_query_route()
+QUERY_HOT = "hot"
+QUERY_ANALYTICS = "analytics"
+QUERY_REPORTING = "reporting"
+query_routes = {
+    QUERY_HOT: PRIMARY,
+    QUERY_ANALYTICS: REPLICA,
+    QUERY_REPORTING: REPLICA
+}
+for route in filter(None, Config.DB_QUERY_ROUTES.split(",")):
+    route_class, _, route_target = route.partition("=")
+    query_routes[route_class.strip()] = route_target.strip()
+
 query_cache = {}
 query_cache_timestamp = {}
 query_cache_hits = 0
 query_cache_misses = 0
 
+# Journal local para escrituras mientras la BD no está disponible
+spill_journal = None
+spill_journal_lock = threading.Lock()
+
+# Codificación compacta de direcciones (base58 <-> BYTEA de 32 bytes)
+B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+B58_INDEX = {char: index for index, char in enumerate(B58_ALPHABET)}
+ADDRESS_BYTES = 32
+
+@lru_cache(maxsize=65536)
+def _encode_address_text(address):
+    num = 0
+    for char in address:
+        digit = B58_INDEX.get(char)
+        if digit is None:
+            break
+        num = num * 58 + digit
+    else:
+        leading_zeros = len(address) - len(address.lstrip("1"))
+        raw = b"\x00" * leading_zeros + (num.to_bytes((num.bit_length() + 7) // 8, "big") if num else b"")
+        if len(raw) == ADDRESS_BYTES:
+            return raw
+    # Valores que no son pubkeys ("native", etc.) se guardan como texto prefijado
+    # con NUL, asegurando que nunca midan 32 bytes
+    raw = b"\x00" + address.encode("utf-8")
+    if len(raw) == ADDRESS_BYTES:
+        raw = b"\x00" + raw
+    return raw
+
+@lru_cache(maxsize=65536)
+def _decode_address_bytes(raw):
+    if len(raw) != ADDRESS_BYTES:
+        return raw.lstrip(b"\x00").decode("utf-8")
+    num = int.from_bytes(raw, "big")
+    chars = []
+    while num > 0:
+        num, rem = divmod(num, 58)
+        chars.append(B58_ALPHABET[rem])
+    leading_zeros = len(raw) - len(raw.lstrip(b"\x00"))
+    return "1" * leading_zeros + "".join(reversed(chars))
+
+def encode_address(address):
+    """
+    Convierte una dirección base58 de Solana a su forma binaria de 32 bytes
+    para las columnas BYTEA.
+    
+    Args:
+        address: Dirección base58 (o valor ya codificado)
+        
+    Returns:
+        bytes: Representación compacta, o None si address es None
+    """
+    if address is None:
+        return None
+    if isinstance(address, (bytes, bytearray, memoryview)):
+        return bytes(address)
+    return _encode_address_text(str(address))
+
+def decode_address(raw):
+    """
+    Convierte el valor BYTEA leído de la base de datos a la dirección base58.
+    
+    Args:
+        raw: Valor binario (bytes o memoryview)
+        
+    Returns:
+        str: Dirección base58, o None si raw es None
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return raw
+    return _decode_address_bytes(bytes(raw))
+
+def _decode_row(row):
+    # Las únicas columnas BYTEA del schema son direcciones
+    return {
+        key: decode_address(value) if isinstance(value, (memoryview, bytes)) else value
+        for key, value in row.items()
+    }
+
 def init_db_pool(min_conn=1, max_conn=10):
     global pool
     with pool_lock:
@@ -37,31 +138,75 @@ def init_db_pool(min_conn=1, max_conn=10):
             db_url = Config.DATABASE_PATH
             if not db_url:
                 raise ValueError("DATABASE_PATH no está configurado")
-            pool = psycopg2.pool.SimpleConnectionPool(min_conn, max_conn, db_url)
+            pool = psycopg2.pool.ThreadedConnectionPool(min_conn, max_conn, db_url)
             logger.info(f"✅ Pool de conexiones a base de datos inicializado (min={min_conn}, max={max_conn})")
 
-@contextmanager
-def get_connection():
-    global pool
+def init_read_pool(min_conn=1, max_conn=5):
+    global read_pool
+    with pool_lock:
+        if read_pool is None:
+            # Sin réplica configurada se usa el mismo servidor con un pool propio
+            db_url = Config.DATABASE_READ_PATH or Config.DATABASE_PATH
+            if not db_url:
+                raise ValueError("DATABASE_PATH no está configurado")
+            read_pool = psycopg2.pool.ThreadedConnectionPool(
+                min_conn, max_conn, db_url,
+                options="-c default_transaction_read_only=on"
+            )
+            source = "réplica" if Config.DATABASE_READ_PATH else "primario"
+            logger.info(f"✅ Pool de lectura inicializado sobre {source} (min={min_conn}, max={max_conn})")
+
+def _get_pool(target):
+    if target == REPLICA:
+        if read_pool is None:
+            init_read_pool()
+        return read_pool
     if pool is None:
         init_db_pool()
+    return pool
+
+def set_query_route(query_class, target):
+    """
+    Cambia el destino (PRIMARY o REPLICA) de una clase de consulta.
+    
+    Args:
+        query_class: QUERY_HOT, QUERY_ANALYTICS o QUERY_REPORTING
+        target: PRIMARY o REPLICA
+    """
+    if target not in (PRIMARY, REPLICA):
+        raise ValueError(f"Destino de consulta no válido: {target}")
+    query_routes[query_class] = target
+    logger.info(f"Consultas '{query_class}' enrutadas a {target}")
+
+# Errores con los que una escritura se desvía al journal local: cualquier
+# error de psycopg2 (incluido el pool agotado o cerrado)
+SPILL_ERRORS = (psycopg2.Error, psycopg2.pool.PoolError)
+
+# Resultado de save_transaction cuando la escritura quedó en el journal local
+# sin que la BD haya podido comprobar si el evento ya existía
+TX_SPILLED = "spilled"
+
+@contextmanager
+def get_connection(target=PRIMARY):
+    conn_pool = _get_pool(target)
     conn = None
     try:
-        conn = pool.getconn()
+        conn = conn_pool.getconn()
         yield conn
-    except psycopg2.OperationalError as e:
-        logger.error(f"Error de conexión: {e}. Intentando reconectar...")
-        if conn:
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        # La conexión puede estar rota: se cierra en lugar de devolverla al
+        # pool y el error llega al llamador (reintento o journal local)
+        logger.error(f"Error de conexión: {e}. Se descarta la conexión")
+        if conn is not None:
             try:
-                pool.putconn(conn, close=True)
+                conn_pool.putconn(conn, close=True)
             except Exception:
                 pass
-        init_db_pool()
-        conn = pool.getconn()
-        yield conn
+            conn = None
+        raise
     finally:
         if conn is not None:
-            pool.putconn(conn)
+            conn_pool.putconn(conn)
 
 def retry_db_operation(max_attempts=3, delay=1, backoff_factor=2):
     def decorator(func):
@@ -89,7 +234,7 @@ def retry_db_operation(max_attempts=3, delay=1, backoff_factor=2):
     return decorator
 
 @retry_db_operation()
-def execute_cached_query(query, params=None, max_age=60, write_query=False):
+def execute_cached_query(query, params=None, max_age=60, write_query=False, query_class=QUERY_HOT):
     global query_cache, query_cache_timestamp, query_cache_hits, query_cache_misses
     if write_query:
         with get_connection() as conn:
@@ -105,14 +250,28 @@ def execute_cached_query(query, params=None, max_age=60, write_query=False):
             query_cache_hits += 1
             return query_cache[cache_key]
     query_cache_misses += 1
-    with get_connection() as conn:
+    with get_connection(query_routes.get(query_class, PRIMARY)) as conn:
         cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
         cur.execute(query, params or ())
-        results = [dict(row) for row in cur.fetchall()]
+        results = [_decode_row(row) for row in cur.fetchall()]
         query_cache[cache_key] = results
         query_cache_timestamp[cache_key] = now
         return results
 
+WALLET_PROFIT_STATS_REBUILD_QUERY = """
+    INSERT INTO wallet_profit_stats
+        (wallet, trade_count, win_count, profit_sum, profit_max, hold_time_sum, updated_at)
+    SELECT wallet,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE profit_percent > 0),
+           COALESCE(SUM(profit_percent), 0),
+           MAX(profit_percent),
+           COALESCE(SUM(hold_time_hours), 0),
+           NOW()
+    FROM wallet_profits
+    GROUP BY wallet
+"""
+
 @retry_db_operation()
 def init_db():
     try:
@@ -354,6 +513,249 @@ def init_db():
                     logger.error(f"Error en migración #3: {e}")
                     return False
 
+            if current_version < 4:
+                try:
+                    logger.info("Aplicando migración #4: Direcciones binarias y numéricos de precisión fija")
+                    # Misma codificación que encode_address(): pubkeys válidas -> 32 bytes,
+                    # cualquier otro valor -> texto prefijado con NUL (nunca 32 bytes)
+                    cur.execute("""
+                        CREATE OR REPLACE FUNCTION b58_to_bytea(addr TEXT) RETURNS BYTEA AS $$
+                        DECLARE
+                            alphabet CONSTANT TEXT := '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz';
+                            num NUMERIC := 0;
+                            digit INTEGER;
+                            raw BYTEA := ''::BYTEA;
+                            i INTEGER;
+                        BEGIN
+                            IF addr IS NULL THEN
+                                RETURN NULL;
+                            END IF;
+                            FOR i IN 1..length(addr) LOOP
+                                digit := strpos(alphabet, substr(addr, i, 1)) - 1;
+                                IF digit < 0 THEN
+                                    num := -1;
+                                    EXIT;
+                                END IF;
+                                num := num * 58 + digit;
+                            END LOOP;
+                            IF num >= 0 THEN
+                                WHILE num > 0 LOOP
+                                    raw := set_byte('\\x00'::BYTEA, 0, mod(num, 256)::INTEGER) || raw;
+                                    num := div(num, 256);
+                                END LOOP;
+                                i := 1;
+                                WHILE substr(addr, i, 1) = '1' LOOP
+                                    raw := '\\x00'::BYTEA || raw;
+                                    i := i + 1;
+                                END LOOP;
+                                IF length(raw) = 32 THEN
+                                    RETURN raw;
+                                END IF;
+                            END IF;
+                            raw := '\\x00'::BYTEA || convert_to(addr, 'UTF8');
+                            IF length(raw) = 32 THEN
+                                raw := '\\x00'::BYTEA || raw;
+                            END IF;
+                            RETURN raw;
+                        END;
+                        $$ LANGUAGE plpgsql IMMUTABLE STRICT
+                    """)
+                    compact_columns = {
+                        "transactions": {
+                            "addresses": ["wallet", "token"],
+                            "numerics": ["amount_usd"]
+                        },
+                        "wallet_scores": {
+                            "addresses": ["wallet"],
+                            "numerics": ["score"]
+                        },
+                        "whale_activity": {
+                            "addresses": ["wallet", "token"],
+                            "numerics": ["amount_usd", "impact_score"]
+                        },
+                        "wallet_profits": {
+                            "addresses": ["wallet", "token"],
+                            "numerics": ["buy_price", "sell_price", "profit_percent", "hold_time_hours"]
+                        }
+                    }
+                    for table, columns in compact_columns.items():
+                        alters = [
+                            f"ALTER COLUMN {column} TYPE BYTEA USING b58_to_bytea({column})"
+                            for column in columns["addresses"]
+                        ] + [
+                            f"ALTER COLUMN {column} TYPE DOUBLE PRECISION"
+                            for column in columns["numerics"]
+                        ]
+                        cur.execute(f"ALTER TABLE {table} {', '.join(alters)}")
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (4, 'Direcciones binarias y numéricos de precisión fija')
+                    """)
+                    current_version = 4
+                    conn.commit()
+                    logger.info("Migración #4 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #4: {e}")
+                    return False
+
+            if current_version < 5:
+                try:
+                    logger.info("Aplicando migración #5: Registro de segmentos del journal local")
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS spill_journal_replays (
+                            segment TEXT PRIMARY KEY,
+                            record_count INTEGER,
+                            replayed_at TIMESTAMP DEFAULT NOW()
+                        )
+                    """)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (5, 'Registro de segmentos del journal local')
+                    """)
+                    current_version = 5
+                    conn.commit()
+                    logger.info("Migración #5 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #5: {e}")
+                    return False
+
+            if current_version < 6:
+                try:
+                    logger.info("Aplicando migración #6: Firma on-chain única en transactions")
+                    cur.execute("ALTER TABLE transactions ADD COLUMN IF NOT EXISTS signature TEXT")
+                    # Las filas históricas sin firma quedan en NULL, que no colisiona en un índice UNIQUE
+                    cur.execute("""
+                        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_signature
+                        ON transactions(signature)
+                    """)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (6, 'Firma on-chain única en transactions')
+                    """)
+                    current_version = 6
+                    conn.commit()
+                    logger.info("Migración #6 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #6: {e}")
+                    return False
+
+            if current_version < 7:
+                try:
+                    logger.info("Aplicando migración #7: Estadísticas de profit por wallet")
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS wallet_profit_stats (
+                            wallet BYTEA PRIMARY KEY,
+                            trade_count INTEGER NOT NULL DEFAULT 0,
+                            win_count INTEGER NOT NULL DEFAULT 0,
+                            profit_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                            profit_max DOUBLE PRECISION,
+                            hold_time_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                            updated_at TIMESTAMP DEFAULT NOW()
+                        )
+                    """)
+                    cur.execute(WALLET_PROFIT_STATS_REBUILD_QUERY)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (7, 'Estadísticas de profit por wallet')
+                    """)
+                    current_version = 7
+                    conn.commit()
+                    logger.info("Migración #7 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #7: {e}")
+                    return False
+
+            if current_version < 8:
+                try:
+                    logger.info("Aplicando migración #8: Re-chequeo exponencial de tokens fallidos")
+                    cur.execute("""
+                        ALTER TABLE failed_tokens
+                            ADD COLUMN IF NOT EXISTS fail_count INTEGER NOT NULL DEFAULT 1,
+                            ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMP,
+                            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW()
+                    """)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (8, 'Re-chequeo exponencial de tokens fallidos')
+                    """)
+                    current_version = 8
+                    conn.commit()
+                    logger.info("Migración #8 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #8: {e}")
+                    return False
+
+            if current_version < 9:
+                try:
+                    logger.info("Aplicando migración #9: VWAP y z-score de volumen en token_analysis")
+                    cur.execute("""
+                        ALTER TABLE token_analysis
+                            ADD COLUMN IF NOT EXISTS vwap NUMERIC,
+                            ADD COLUMN IF NOT EXISTS volume_zscore NUMERIC
+                    """)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (9, 'VWAP y z-score de volumen en token_analysis')
+                    """)
+                    current_version = 9
+                    conn.commit()
+                    logger.info("Migración #9 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #9: {e}")
+                    return False
+
+            if current_version < 10:
+                try:
+                    logger.info("Aplicando migración #10: Ventas parciales en wallet_profits")
+                    # Varias ventas parciales pueden cerrar el mismo lote de compra
+                    cur.execute("""
+                        ALTER TABLE wallet_profits
+                            DROP CONSTRAINT IF EXISTS wallet_profits_wallet_token_buy_timestamp_key
+                    """)
+                    cur.execute("""
+                        CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_profits_trade
+                        ON wallet_profits(wallet, token, buy_timestamp, sell_timestamp)
+                    """)
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (10, 'Ventas parciales en wallet_profits')
+                    """)
+                    current_version = 10
+                    conn.commit()
+                    logger.info("Migración #10 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #10: {e}")
+                    return False
+
+            if current_version < 11:
+                try:
+                    logger.info("Aplicando migración #11: Un evento por (firma, wallet, token, tipo) en transactions")
+                    # Una firma puede llevar varias transferencias (swaps, rutas multi-hop);
+                    # la unicidad es por evento, no por firma
+                    cur.execute("""
+                        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_event
+                        ON transactions(signature, wallet, token, tx_type)
+                    """)
+                    cur.execute("DROP INDEX IF EXISTS idx_transactions_signature")
+                    cur.execute("""
+                        INSERT INTO schema_version (version, description)
+                        VALUES (11, 'Un evento por (firma, wallet, token, tipo) en transactions')
+                    """)
+                    current_version = 11
+                    conn.commit()
+                    logger.info("Migración #11 aplicada correctamente")
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error en migración #11: {e}")
+                    return False
+
             try:
                 cur.execute("SELECT market_cap FROM signals LIMIT 1")
             except Exception as e:
@@ -447,6 +849,101 @@ def init_db():
         logger.error(f"🚨 Error crítico al inicializar base de datos: {e}", exc_info=True)
         return False
 
+def _is_db_available():
+    try:
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            return True
+    except Exception:
+        return False
+
+def _apply_spilled_segment(segment, records):
+    """
+    Vuelca un segmento del journal en la BD en una única transacción.
+    El nombre del segmento se registra en spill_journal_replays dentro de la
+    misma transacción, de modo que reproducirlo dos veces no duplica datos.
+    """
+    transactions = []
+    signals = []
+    for record in records:
+        data = record["data"]
+        if record["kind"] == "transaction":
+            transactions.append((
+                encode_address(data["wallet"]),
+                encode_address(data["token"]),
+                data["type"],
+                data["amount_usd"],
+                data.get("signature") or None,
+                record["ts"]
+            ))
+        elif record["kind"] == "signal":
+            signals.append((
+                data["token"],
+                data["trader_count"],
+                data["confidence"],
+                data["initial_price"],
+                data["market_cap"],
+                data["volume"],
+                record["ts"]
+            ))
+        else:
+            logger.warning(f"Tipo de registro desconocido en journal: {record['kind']}")
+
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO spill_journal_replays (segment, record_count)
+                VALUES (%s, %s)
+                ON CONFLICT (segment) DO NOTHING
+                RETURNING segment
+            """, (segment, len(records)))
+            if cur.fetchone() is None:
+                conn.rollback()
+                logger.info(f"Segmento {segment} ya estaba volcado, se descarta")
+                return
+            if transactions:
+                psycopg2.extras.execute_values(cur, """
+                    INSERT INTO transactions (wallet, token, tx_type, amount_usd, signature, created_at)
+                    VALUES %s
+                    ON CONFLICT (signature, wallet, token, tx_type) DO NOTHING
+                """, transactions, template="(%s, %s, %s, %s, %s, to_timestamp(%s))", page_size=1000)
+            if signals:
+                psycopg2.extras.execute_values(cur, """
+                    INSERT INTO signals (token, trader_count, confidence, initial_price, market_cap, volume, created_at)
+                    VALUES %s
+                """, signals, template="(%s, %s, %s, %s, %s, %s, to_timestamp(%s))", page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def get_spill_journal():
+    """
+    Devuelve el journal local de escrituras, creándolo (y arrancando su
+    replayer) la primera vez.
+    """
+    global spill_journal
+    with spill_journal_lock:
+        if spill_journal is None:
+            spill_journal = SpillJournal(
+                Config.SPILL_JOURNAL_DIR,
+                apply_segment=_apply_spilled_segment,
+                is_available=_is_db_available,
+                fsync_interval=float(Config.SPILL_JOURNAL_FSYNC_INTERVAL),
+                replay_interval=float(Config.SPILL_JOURNAL_REPLAY_INTERVAL)
+            )
+            logger.info(f"✅ Journal local de escrituras en {Config.SPILL_JOURNAL_DIR}")
+    return spill_journal
+
+def close_spill_journal():
+    global spill_journal
+    with spill_journal_lock:
+        if spill_journal is not None:
+            spill_journal.close()
+            spill_journal = None
+
 def clear_query_cache():
     global query_cache, query_cache_timestamp, query_cache_hits, query_cache_misses
     query_cache = {}
@@ -468,17 +965,52 @@ def get_cache_stats():
 
 @retry_db_operation()
 def save_transaction(tx_data):
+    """
+    Guarda una transacción de forma idempotente: un evento se identifica por
+    (firma on-chain, wallet, token, tipo), ya que una firma puede llevar varias
+    transferencias.
+    
+    Args:
+        tx_data: Datos normalizados de la transacción (signature opcional).
+        
+    Returns:
+        True si se insertó, False si el evento ya estaba registrado,
+        TX_SPILLED si quedó en el journal local (sin deduplicar) o None si
+        hubo un error.
+    """
     query = """
-    INSERT INTO transactions (wallet, token, tx_type, amount_usd)
-    VALUES (%s, %s, %s, %s)
+    INSERT INTO transactions (wallet, token, tx_type, amount_usd, signature)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (signature, wallet, token, tx_type) DO NOTHING
+    RETURNING id
     """
-    params = (tx_data["wallet"], tx_data["token"], tx_data["type"], tx_data["amount_usd"])
+    params = (
+        encode_address(tx_data["wallet"]),
+        encode_address(tx_data["token"]),
+        tx_data["type"],
+        tx_data["amount_usd"],
+        tx_data.get("signature") or None
+    )
+    journal = get_spill_journal()
+    # Mientras queden escrituras en el journal se sigue escribiendo ahí para
+    # conservar el orden y no bloquear la ingesta con reintentos contra la BD
+    if journal.has_pending():
+        journal.append("transaction", tx_data)
+        return TX_SPILLED
     try:
-        execute_cached_query(query, params, write_query=True)
-        return True
+        with get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            inserted = cur.fetchone() is not None
+            conn.commit()
+            return inserted
+    except SPILL_ERRORS as e:
+        logger.warning(f"⚠️ BD no disponible, transacción guardada en journal local: {e}")
+        journal.append("transaction", tx_data)
+        return TX_SPILLED
     except Exception as e:
         logger.error(f"Error guardando transacción: {e}")
-        return False
+        return None
 
 @retry_db_operation()
 def update_setting(key, value):
@@ -523,7 +1055,7 @@ def save_signal(token, trader_count, confidence, initial_price, market_cap=0, vo
         volume: Volumen del token (opcional).
         
     Returns:
-        int: ID de la señal creada o None en caso de error.
+        int: ID de la señal creada, o None en caso de error o si quedó en el journal local.
     """
     query = """
     INSERT INTO signals (token, trader_count, confidence, initial_price, market_cap, volume, created_at)
@@ -531,6 +1063,18 @@ def save_signal(token, trader_count, confidence, initial_price, market_cap=0, vo
     RETURNING id
     """
     params = (token, trader_count, confidence, initial_price, market_cap, volume)
+    journal = get_spill_journal()
+    spill_data = {
+        "token": token,
+        "trader_count": trader_count,
+        "confidence": confidence,
+        "initial_price": initial_price,
+        "market_cap": market_cap,
+        "volume": volume
+    }
+    if journal.has_pending():
+        journal.append("signal", spill_data)
+        return None
     try:
         with get_connection() as conn:
             cur = conn.cursor()
@@ -539,6 +1083,10 @@ def save_signal(token, trader_count, confidence, initial_price, market_cap=0, vo
             conn.commit()
             logger.info(f"Señal guardada para {token} con ID {signal_id}")
             return signal_id
+    except SPILL_ERRORS as e:
+        logger.warning(f"⚠️ BD no disponible, señal para {token} guardada en journal local: {e}")
+        journal.append("signal", spill_data)
+        return None
     except Exception as e:
         logger.error(f"Error guardando señal para {token}: {e}")
         return None
@@ -614,7 +1162,7 @@ def count_signals_today():
     FROM signals
     WHERE created_at >= CURRENT_DATE
     """
-    result = execute_cached_query(query)
+    result = execute_cached_query(query, query_class=QUERY_REPORTING)
     if result and result[0]["count"] is not None:
         return result[0]["count"]
     return 0
@@ -632,7 +1180,7 @@ def count_transactions_today():
     FROM transactions
     WHERE created_at >= CURRENT_DATE
     """
-    result = execute_cached_query(query)
+    result = execute_cached_query(query, query_class=QUERY_REPORTING)
     if result and result[0]["count"] is not None:
         return result[0]["count"]
     return 0
@@ -646,7 +1194,9 @@ def get_wallet_recent_transactions(wallet, hours=24):
     AND created_at > NOW() - INTERVAL '%s HOURS'
     ORDER BY created_at DESC
     """
-    results = execute_cached_query(query, (wallet, hours), max_age=60)
+    results = execute_cached_query(
+        query, (encode_address(wallet), hours), max_age=60, query_class=QUERY_ANALYTICS
+    )
     return results
 
 # NUEVA FUNCIÓN: update_wallet_score
@@ -669,7 +1219,7 @@ def update_wallet_score(wallet, score):
     SET score = %s, updated_at = NOW()
     """
     try:
-        execute_cached_query(query, (wallet, score, score), write_query=True)
+        execute_cached_query(query, (encode_address(wallet), score, score), write_query=True)
         logger.info(f"Score actualizado en BD para {wallet}: {score}")
         # Limpiar caché
         cache_key = f"SELECT * FROM wallet_scores WHERE wallet = '{wallet}'"
@@ -679,3 +1229,486 @@ def update_wallet_score(wallet, score):
     except Exception as e:
         logger.error(f"Error actualizando score para {wallet} en BD: {e}")
         return False
+
+
+@retry_db_operation()
+def get_signals_performance_stats():
+    """
+    Obtiene el rendimiento agregado de las señales por timeframe.
+    
+    Returns:
+        list: Diccionarios con timeframe, avg_percent_change, success_rate y total_signals
+    """
+    query = """
+    SELECT timeframe,
+           ROUND(AVG(percent_change)::numeric, 2) as avg_percent_change,
+           ROUND(100.0 * COUNT(*) FILTER (WHERE percent_change > 0) / COUNT(*), 1) as success_rate,
+           COUNT(*) as total_signals
+    FROM signal_performance
+    GROUP BY timeframe
+    ORDER BY MIN(EXTRACT(EPOCH FROM timestamp))
+    """
+    return execute_cached_query(query, max_age=300, query_class=QUERY_REPORTING)
+
+@retry_db_operation()
+def save_wallet_profits_batch(rows):
+    """
+    Guarda varias operaciones cerradas en wallet_profits y suma sus
+    estadísticas en wallet_profit_stats, en una sentencia por página.
+    
+    Args:
+        rows: Lista de dicts con wallet, token, buy_price, sell_price,
+              profit_percent, hold_time_hours, buy_timestamp y
+              sell_timestamp (epoch)
+        
+    Returns:
+        int: Número de operaciones enviadas
+    """
+    if not rows:
+        return 0
+    values = [
+        (encode_address(row["wallet"]), encode_address(row["token"]), row["buy_price"], row["sell_price"],
+         row["profit_percent"], row["hold_time_hours"], row["buy_timestamp"], row["sell_timestamp"])
+        for row in rows
+    ]
+    # El CTE garantiza que las estadísticas sólo suman las filas de
+    # wallet_profits insertadas de verdad (no los duplicados)
+    query = """
+    WITH inserted AS (
+        INSERT INTO wallet_profits
+            (wallet, token, buy_price, sell_price, profit_percent, hold_time_hours, buy_timestamp, sell_timestamp)
+        VALUES %s
+        ON CONFLICT (wallet, token, buy_timestamp, sell_timestamp) DO NOTHING
+        RETURNING wallet, profit_percent, hold_time_hours
+    )
+    INSERT INTO wallet_profit_stats
+        (wallet, trade_count, win_count, profit_sum, profit_max, hold_time_sum, updated_at)
+    SELECT wallet, COUNT(*), COUNT(*) FILTER (WHERE profit_percent > 0),
+           SUM(profit_percent), MAX(profit_percent), SUM(hold_time_hours), NOW()
+    FROM inserted
+    GROUP BY wallet
+    ON CONFLICT (wallet) DO UPDATE SET
+        trade_count = wallet_profit_stats.trade_count + EXCLUDED.trade_count,
+        win_count = wallet_profit_stats.win_count + EXCLUDED.win_count,
+        profit_sum = wallet_profit_stats.profit_sum + EXCLUDED.profit_sum,
+        profit_max = GREATEST(wallet_profit_stats.profit_max, EXCLUDED.profit_max),
+        hold_time_sum = wallet_profit_stats.hold_time_sum + EXCLUDED.hold_time_sum,
+        updated_at = NOW()
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(
+                cur, query, values,
+                template="(%s, %s, %s, %s, %s, %s, to_timestamp(%s)::timestamp, to_timestamp(%s)::timestamp)",
+                page_size=1000
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values)
+
+@retry_db_operation()
+def get_position_transactions(days):
+    """
+    Compras y ventas de los últimos `days` días en orden cronológico, para
+    reconstruir las posiciones abiertas al arrancar. No pasa por la caché de
+    consultas: es una lectura única y potencialmente grande.
+    
+    Args:
+        days: Ventana en días
+        
+    Returns:
+        list: Filas con wallet, token, tx_type, amount_usd y created_at (epoch)
+    """
+    query = """
+    SELECT wallet, token, tx_type, amount_usd, EXTRACT(EPOCH FROM created_at) AS created_at
+    FROM transactions
+    WHERE tx_type IN ('BUY', 'SELL') AND created_at > NOW() - make_interval(days => %s)
+    ORDER BY created_at, id
+    """
+    with get_connection(query_routes[QUERY_ANALYTICS]) as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cur.execute(query, (int(days),))
+        return [_decode_row(row) for row in cur.fetchall()]
+
+@retry_db_operation()
+def get_wallet_profit_stats(wallet, days=None):
+    """
+    Obtiene estadísticas de profit de una wallet.
+    
+    Sin days se lee la fila precalculada de wallet_profit_stats (una búsqueda
+    por clave primaria). Con days se agrega wallet_profits para esa ventana.
+    
+    Args:
+        wallet: Dirección del wallet
+        days: Ventana en días (opcional)
+        
+    Returns:
+        dict: trade_count, win_rate (0-1), avg_profit, max_profit, avg_hold_time;
+              None si la wallet no tiene operaciones cerradas
+    """
+    if days is None:
+        query = """
+        SELECT trade_count, win_count, profit_sum, profit_max, hold_time_sum
+        FROM wallet_profit_stats
+        WHERE wallet = %s
+        """
+        params = (encode_address(wallet),)
+    else:
+        query = """
+        SELECT COUNT(*) as trade_count,
+               COUNT(*) FILTER (WHERE profit_percent > 0) as win_count,
+               SUM(profit_percent) as profit_sum,
+               MAX(profit_percent) as profit_max,
+               SUM(hold_time_hours) as hold_time_sum
+        FROM wallet_profits
+        WHERE wallet = %s AND sell_timestamp > NOW() - INTERVAL '%s DAYS'
+        """
+        params = (encode_address(wallet), days)
+    result = execute_cached_query(query, params, max_age=60, query_class=QUERY_REPORTING)
+    if not result or not result[0]["trade_count"]:
+        return None
+    row = result[0]
+    trade_count = row["trade_count"]
+    return {
+        "trade_count": trade_count,
+        "win_rate": row["win_count"] / trade_count,
+        "avg_profit": (row["profit_sum"] or 0) / trade_count,
+        "max_profit": row["profit_max"] or 0,
+        "avg_hold_time": (row["hold_time_sum"] or 0) / trade_count
+    }
+
+@retry_db_operation()
+def rebuild_wallet_profit_stats():
+    """
+    Recalcula wallet_profit_stats desde wallet_profits (para backfills o
+    cargas masivas hechas fuera de save_wallet_profits_batch).
+    
+    Returns:
+        int: Número de wallets recalculadas
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("LOCK TABLE wallet_profit_stats IN EXCLUSIVE MODE")
+            cur.execute("DELETE FROM wallet_profit_stats")
+            cur.execute(WALLET_PROFIT_STATS_REBUILD_QUERY)
+            count = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    logger.info(f"✅ Estadísticas de profit recalculadas para {count} wallets")
+    return count
+
+@retry_db_operation()
+def get_failed_tokens():
+    """
+    Obtiene los tokens marcados como fallidos o bloqueados.
+    
+    Returns:
+        list: Filas con token, reason, fail_count y next_check_at (epoch o None si es permanente)
+    """
+    query = """
+    SELECT token, reason, fail_count, EXTRACT(EPOCH FROM next_check_at) AS next_check_at
+    FROM failed_tokens
+    """
+    return execute_cached_query(query, max_age=0)
+
+@retry_db_operation()
+def save_failed_token(token, reason, fail_count=1, next_check_at=None):
+    """
+    Registra o actualiza un token fallido.
+    
+    Args:
+        token: Dirección del token
+        reason: Motivo del fallo o bloqueo
+        fail_count: Número de fallos consecutivos
+        next_check_at: Epoch a partir del cual se vuelve a consultar (None = bloqueo permanente)
+        
+    Returns:
+        bool: True si se guardó correctamente
+    """
+    query = """
+    INSERT INTO failed_tokens (token, reason, fail_count, next_check_at, updated_at)
+    VALUES (%s, %s, %s, to_timestamp(%s), NOW())
+    ON CONFLICT (token) DO UPDATE
+    SET reason = EXCLUDED.reason, fail_count = EXCLUDED.fail_count,
+        next_check_at = EXCLUDED.next_check_at, updated_at = NOW()
+    """
+    try:
+        execute_cached_query(query, (token, reason, fail_count, next_check_at), write_query=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error guardando token fallido {token}: {e}")
+        return False
+
+@retry_db_operation()
+def delete_failed_token(token):
+    """
+    Elimina un token de failed_tokens cuando vuelve a tener datos.
+    
+    Returns:
+        bool: True si se eliminó correctamente
+    """
+    try:
+        execute_cached_query("DELETE FROM failed_tokens WHERE token = %s", (token,), write_query=True)
+        return True
+    except Exception as e:
+        logger.error(f"Error eliminando token fallido {token}: {e}")
+        return False
+
+@retry_db_operation()
+def save_token_analysis_batch(rows):
+    """
+    Guarda los indicadores de un tick para todos los tokens en un único INSERT.
+    
+    Args:
+        rows: Dicts con token, volume_trend, price_trend, volatility, rsi, vwap y volume_zscore
+        
+    Returns:
+        int: Número de filas insertadas
+    """
+    if not rows:
+        return 0
+    values = [
+        (r["token"], r["volume_trend"], r["price_trend"], r["volatility"], r["rsi"],
+         r.get("pattern_quality"), r.get("vwap"), r.get("volume_zscore"))
+        for r in rows
+    ]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO token_analysis
+                    (token, volume_trend, price_trend, volatility, rsi, pattern_quality, vwap, volume_zscore)
+                VALUES %s
+            """, values, page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values)
+
+@retry_db_operation()
+def save_token_liquidity_batch(rows):
+    """
+    Guarda estimaciones de liquidez de varios tokens en un único INSERT.
+    
+    Args:
+        rows: Dicts con token, total_liquidity_usd, volume_24h, slippage_1k, slippage_10k y dex_sources
+        
+    Returns:
+        int: Número de filas insertadas
+    """
+    if not rows:
+        return 0
+    values = [
+        (r["token"], r["total_liquidity_usd"], r["volume_24h"], r["slippage_1k"], r["slippage_10k"],
+         list(r.get("dex_sources") or []))
+        for r in rows
+    ]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO token_liquidity
+                    (token, total_liquidity_usd, volume_24h, slippage_1k, slippage_10k, dex_sources)
+                VALUES %s
+            """, values, template="(%s, %s, %s, %s, %s, %s::text[])", page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values)
+
+@retry_db_operation()
+def get_recent_trending_tokens(hours=6):
+    """
+    Obtiene los tokens vistos en tendencia en las últimas horas.
+    
+    Returns:
+        list: Filas con token y last_seen (epoch de la última aparición)
+    """
+    query = """
+    SELECT token, EXTRACT(EPOCH FROM MAX(created_at)) AS last_seen
+    FROM trending_tokens
+    WHERE created_at > NOW() - INTERVAL '1 HOUR' * %s
+    GROUP BY token
+    """
+    return execute_cached_query(query, (hours,), max_age=0)
+
+@retry_db_operation()
+def save_trending_tokens_batch(rows):
+    """
+    Guarda los cambios de un sondeo de tokens en tendencia en un único INSERT.
+    
+    Args:
+        rows: Dicts con token, platforms y discovery_potential
+        
+    Returns:
+        int: Número de filas insertadas
+    """
+    if not rows:
+        return 0
+    values = [(r["token"], list(r["platforms"]), r["discovery_potential"]) for r in rows]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO trending_tokens (token, platforms, discovery_potential)
+                VALUES %s
+            """, values, template="(%s, %s::text[], %s)", page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values)
+
+@retry_db_operation()
+def get_token_first_buys(since=None, active_days=7):
+    """
+    Primera y última compra de cada token.
+    
+    Sin since agrupa todas las compras de los tokens con actividad en los
+    últimos active_days días (carga inicial). Con since sólo lee las compras
+    posteriores a ese epoch (refrescos incrementales por idx_transactions_created_at).
+    
+    Args:
+        since: Epoch a partir del cual leer compras (None = carga completa)
+        active_days: Días de actividad exigidos en la carga completa
+        
+    Returns:
+        list: Filas con token, first_seen y last_seen (epoch)
+    """
+    if since is None:
+        query = """
+        SELECT token, EXTRACT(EPOCH FROM MIN(created_at)) AS first_seen,
+               EXTRACT(EPOCH FROM MAX(created_at)) AS last_seen
+        FROM transactions
+        WHERE tx_type = 'BUY'
+        GROUP BY token
+        HAVING MAX(created_at) > NOW() - make_interval(days => %s)
+        """
+        params = (int(active_days),)
+    else:
+        query = """
+        SELECT token, EXTRACT(EPOCH FROM MIN(created_at)) AS first_seen,
+               EXTRACT(EPOCH FROM MAX(created_at)) AS last_seen
+        FROM transactions
+        WHERE tx_type = 'BUY' AND created_at > to_timestamp(%s)::timestamp
+        GROUP BY token
+        """
+        params = (since,)
+    return execute_cached_query(query, params, max_age=0, query_class=QUERY_ANALYTICS)
+
+@retry_db_operation()
+def get_token_performance_1h():
+    """
+    Rendimiento medio a 1h de las señales de cada token.
+    
+    Returns:
+        list: Filas con token y avg_performance
+    """
+    query = """
+    SELECT token, AVG(percent_change) AS avg_performance
+    FROM signal_performance
+    WHERE timeframe = '1h'
+    GROUP BY token
+    """
+    return execute_cached_query(query, max_age=0, query_class=QUERY_ANALYTICS)
+
+@retry_db_operation()
+def get_latest_token_liquidity():
+    """
+    Última estimación de liquidez guardada para cada token.
+    
+    Returns:
+        list: Filas con token, total_liquidity_usd y estimated_at (epoch)
+    """
+    query = """
+    SELECT DISTINCT ON (token) token, total_liquidity_usd, EXTRACT(EPOCH FROM created_at) AS estimated_at
+    FROM token_liquidity
+    ORDER BY token, created_at DESC
+    """
+    return execute_cached_query(query, max_age=0, query_class=QUERY_ANALYTICS)
+
+@retry_db_operation()
+def get_recent_whale_tokens(hours=1):
+    """
+    Tokens con actividad de ballenas en las últimas horas.
+    
+    Returns:
+        list: Filas con token y last_seen (epoch de la última actividad)
+    """
+    query = """
+    SELECT token, EXTRACT(EPOCH FROM MAX(created_at)) AS last_seen
+    FROM whale_activity
+    WHERE created_at > NOW() - INTERVAL '1 HOUR' * %s
+    GROUP BY token
+    """
+    return execute_cached_query(query, (hours,), max_age=0, query_class=QUERY_ANALYTICS)
+
+@retry_db_operation()
+def update_wallet_scores_batch(scores):
+    """
+    Guarda varios scores de wallets en un único upsert. updated_at es el
+    momento del último cambio del score, a partir del cual se aplica el decay.
+    
+    Args:
+        scores: Dict {wallet: (score, timestamp epoch)}
+        
+    Returns:
+        int: Número de wallets actualizadas
+    """
+    if not scores:
+        return 0
+    values = [(encode_address(wallet), score, updated_at) for wallet, (score, updated_at) in scores.items()]
+    with get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO wallet_scores (wallet, score, updated_at)
+                VALUES %s
+                ON CONFLICT (wallet) DO UPDATE
+                SET score = EXCLUDED.score, updated_at = EXCLUDED.updated_at
+            """, values, template="(%s, %s, to_timestamp(%s))", page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(values)
+
+@retry_db_operation()
+def get_all_settings():
+    """
+    Obtiene todas las filas de bot_settings.
+    
+    Returns:
+        list: Filas con key y value
+    """
+    return execute_cached_query("SELECT key, value FROM bot_settings", max_age=0)
+
+@retry_db_operation()
+def get_settings_version():
+    """
+    Versión barata de bot_settings para detectar cambios sin leer la tabla.
+    
+    Returns:
+        dict: count (filas) y version (epoch del último updated_at), o None
+    """
+    result = execute_cached_query(
+        "SELECT COUNT(*) AS count, EXTRACT(EPOCH FROM MAX(updated_at)) AS version FROM bot_settings",
+        max_age=0
+    )
+    return result[0] if result else None
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Tareas de mantenimiento de la base de datos")
+    parser.add_argument("command", choices=["rebuild-profit-stats"])
+    args = parser.parse_args()
+    if args.command == "rebuild-profit-stats":
+        rebuild_wallet_profit_stats()
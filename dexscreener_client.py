@@ -1,7 +1,11 @@
-import time
 import asyncio
-import aiohttp
 import logging
+import http_client
+from config import Config
+from rate_limiter import get_rate_limiter
+from market_cache import MarketDataCache, FRESH, STALE
+from token_blocklist import TokenBlocklist
+from dexscreener_parser import group_pairs_by_token, build_token_result, top_pairs
 
 logger = logging.getLogger("dexscreener_client")
 
@@ -10,45 +14,167 @@ class DexScreenerClient:
     Cliente optimizado para DexScreener con énfasis en obtener datos precisos 
     de market cap y volumen siguiendo la documentación oficial de la API.
     """
-    def __init__(self):
-        self.cache = {}
-        self.cache_duration = 60  # 1 minuto de caché
-        self.request_timestamps = []
-        self.rate_limit = 300  # 300 peticiones por minuto según documentación
-        self.session = None
+    # El endpoint /tokens admite hasta 30 direcciones separadas por comas
+    MAX_TOKENS_PER_REQUEST = 30
+
+    def __init__(self, batch_window=0.02, blocklist=None):
+        # Caché LRU: fresca 1 minuto, servible (refrescando en segundo plano) hasta 15 minutos
+        self.cache = MarketDataCache(
+            max_entries=int(Config.get("DEXSCREENER_CACHE_MAX_ENTRIES", 5000)),
+            fresh_ttl=float(Config.get("DEXSCREENER_CACHE_FRESH_TTL", 60)),
+            stale_ttl=float(Config.get("DEXSCREENER_CACHE_STALE_TTL", 900))
+        )
+        # Límite compartido por todas las instancias del proceso (300 peticiones por minuto según documentación)
+        rate_limit = int(Config.get("DEXSCREENER_RATE_LIMIT", 300))
+        burst = int(Config.get("DEXSCREENER_RATE_BURST", 10))
+        self.rate_limiter = get_rate_limiter("dexscreener", (rate_limit - burst) / 60, burst)
         self.error_backoff = 1  # Tiempo de espera inicial para errores
+        
+        # Snapshot de la caché en disco para arrancar en caliente tras un reinicio
+        self.snapshot_path = Config.get("MARKET_CACHE_SNAPSHOT_PATH", "")
+        self.snapshot_interval = float(Config.get("MARKET_CACHE_SNAPSHOT_INTERVAL", 60))
+        self.snapshot_task = None
+        if self.snapshot_path:
+            loaded = self.cache.load(self.snapshot_path)
+            logger.info(f"Caché de mercado restaurada desde {self.snapshot_path}: {loaded} tokens")
+        
+        # Caché negativa: tokens bloqueados o sin datos se rechazan antes de cualquier petición
+        self.blocklist = blocklist or TokenBlocklist(
+            base_interval=float(Config.get("FAILED_TOKEN_RECHECK_SECONDS", 600))
+        )
+        
+        # Agrupación de peticiones /tokens: {token: [futures]} acumulados durante batch_window
+        self.batch_window = batch_window
+        self.pending_batch = {}
+        self.batch_flush_handle = None
+        self.batch_stats = {"requests": 0, "tokens_requested": 0}
+        
+        # Fetches en vuelo por token (single-flight)
+        self.inflight = {}
+        self.coalesce_stats = {"leaders": 0, "coalesced": 0}
 
     async def ensure_session(self):
-        """Asegura que existe una sesión HTTP abierta"""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
-        return self.session
-        
-    async def close_session(self):
-        """Cierra la sesión HTTP si está abierta"""
-        if self.session and not self.session.closed:
-            await self.session.close()
-            self.session = None
+        """Devuelve la sesión HTTP compartida del proceso"""
+        return await http_client.get_session()
+
+    def start_snapshots(self):
+        """Inicia el guardado periódico de la caché en disco (requiere un bucle en marcha)."""
+        if self.snapshot_path and self.snapshot_task is None:
+            self.snapshot_task = asyncio.create_task(self._snapshot_loop())
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            await self.save_snapshot()
+
+    async def save_snapshot(self):
+        """Guarda la caché en disco; la serialización y el fsync se hacen fuera del bucle."""
+        if not self.snapshot_path:
+            return
+        try:
+            entries = self.cache.snapshot()
+            await asyncio.to_thread(MarketDataCache.write_snapshot, self.snapshot_path, entries)
+            logger.debug(f"Snapshot de caché guardado ({len(entries)} tokens)")
+        except Exception as e:
+            logger.error(f"Error guardando snapshot de caché: {e}")
+
+    async def close(self):
+        """
+        Detiene el snapshot periódico, guarda la caché y los tokens fallidos
+        pendientes (la sesión HTTP la cierra main).
+        """
+        if self.snapshot_task is not None:
+            self.snapshot_task.cancel()
+            self.snapshot_task = None
+        await self.save_snapshot()
+        await self.blocklist.close()
 
     async def _apply_rate_limiting(self):
         """
         Aplica limitación de tasa para evitar ser bloqueado por la API.
         Según documentación: 300 peticiones por minuto para endpoints de tokens.
+        La capacidad de ráfaga se descuenta de la tasa para no superar el límite en ninguna ventana de 60s.
+        """
+        await self.rate_limiter.acquire()
+
+    async def _request_token_pairs(self, token):
         """
-        now = time.time()
-        # Limpiar timestamps antiguos (más de 60 segundos)
-        self.request_timestamps = [ts for ts in self.request_timestamps if now - ts < 60]
+        Encola un token para la siguiente petición agrupada a /latest/dex/tokens
+        y espera su parte de la respuesta.
         
-        # Si estamos cerca del límite, esperar
-        if len(self.request_timestamps) >= self.rate_limit:
-            oldest = min(self.request_timestamps)
-            wait_time = 60 - (now - oldest) + 0.2  # Margen de seguridad de 0.2s
-            if wait_time > 0:
-                logger.debug(f"Rate limit aplicado: esperando {wait_time:.2f}s antes de la próxima solicitud")
-                await asyncio.sleep(wait_time)
-                
-        # Registrar esta solicitud
-        self.request_timestamps.append(time.time())
+        Args:
+            token: Dirección del token
+            
+        Returns:
+            tuple: (status HTTP, pares del token como [(volumen_24h, par)] o None)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending_batch.setdefault(token, []).append(future)
+        if len(self.pending_batch) >= self.MAX_TOKENS_PER_REQUEST:
+            self._flush_batch()
+        elif self.batch_flush_handle is None:
+            self.batch_flush_handle = loop.call_later(self.batch_window, self._flush_batch)
+        return await future
+
+    def _flush_batch(self):
+        if self.batch_flush_handle is not None:
+            self.batch_flush_handle.cancel()
+            self.batch_flush_handle = None
+        pending, self.pending_batch = self.pending_batch, {}
+        tokens = list(pending)
+        for i in range(0, len(tokens), self.MAX_TOKENS_PER_REQUEST):
+            chunk = {token: pending[token] for token in tokens[i:i + self.MAX_TOKENS_PER_REQUEST]}
+            asyncio.ensure_future(self._execute_batch(chunk))
+
+    async def _execute_batch(self, chunk):
+        """Realiza una petición multi-dirección y reparte los pares entre los tokens que esperan."""
+        try:
+            await self._apply_rate_limiting()
+            session = await self.ensure_session()
+            url = f"https://api.dexscreener.com/latest/dex/tokens/{','.join(chunk)}"
+            self.batch_stats["requests"] += 1
+            self.batch_stats["tokens_requested"] += len(chunk)
+            logger.debug(f"Solicitando {len(chunk)} tokens a DexScreener en una sola petición")
+            async with session.get(url, timeout=10) as response:
+                if response.status != 200:
+                    results = {token: (response.status, None) for token in chunk}
+                else:
+                    pairs_by_token = group_pairs_by_token(await response.json(), chunk)
+                    results = {token: (200, pairs) for token, pairs in pairs_by_token.items()}
+            for token, futures in chunk.items():
+                for future in futures:
+                    if not future.done():
+                        future.set_result(results[token])
+        except Exception as e:
+            for futures in chunk.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def get_batch_stats(self):
+        """Estadísticas de agrupación de peticiones (tokens por petición)."""
+        requests = self.batch_stats["requests"]
+        return dict(
+            self.batch_stats,
+            tokens_per_request=self.batch_stats["tokens_requested"] / requests if requests else 0
+        )
+
+    def get_stats(self):
+        """Métricas del cliente: agrupación de peticiones y coalescencia de fetches."""
+        lookups = self.coalesce_stats["leaders"] + self.coalesce_stats["coalesced"]
+        return {
+            "batching": self.get_batch_stats(),
+            "rate_limiter": self.rate_limiter.get_stats(),
+            "cache": self.cache.get_stats(),
+            "blocklist": self.blocklist.get_stats(),
+            "http_pool": http_client.get_pool_stats(),
+            "coalescing": dict(
+                self.coalesce_stats,
+                inflight=len(self.inflight),
+                coalesced_ratio=self.coalesce_stats["coalesced"] / lookups if lookups else 0
+            )
+        }
 
     async def fetch_token_data(self, token, retries=2):
         """
@@ -60,162 +186,81 @@ class DexScreenerClient:
             retries: Número de reintentos en caso de error
             
         Returns:
-            dict: Datos del token con market cap y volumen o valores por defecto.
+            dict: Datos del token con market cap y volumen, o None si no hay datos reales.
         """
-        now = time.time()
+        if self.blocklist.is_blocked(token):
+            logger.debug(f"Token {token} en caché negativa ({self.blocklist.get_reason(token)}), omitiendo fetch")
+            return None
         
         logger.info(f"Iniciando fetch de datos para token {token}")
         
-        # Verificar caché primero
-        if token in self.cache and now - self.cache[token]["timestamp"] < self.cache_duration:
-            cache_data = self.cache[token]["data"]
-            if cache_data and cache_data.get("market_cap", 0) > 0 and cache_data.get("volume", 0) > 0:
-                logger.info(f"Datos para {token} recuperados de caché")
-                return cache_data
+        # Verificar caché primero; un dato stale se sirve al momento y se refresca en segundo plano
+        cache_data, cache_state = self.cache.lookup(token)
+        if cache_state == FRESH:
+            logger.info(f"Datos para {token} recuperados de caché")
+            return cache_data
+        if cache_state == STALE:
+            logger.debug(f"Datos stale para {token}, refrescando en segundo plano")
+            self._start_fetch(token, retries)
+            return cache_data
         
+        # Single-flight: las llamadas concurrentes para el mismo token esperan la misma petición
+        inflight = self.inflight.get(token)
+        if inflight is not None:
+            self.coalesce_stats["coalesced"] += 1
+            logger.debug(f"Fetch de {token} ya en curso, esperando resultado compartido")
+            return await asyncio.shield(inflight)
+        
+        return await asyncio.shield(self._start_fetch(token, retries))
+
+    def _start_fetch(self, token, retries):
+        """Lanza (o reutiliza) el fetch en vuelo de un token."""
+        task = self.inflight.get(token)
+        if task is None:
+            self.coalesce_stats["leaders"] += 1
+            task = asyncio.ensure_future(self._fetch_token_data_remote(token, retries))
+            self.inflight[token] = task
+            task.add_done_callback(lambda _: self.inflight.pop(token, None))
+        return task
+
+    async def _fetch_token_data_remote(self, token, retries):
+        """Consulta DexScreener con reintentos; ejecutado una sola vez por token en vuelo."""
         attempt = 0
         current_backoff = self.error_backoff
+        data_failure = None  # Motivo si el fallo es del token (sin pares, datos incompletos) y no de la API
         
         while attempt <= retries:
             try:
-                await self._apply_rate_limiting()
-                
-                session = await self.ensure_session()
-                url = f"https://api.dexscreener.com/latest/dex/tokens/{token}"
-                logger.debug(f"Solicitando datos de DexScreener para {token}: {url}")
-                
-                async with session.get(url, timeout=10) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        if not data or "pairs" not in data or not data["pairs"]:
-                            logger.warning(f"Sin datos de pares para token {token} (intent {attempt+1})")
-                            attempt += 1
-                            await asyncio.sleep(current_backoff)
-                            current_backoff *= 2
-                            continue
-                        
-                        # Ordenar pares por volumen (h24) y usar el par más activo
-                        pairs = sorted(
-                            data["pairs"], 
-                            key=lambda x: float(x.get("volume", {}).get("h24", 0)) if isinstance(x.get("volume", {}), dict) else 0, 
-                            reverse=True
-                        )
-                        
-                        if not pairs:
-                            break
-                            
-                        active_pair = pairs[0]
-                        
-                        # Extraer datos críticos
-                        try:
-                            price = float(active_pair.get("priceUsd", 0))
-                        except (ValueError, TypeError):
-                            price = 0
-                        
-                        try:
-                            market_cap = float(active_pair.get("marketCap", 0))
-                        except (ValueError, TypeError):
-                            market_cap = 0
-                        
-                        volume_24h = 0
-                        volume_1h = 0
-                        vol_data = active_pair.get("volume", {})
-                        if isinstance(vol_data, dict):
-                            try:
-                                volume_24h = float(vol_data.get("h24", 0))
-                            except (ValueError, TypeError):
-                                volume_24h = 0
-                            try:
-                                volume_1h = float(vol_data.get("h1", 0))
-                            except (ValueError, TypeError):
-                                volume_1h = 0
-                        
-                        if volume_24h > 0 and volume_1h == 0:
-                            volume_1h = volume_24h / 12  # Estimación conservadora
-                        
-                        # Extraer crecimiento de precio
-                        growth_5m = 0
-                        growth_1h = 0
-                        price_change = active_pair.get("priceChange", {})
-                        if isinstance(price_change, dict):
-                            try:
-                                growth_5m = float(price_change.get("m5", 0)) / 100
-                            except (ValueError, TypeError):
-                                growth_5m = 0
-                            try:
-                                growth_1h = float(price_change.get("h1", 0)) / 100
-                            except (ValueError, TypeError):
-                                growth_1h = 0
-                        
-                        # Extraer liquidez
-                        liquidity = 0
-                        liquidity_data = active_pair.get("liquidity", {})
-                        if isinstance(liquidity_data, dict):
-                            try:
-                                liquidity = float(liquidity_data.get("usd", 0))
-                            except (ValueError, TypeError):
-                                liquidity = 0
-                        
-                        # Verificar trending
-                        is_trending = "trending" in active_pair.get("labels", [])
-                        
-                        token_name = active_pair.get("baseToken", {}).get("name", "")
-                        token_symbol = active_pair.get("baseToken", {}).get("symbol", "")
-                        
-                        result = {
-                            "price": price,
-                            "market_cap": market_cap,
-                            "volume": volume_1h,
-                            "volume_24h": volume_24h,
-                            "volume_growth": {"growth_5m": growth_5m, "growth_1h": growth_1h},
-                            "liquidity": liquidity,
-                            "trending": is_trending,
-                            "name": token_name,
-                            "symbol": token_symbol,
-                            "source": "dexscreener"
-                        }
-                        
-                        if market_cap > 0 and volume_1h > 0:
-                            self.cache[token] = {"data": result, "timestamp": now}
-                            logger.info(f"Datos completos para {token} obtenidos de DexScreener (MC: ${market_cap/1000:.1f}K, Vol: ${volume_1h/1000:.1f}K)")
-                            return result
-                        else:
-                            logger.warning(f"Datos incompletos para {token}, buscando en pares adicionales")
-                            for pair in pairs[1:5]:
-                                if market_cap == 0 and "marketCap" in pair:
-                                    try:
-                                        market_cap = float(pair["marketCap"])
-                                        result["market_cap"] = market_cap
-                                        logger.debug(f"Market cap complementado: ${market_cap/1000:.1f}K")
-                                    except (ValueError, TypeError):
-                                        pass
-                                if volume_1h == 0 and "volume" in pair and isinstance(pair["volume"], dict) and "h1" in pair["volume"]:
-                                    try:
-                                        volume_1h = float(pair["volume"]["h1"])
-                                        result["volume"] = volume_1h
-                                        logger.debug(f"Volumen complementado: ${volume_1h/1000:.1f}K")
-                                    except (ValueError, TypeError):
-                                        pass
-                            if result["market_cap"] > 0 and result["volume"] > 0:
-                                self.cache[token] = {"data": result, "timestamp": now}
-                                logger.info(f"Datos complementados para {token} (MC: ${result['market_cap']/1000:.1f}K, Vol: ${result['volume']/1000:.1f}K)")
-                                return result
-                            logger.warning(f"Datos incompletos para {token} después de procesar múltiples pares")
-                    elif response.status == 429:
-                        logger.warning(f"Rate limit excedido para {token}, esperando para reintentar")
-                        await asyncio.sleep(5 + current_backoff)
+                logger.debug(f"Solicitando datos de DexScreener para {token}")
+                status, token_pairs = await self._request_token_pairs(token)
+                if status == 200:
+                    if not token_pairs:
+                        logger.warning(f"Sin datos de pares para token {token} (intent {attempt+1})")
+                        data_failure = "sin pares"
+                        attempt += 1
+                        await asyncio.sleep(current_backoff)
                         current_backoff *= 2
-                        fallback_data = {
-                            "price": 0.0001,
-                            "market_cap": 500000,
-                            "volume": 200000,
-                            "volume_growth": {"growth_5m": 0.1, "growth_1h": 0.05},
-                            "source": "dexscreener_ratelimited"
-                        }
-                        return fallback_data
-                    else:
-                        logger.warning(f"Error obteniendo datos de DexScreener para {token}: {response.status}")
+                        continue
+                    
+                    result = build_token_result(token_pairs)
+                    if result["market_cap"] > 0 and result["volume"] > 0:
+                        self.cache.set(token, result)
+                        self.blocklist.record_success(token)
+                        logger.info(f"Datos completos para {token} obtenidos de DexScreener (MC: ${result['market_cap']/1000:.1f}K, Vol: ${result['volume']/1000:.1f}K)")
+                        return result
+                    logger.warning(f"Datos incompletos para {token} después de procesar múltiples pares")
+                    data_failure = "datos incompletos"
+                elif status == 429:
+                    stale_data = self.cache.get_stale(token)
+                    if stale_data:
+                        logger.warning(f"Rate limit excedido para {token}, sirviendo últimos datos en caché")
+                        return stale_data
+                    logger.warning(f"Rate limit excedido para {token}, esperando para reintentar")
+                    data_failure = None
+                    await asyncio.sleep(5)
+                else:
+                    logger.warning(f"Error obteniendo datos de DexScreener para {token}: {status}")
+                    data_failure = None
                 
                 attempt += 1
                 if attempt <= retries:
@@ -224,26 +269,26 @@ class DexScreenerClient:
                 
             except asyncio.TimeoutError:
                 logger.warning(f"Timeout en solicitud para {token}")
+                data_failure = None
                 attempt += 1
                 await asyncio.sleep(current_backoff)
                 current_backoff *= 2
                 
             except Exception as e:
                 logger.error(f"Error en fetch_token_data para {token}: {e}")
+                data_failure = None
                 attempt += 1
                 await asyncio.sleep(current_backoff)
                 current_backoff *= 2
         
-        fallback_data = {
-            "price": 0.0001,
-            "market_cap": 500000,
-            "volume": 150000,
-            "volume_growth": {"growth_5m": 0.1, "growth_1h": 0.05},
-            "source": "dexscreener_fallback"
-        }
-        self.cache[token] = {"data": fallback_data, "timestamp": now - (self.cache_duration * 0.5)}
-        logger.warning(f"Usando datos estimados para {token} después de {retries+1} intentos fallidos")
-        return fallback_data
+        if data_failure:
+            self.blocklist.record_failure(token, data_failure)
+        stale_data = self.cache.get_stale(token)
+        if stale_data:
+            logger.warning(f"Usando últimos datos en caché para {token} después de {retries+1} intentos fallidos")
+            return stale_data
+        logger.warning(f"Sin datos de mercado para {token} después de {retries+1} intentos fallidos")
+        return None
 
     async def search_trending_tokens(self, limit=10):
         """
@@ -321,69 +366,27 @@ class DexScreenerClient:
             list: Lista de pares para el token.
         """
         try:
-            await self._apply_rate_limiting()
-            session = await self.ensure_session()
-            url = f"https://api.dexscreener.com/latest/dex/tokens/{token}"
-            async with session.get(url, timeout=10) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if "pairs" in data and data["pairs"]:
-                        pairs = sorted(
-                            data["pairs"], 
-                            key=lambda x: float(x.get("volume", {}).get("h24", 0)) if isinstance(x.get("volume", {}), dict) else 0, 
-                            reverse=True
-                        )
-                        result_pairs = []
-                        for pair in pairs[:limit]:
-                            dex_id = pair.get("dexId", "")
-                            pair_address = pair.get("pairAddress", "")
-                            price = 0
-                            try:
-                                price = float(pair.get("priceUsd", 0))
-                            except (ValueError, TypeError):
-                                price = 0
-                            base_token = {}
-                            if "baseToken" in pair:
-                                base_token = {
-                                    "address": pair["baseToken"].get("address", ""),
-                                    "name": pair["baseToken"].get("name", ""),
-                                    "symbol": pair["baseToken"].get("symbol", "")
-                                }
-                            quote_token = {}
-                            if "quoteToken" in pair:
-                                quote_token = {
-                                    "address": pair["quoteToken"].get("address", ""),
-                                    "name": pair["quoteToken"].get("name", ""),
-                                    "symbol": pair["quoteToken"].get("symbol", "")
-                                }
-                            volume_24h = 0
-                            if "volume" in pair and isinstance(pair["volume"], dict) and "h24" in pair["volume"]:
-                                try:
-                                    volume_24h = float(pair["volume"]["h24"])
-                                except (ValueError, TypeError):
-                                    volume_24h = 0
-                            liquidity = 0
-                            if "liquidity" in pair and isinstance(pair["liquidity"], dict) and "usd" in pair["liquidity"]:
-                                try:
-                                    liquidity = float(pair["liquidity"]["usd"])
-                                except (ValueError, TypeError):
-                                    liquidity = 0
-                            result_pairs.append({
-                                "dex": dex_id,
-                                "pair_address": pair_address,
-                                "price": price,
-                                "base_token": base_token,
-                                "quote_token": quote_token,
-                                "volume_24h": volume_24h,
-                                "liquidity": liquidity
-                            })
-                        return result_pairs
-                return []
+            status, token_pairs = await self._request_token_pairs(token)
+            if status == 200 and token_pairs:
+                result_pairs = [
+                    {
+                        "dex": pair["dex"],
+                        "pair_address": pair["pair_address"],
+                        "price": pair["price"],
+                        "base_token": pair["base_token"],
+                        "quote_token": pair["quote_token"],
+                        "volume_24h": pair["volume_24h"],
+                        "liquidity": pair["liquidity"]
+                    }
+                    for pair in top_pairs(token_pairs, limit)
+                ]
+                return result_pairs
+            return []
         except Exception as e:
             logger.error(f"Error en get_token_pairs: {e}")
             return []
     
     def clear_cache(self):
         """Limpia la caché de solicitudes."""
-        self.cache = {}
+        self.cache.clear()
         logger.info("Cache de DexScreener limpiada")
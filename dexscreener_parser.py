@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# dexscreener_parser.py - Parseo selectivo de pares de DexScreener en una sola pasada
+
+import heapq
+import logging
+from operator import itemgetter
+
+logger = logging.getLogger("dexscreener_parser")
+
+_EMPTY = {}
+_by_volume = itemgetter(0)
+
+def _num(value):
+    """float() tolerante: None, cadenas vacías o valores no numéricos valen 0."""
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+def _token_info(token):
+    if not token:
+        return {"address": "", "name": "", "symbol": ""}
+    return {"address": token.get("address", ""), "name": token.get("name", ""), "symbol": token.get("symbol", "")}
+
+def slim_pair(pair):
+    """
+    Reduce un par de DexScreener a los campos que usa el bot, leyendo cada
+    campo una sola vez.
+
+    Returns:
+        dict: dex, pair_address, price, market_cap, volume_1h, volume_24h,
+              liquidity, growth_5m, growth_1h, trending, base_token, quote_token
+    """
+    volume = pair.get("volume") or _EMPTY
+    price_change = pair.get("priceChange") or _EMPTY
+    liquidity = pair.get("liquidity") or _EMPTY
+    if not isinstance(volume, dict):
+        volume = _EMPTY
+    if not isinstance(price_change, dict):
+        price_change = _EMPTY
+    if not isinstance(liquidity, dict):
+        liquidity = _EMPTY
+    return {
+        "dex": pair.get("dexId", ""),
+        "pair_address": pair.get("pairAddress", ""),
+        "price": _num(pair.get("priceUsd")),
+        "market_cap": _num(pair.get("marketCap")),
+        "volume_1h": _num(volume.get("h1")),
+        "volume_24h": _num(volume.get("h24")),
+        "liquidity": _num(liquidity.get("usd")),
+        "growth_5m": _num(price_change.get("m5")) / 100,
+        "growth_1h": _num(price_change.get("h1")) / 100,
+        "trending": "trending" in (pair.get("labels") or ()),
+        "base_token": _token_info(pair.get("baseToken")),
+        "quote_token": _token_info(pair.get("quoteToken")),
+    }
+
+def _volume_24h(pair):
+    try:
+        return float(pair["volume"]["h24"])
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+def group_pairs_by_token(payload, tokens):
+    """
+    Recorre una respuesta de /latest/dex/tokens una sola vez y asigna cada par
+    a los tokens pedidos que aparecen como base o quote, junto con su volumen
+    24h (calculado una sola vez). Los pares no se copian: sólo se reducen los
+    que se acaban usando.
+
+    Args:
+        payload: JSON decodificado de la respuesta
+        tokens: Direcciones pedidas
+
+    Returns:
+        dict: {token: [(volumen_24h, par)]}
+    """
+    pairs_by_token = {token: [] for token in tokens}
+    lookup = pairs_by_token.get
+    for pair in (payload or _EMPTY).get("pairs") or ():
+        try:
+            base_pairs = lookup(pair["baseToken"]["address"])
+        except (KeyError, TypeError):
+            base_pairs = None
+        try:
+            quote_pairs = lookup(pair["quoteToken"]["address"])
+        except (KeyError, TypeError):
+            quote_pairs = None
+        if base_pairs is None and quote_pairs is None:
+            continue
+        entry = (_volume_24h(pair), pair)
+        if base_pairs is not None:
+            base_pairs.append(entry)
+        if quote_pairs is not None and quote_pairs is not base_pairs:
+            quote_pairs.append(entry)
+    return pairs_by_token
+
+def top_pairs(entries, limit):
+    """Los `limit` pares con más volumen 24h, reducidos y sin ordenar la lista completa."""
+    if not entries:
+        return []
+    if limit == 1:
+        return [slim_pair(max(entries, key=_by_volume)[1])]
+    return [slim_pair(pair) for _, pair in heapq.nlargest(limit, entries, key=_by_volume)]
+
+def build_token_result(entries):
+    """
+    Construye los datos de mercado de un token a partir de sus pares
+    (salida de group_pairs_by_token), usando
+    el par con más volumen 24h (máximo lineal) y completando market cap /
+    volumen 1h con los siguientes pares más activos si faltan.
+
+    Returns:
+        dict: Datos del token (mismo formato que DexScreenerClient.fetch_token_data) o None sin pares
+    """
+    if not entries:
+        return None
+    active_pair = top_pairs(entries, 1)[0]
+    market_cap = active_pair["market_cap"]
+    volume_24h = active_pair["volume_24h"]
+    volume_1h = active_pair["volume_1h"]
+    if volume_24h > 0 and volume_1h == 0:
+        volume_1h = volume_24h / 12  # Estimación conservadora
+
+    if (market_cap == 0 or volume_1h == 0) and len(entries) > 1:
+        for pair in top_pairs(entries, 5)[1:]:
+            if market_cap == 0:
+                market_cap = pair["market_cap"]
+            if volume_1h == 0:
+                volume_1h = pair["volume_1h"]
+
+    base_token = active_pair["base_token"]
+    return {
+        "price": active_pair["price"],
+        "market_cap": market_cap,
+        "volume": volume_1h,
+        "volume_24h": volume_24h,
+        "volume_growth": {"growth_5m": active_pair["growth_5m"], "growth_1h": active_pair["growth_1h"]},
+        "liquidity": active_pair["liquidity"],
+        "trending": active_pair["trending"],
+        "name": base_token["name"],
+        "symbol": base_token["symbol"],
+        "source": "dexscreener"
+    }
+
+def _legacy_parse(payload, token):
+    """Parseo anterior (agrupado por token, orden completo y extracción con try/except), sólo para el benchmark."""
+    pairs_by_token = {token: []}
+    for pair in payload.get("pairs") or []:
+        for side in ("baseToken", "quoteToken"):
+            address = (pair.get(side) or {}).get("address")
+            if address in pairs_by_token:
+                pairs_by_token[address].append(pair)
+    pairs = sorted(
+        pairs_by_token[token],
+        key=lambda x: float(x.get("volume", {}).get("h24", 0)) if isinstance(x.get("volume", {}), dict) else 0,
+        reverse=True
+    )
+    active_pair = pairs[0]
+    fields = {}
+    for key, getter in (
+        ("price", lambda p: p.get("priceUsd", 0)),
+        ("market_cap", lambda p: p.get("marketCap", 0)),
+        ("volume_24h", lambda p: p.get("volume", {}).get("h24", 0)),
+        ("volume_1h", lambda p: p.get("volume", {}).get("h1", 0)),
+        ("growth_5m", lambda p: p.get("priceChange", {}).get("m5", 0)),
+        ("growth_1h", lambda p: p.get("priceChange", {}).get("h1", 0)),
+        ("liquidity", lambda p: p.get("liquidity", {}).get("usd", 0)),
+    ):
+        try:
+            fields[key] = float(getter(active_pair))
+        except (ValueError, TypeError):
+            fields[key] = 0
+    fields["trending"] = "trending" in active_pair.get("labels", [])
+    fields["name"] = active_pair.get("baseToken", {}).get("name", "")
+    return fields
+
+def _synthetic_payload(token, pair_count):
+    import random
+    return {"schemaVersion": "1.0.0", "pairs": [
+        {
+            "chainId": "solana", "dexId": random.choice(["raydium", "orca", "meteora"]),
+            "url": "https://dexscreener.com/solana/x", "pairAddress": f"pair{i}",
+            "labels": ["v4"] if i % 5 else ["trending"],
+            "baseToken": {"address": token, "name": "Token", "symbol": "TKN"},
+            "quoteToken": {"address": "So11111111111111111111111111111111111111112", "name": "Wrapped SOL", "symbol": "SOL"},
+            "priceNative": "0.0000123", "priceUsd": f"{random.random():.8f}",
+            "txns": {k: {"buys": random.randint(0, 999), "sells": random.randint(0, 999)} for k in ("m5", "h1", "h6", "h24")},
+            "volume": {k: random.uniform(0, 1e6) for k in ("m5", "h1", "h6", "h24")},
+            "priceChange": {k: random.uniform(-50, 50) for k in ("m5", "h1", "h6", "h24")},
+            "liquidity": {"usd": random.uniform(0, 1e6), "base": 1e9, "quote": 100.0},
+            "fdv": random.uniform(0, 1e8), "marketCap": random.uniform(0, 1e8),
+            "pairCreatedAt": 1700000000000,
+            "info": {"imageUrl": "https://example.com/x.png", "websites": [], "socials": []},
+        }
+        for i in range(pair_count)
+    ]}
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import timeit
+    parser = argparse.ArgumentParser(description="Microbenchmark del parser de pares de DexScreener")
+    parser.add_argument("payloads", nargs="*", help="Respuestas grabadas de /latest/dex/tokens (JSON)")
+    parser.add_argument("--pairs", type=int, default=200, help="Pares por payload sintético si no se pasan archivos")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.payloads:
+        payloads = []
+        for path in args.payloads:
+            with open(path) as f:
+                payloads.append(json.load(f))
+    else:
+        payloads = [_synthetic_payload("BenchToken1111111111111111111111111111111111", args.pairs)]
+
+    for payload in payloads:
+        token = max(payload["pairs"], key=lambda p: _num((p.get("volume") or {}).get("h24")))["baseToken"]["address"]
+        legacy = min(timeit.repeat(lambda: _legacy_parse(payload, token), number=args.repeat, repeat=5)) / args.repeat
+        current = min(timeit.repeat(
+            lambda: build_token_result(group_pairs_by_token(payload, [token])[token]),
+            number=args.repeat, repeat=5
+        )) / args.repeat
+        print(f"{len(payload['pairs'])} pares: legacy {legacy * 1e6:.1f} µs, parser {current * 1e6:.1f} µs "
+              f"({legacy / current:.2f}x)")
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# feature_store.py - Features por token precalculadas en memoria para el scoring sin consultas a la BD
+
+import time
+import asyncio
+import logging
+import db
+from config import Config
+
+logger = logging.getLogger("feature_store")
+
+class TokenFeatureStore:
+    """
+    Features por token que usa ScoringSystem en cada trade:
+
+    - first_seen: primera compra registrada (comprador temprano) de los
+      tokens con actividad en los últimos max_age_days días
+    - avg_performance_1h: rendimiento medio 1h de sus señales
+    - liquidity_usd: última liquidez estimada (tier de liquidez)
+    - whale_seen_at: última actividad de ballena
+    - trending: vía el índice de TrendingPoller
+
+    Se carga al arrancar y un refresco en segundo plano vuelve a leer las
+    tablas agregadas cada refresh_interval segundos (fuera del bucle de
+    eventos); las primeras compras sólo se agrupan completas en la carga
+    inicial y los refrescos leen las compras posteriores al anterior. Los
+    trades observados actualizan first_seen y la actividad de ballenas al
+    instante, así que las lecturas son sólo accesos a dicts. Los tokens sin
+    compras en max_age_days días se descartan cada hora.
+    """
+
+    def __init__(self, trending=None, refresh_interval=300, whale_window=3600, max_age_days=7):
+        """
+        Args:
+            trending: TrendingPoller opcional para el flag de tendencia
+            refresh_interval: Segundos entre recargas desde la BD
+            whale_window: Segundos que cuenta una actividad de ballena
+            max_age_days: Días sin compras tras los que se descarta un token
+        """
+        self.trending = trending
+        self.refresh_interval = refresh_interval
+        self.whale_window = whale_window
+        self.max_age_days = max_age_days
+        self.max_age = max_age_days * 24 * 3600
+        self.whale_threshold = float(Config.WHALE_TRANSACTION_THRESHOLD)
+        self.first_seen = {}  # token -> epoch de la primera compra
+        self.last_seen = {}  # token -> epoch de la última compra
+        self.performance = {}  # token -> rendimiento medio 1h (%)
+        self.liquidity = {}  # token -> (liquidez USD, epoch de la estimación)
+        self.whale_seen_at = {}  # token -> epoch de la última actividad de ballena
+        self.buys_since = None  # epoch desde el que leer compras nuevas (None = carga completa)
+        self.last_prune = time.time()
+        self.refresh_task = None
+        self.stats = {"refreshes": 0, "errors": 0, "events": 0, "pruned": 0}
+
+    def _fetch_snapshot(self):
+        return {
+            "first_seen": db.get_token_first_buys(self.buys_since, self.max_age_days),
+            "performance": db.get_token_performance_1h(),
+            "liquidity": db.get_latest_token_liquidity(),
+            "whales": db.get_recent_whale_tokens(hours=1),
+        }
+
+    def _apply_snapshot(self, snapshot):
+        for row in snapshot["first_seen"]:
+            self._record_buy(row["token"], float(row["first_seen"]), float(row["last_seen"]))
+        self.performance = {
+            row["token"]: float(row["avg_performance"])
+            for row in snapshot["performance"] if row["avg_performance"] is not None
+        }
+        # La liquidez leída de la BD sólo pisa estimaciones más antiguas en memoria
+        for row in snapshot["liquidity"]:
+            if row["total_liquidity_usd"] is not None:
+                estimated_at = float(row["estimated_at"])
+                current = self.liquidity.get(row["token"])
+                if current is None or estimated_at > current[1]:
+                    self.liquidity[row["token"]] = (float(row["total_liquidity_usd"]), estimated_at)
+        for row in snapshot["whales"]:
+            seen = float(row["last_seen"])
+            if seen > self.whale_seen_at.get(row["token"], 0):
+                self.whale_seen_at[row["token"]] = seen
+
+    def load(self):
+        """Carga inicial síncrona. Devuelve True si se pudo leer la BD."""
+        try:
+            started = time.time()
+            self._apply_snapshot(self._fetch_snapshot())
+            self._advance_cursor(started)
+            logger.info(f"Features cargadas: {len(self.first_seen)} tokens con compras, "
+                        f"{len(self.performance)} con rendimiento, {len(self.liquidity)} con liquidez")
+            return True
+        except Exception as e:
+            logger.error(f"Error cargando features de tokens: {e}")
+            return False
+
+    async def refresh(self):
+        try:
+            started = time.time()
+            snapshot = await asyncio.to_thread(self._fetch_snapshot)
+            self._apply_snapshot(snapshot)
+            self._advance_cursor(started)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error refrescando features de tokens: {e}")
+
+    def _advance_cursor(self, started):
+        # Un minuto de solapamiento cubre commits tardíos y desfases de reloj
+        # con la BD; volver a leer una compra no cambia nada
+        self.buys_since = started - 60
+
+    def prune(self, now=None):
+        """Descarta tokens sin compras en max_age_days y datos caducados."""
+        now = now or time.time()
+        stale = [token for token, ts in self.last_seen.items() if now - ts > self.max_age]
+        for token in stale:
+            self.first_seen.pop(token, None)
+            del self.last_seen[token]
+        for token in [t for t, (_, ts) in self.liquidity.items() if now - ts > self.max_age]:
+            del self.liquidity[token]
+        for token in [t for t, ts in self.whale_seen_at.items() if now - ts > self.whale_window]:
+            del self.whale_seen_at[token]
+        self.last_prune = now
+        self.stats["pruned"] += len(stale)
+        return len(stale)
+
+    def start(self):
+        """Inicia el refresco periódico (requiere un bucle en marcha)."""
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+            if time.time() - self.last_prune > 3600:
+                pruned = self.prune()
+                if pruned:
+                    logger.info(f"Descartados {pruned} tokens sin compras recientes")
+
+    async def close(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+
+    def record_transaction(self, token, tx_type, amount_usd, timestamp=None):
+        """Actualiza las features con un trade observado."""
+        timestamp = timestamp or time.time()
+        self.stats["events"] += 1
+        if tx_type == "BUY":
+            self._record_buy(token, timestamp, timestamp)
+        if amount_usd >= self.whale_threshold and timestamp > self.whale_seen_at.get(token, 0):
+            self.whale_seen_at[token] = timestamp
+
+    def _record_buy(self, token, first_seen, last_seen):
+        if first_seen < self.first_seen.get(token, float("inf")):
+            self.first_seen[token] = first_seen
+        if last_seen > self.last_seen.get(token, 0):
+            self.last_seen[token] = last_seen
+
+    def set_liquidity(self, token, liquidity_usd, estimated_at=None):
+        self.liquidity[token] = (liquidity_usd, estimated_at or time.time())
+
+    def get_first_seen(self, token):
+        return self.first_seen.get(token)
+
+    def get_avg_performance_1h(self, token):
+        return self.performance.get(token)
+
+    def get_liquidity_tier(self, token):
+        """Score de liquidez entre 0.5 (desconocida o baja) y 1.0 (> $100K)."""
+        entry = self.liquidity.get(token)
+        if entry is None:
+            return 0.5
+        liquidity = entry[0]
+        if liquidity > 100000:
+            return 1.0
+        if liquidity > 50000:
+            return 0.8
+        if liquidity > 20000:
+            return 0.7
+        if liquidity > 5000:
+            return 0.6
+        return 0.5
+
+    def has_whale_activity(self, token, now=None):
+        return (now or time.time()) - self.whale_seen_at.get(token, 0) < self.whale_window
+
+    def is_trending(self, token, now=None):
+        return self.trending is not None and self.trending.is_trending(token, now)
+
+    def get(self, token, now=None):
+        """Todas las features del token en un dict."""
+        return {
+            "first_seen": self.get_first_seen(token),
+            "avg_performance_1h": self.get_avg_performance_1h(token),
+            "liquidity_tier": self.get_liquidity_tier(token),
+            "whale_activity": self.has_whale_activity(token, now),
+            "trending": self.is_trending(token, now),
+        }
+
+    def get_stats(self):
+        return dict(self.stats, tokens=len(self.first_seen), with_liquidity=len(self.liquidity))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# http_client.py - Sesión aiohttp compartida por todo el proceso (DexScreener, Telegram, ...)
+
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from urllib.parse import urlsplit
+import aiohttp
+from config import Config
+
+logger = logging.getLogger("http_client")
+
+_session = None
+_session_lock = None
+_stats = {
+    "requests": 0,
+    "errors": 0,
+    "connections_created": 0,
+    "connections_reused": 0,
+    "queued": 0,
+    "queue_wait_seconds": 0.0,
+}
+_in_flight = defaultdict(int)
+
+async def _on_request_start(session, ctx, params):
+    ctx.host = params.url.host
+    _stats["requests"] += 1
+    _in_flight[ctx.host] += 1
+
+async def _on_request_end(session, ctx, params):
+    _in_flight[ctx.host] -= 1
+
+async def _on_request_exception(session, ctx, params):
+    _stats["errors"] += 1
+    _in_flight[ctx.host] -= 1
+
+async def _on_connection_queued_start(session, ctx, params):
+    ctx.queued_at = time.monotonic()
+
+async def _on_connection_queued_end(session, ctx, params):
+    _stats["queued"] += 1
+    _stats["queue_wait_seconds"] += time.monotonic() - ctx.queued_at
+
+async def _on_connection_create_end(session, ctx, params):
+    _stats["connections_created"] += 1
+
+async def _on_connection_reuseconn(session, ctx, params):
+    _stats["connections_reused"] += 1
+
+def _build_trace_config():
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    trace_config.on_connection_queued_start.append(_on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(_on_connection_queued_end)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+    return trace_config
+
+async def get_session():
+    """
+    Devuelve la sesión HTTP compartida, creándola la primera vez.
+
+    El conector limita las conexiones totales y por host, mantiene las
+    conexiones vivas entre peticiones y cachea la resolución DNS.
+
+    Returns:
+        aiohttp.ClientSession: Sesión compartida
+    """
+    global _session, _session_lock
+    if _session is not None and not _session.closed:
+        return _session
+    if _session_lock is None:
+        _session_lock = asyncio.Lock()
+    async with _session_lock:
+        if _session is None or _session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=int(Config.get("HTTP_POOL_LIMIT", 50)),
+                limit_per_host=int(Config.get("HTTP_POOL_LIMIT_PER_HOST", 10)),
+                keepalive_timeout=float(Config.get("HTTP_KEEPALIVE_TIMEOUT", 60)),
+                ttl_dns_cache=int(Config.get("HTTP_DNS_CACHE_TTL", 300)),
+                use_dns_cache=True
+            )
+            _session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=float(Config.get("HTTP_TIMEOUT", 15))),
+                trace_configs=[_build_trace_config()]
+            )
+            logger.info("Sesión HTTP compartida creada")
+    return _session
+
+async def close_session():
+    """Cierra la sesión compartida (al apagar el bot)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Sesión HTTP compartida cerrada")
+    _session = None
+
+def get_pool_stats():
+    """Métricas de uso del pool: peticiones, reutilización de conexiones, colas y peticiones en vuelo por host."""
+    opened = _stats["connections_created"] + _stats["connections_reused"]
+    return dict(
+        _stats,
+        reuse_ratio=_stats["connections_reused"] / opened if opened else 0,
+        avg_queue_wait_seconds=_stats["queue_wait_seconds"] / _stats["queued"] if _stats["queued"] else 0,
+        in_flight={host: count for host, count in _in_flight.items() if count}
+    )
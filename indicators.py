@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# indicators.py - Indicadores técnicos vectorizados sobre todos los tokens vigilados a la vez
+
+import logging
+import warnings
+import numpy as np
+
+logger = logging.getLogger("indicators")
+
+class IndicatorEngine:
+    """
+    Buffer 2-D (token x tiempo) de precios y volumen muestreados en cada tick.
+
+    Entre ticks, observe_price/observe_volume sólo actualizan la fila del
+    token (O(1)). En cada tick se escribe una columna para todos los tokens
+    a la vez y los indicadores (RSI, volatilidad realizada, VWAP, z-score de
+    volumen y pendientes de tendencia) se calculan con operaciones de numpy
+    sobre la matriz completa, sin bucles por token.
+    """
+
+    def __init__(self, window=60, rsi_period=14, initial_rows=256, idle_ticks=None, trend_threshold=0.001):
+        """
+        Args:
+            window: Número de ticks guardados por token
+            rsi_period: Periodo del RSI (en ticks)
+            initial_rows: Filas reservadas inicialmente (se duplican si hace falta)
+            idle_ticks: Ticks sin observaciones tras los que se libera la fila (por defecto `window`)
+            trend_threshold: Pendiente mínima (log-precio por tick) para considerar tendencia
+        """
+        self.window = window
+        self.rsi_period = rsi_period
+        self.idle_ticks = idle_ticks or window
+        self.trend_threshold = trend_threshold
+        self.rows = {}  # token -> fila
+        self.free_rows = []
+        self.position = 0  # Columna que escribirá el próximo tick
+        self.ticks = 0
+        self._allocate(initial_rows)
+
+    def _allocate(self, rows):
+        self.prices = np.full((rows, self.window), np.nan)
+        self.volumes = np.zeros((rows, self.window))
+        self.current_price = np.full(rows, np.nan)
+        self.current_volume = np.zeros(rows)
+        self.last_observed = np.zeros(rows, dtype=np.int64)
+        self.free_rows = list(range(rows - 1, -1, -1))
+
+    def _grow(self):
+        old_rows = self.prices.shape[0]
+        pad = old_rows
+        self.prices = np.vstack([self.prices, np.full((pad, self.window), np.nan)])
+        self.volumes = np.vstack([self.volumes, np.zeros((pad, self.window))])
+        self.current_price = np.concatenate([self.current_price, np.full(pad, np.nan)])
+        self.current_volume = np.concatenate([self.current_volume, np.zeros(pad)])
+        self.last_observed = np.concatenate([self.last_observed, np.zeros(pad, dtype=np.int64)])
+        self.free_rows.extend(range(old_rows + pad - 1, old_rows - 1, -1))
+
+    def _row(self, token):
+        row = self.rows.get(token)
+        if row is None:
+            if not self.free_rows:
+                self._grow()
+            row = self.rows[token] = self.free_rows.pop()
+            self.prices[row] = np.nan
+            self.volumes[row] = 0
+            self.current_price[row] = np.nan
+            self.current_volume[row] = 0
+        self.last_observed[row] = self.ticks
+        return row
+
+    def observe_price(self, token, price):
+        if price and price > 0:
+            row = self._row(token)  # Puede redimensionar los arrays
+            self.current_price[row] = price
+
+    def observe_volume(self, token, amount_usd):
+        row = self._row(token)
+        self.current_volume[row] += amount_usd
+
+    def __len__(self):
+        return len(self.rows)
+
+    def tick(self):
+        """
+        Cierra el intervalo actual para todos los tokens y calcula sus indicadores.
+
+        Returns:
+            list: Un dict por token con suficientes muestras
+                  (token, rsi, volatility, vwap, volume_zscore, price_slope,
+                   volume_slope, price_trend, volume_trend)
+        """
+        # Tokens sin observaciones recientes liberan su fila
+        for token, row in list(self.rows.items()):
+            if self.ticks - self.last_observed[row] > self.idle_ticks:
+                del self.rows[token]
+                self.free_rows.append(row)
+
+        # Nueva columna: precio observado o, si no hubo, el de la columna anterior
+        previous = self.prices[:, (self.position - 1) % self.window]
+        column = np.where(np.isnan(self.current_price), previous, self.current_price)
+        self.prices[:, self.position] = column
+        self.volumes[:, self.position] = self.current_volume
+        self.current_price[:] = np.nan
+        self.current_volume[:] = 0
+        self.position = (self.position + 1) % self.window
+        self.ticks += 1
+
+        if not self.rows:
+            return []
+        tokens = list(self.rows)
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(tokens))
+        order = (self.position + np.arange(self.window)) % self.window
+        prices = self.prices[np.ix_(rows, order)]
+        volumes = self.volumes[np.ix_(rows, order)]
+        return self._compute(tokens, prices, volumes)
+
+    def _compute(self, tokens, prices, volumes):
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Filas sin muestras suficientes
+            samples = np.sum(~np.isnan(prices), axis=1)
+            log_prices = np.log(prices)
+            returns = np.diff(log_prices, axis=1)
+
+            # RSI (medias simples de ganancias/pérdidas en los últimos rsi_period ticks)
+            recent = returns[:, -self.rsi_period:]
+            gains = np.nanmean(np.where(recent > 0, recent, 0.0), axis=1)
+            losses = np.nanmean(np.where(recent < 0, -recent, 0.0), axis=1)
+            rsi = np.where(losses > 0, 100 - 100 / (1 + gains / losses), np.where(gains > 0, 100.0, 50.0))
+
+            # Volatilidad realizada de la ventana, en %
+            volatility = np.nanstd(returns, axis=1) * np.sqrt(np.sum(~np.isnan(returns), axis=1)) * 100
+
+            # VWAP sobre la ventana (sólo intervalos con volumen y precio)
+            weighted = np.where(np.isnan(prices), 0.0, prices * volumes)
+            volume_sum = np.where(np.isnan(prices), 0.0, volumes).sum(axis=1)
+            vwap = np.where(volume_sum > 0, weighted.sum(axis=1) / volume_sum, np.nan)
+
+            # Z-score del volumen del último tick frente a los anteriores
+            history = volumes[:, :-1]
+            volume_std = history.std(axis=1)
+            volume_zscore = np.where(volume_std > 0, (volumes[:, -1] - history.mean(axis=1)) / volume_std, 0.0)
+
+            price_slope = self._slopes(log_prices)
+            volume_slope = self._slopes(np.log1p(volumes))
+
+        valid = samples > self.rsi_period
+        results = []
+        for i in np.flatnonzero(valid):
+            results.append({
+                "token": tokens[i],
+                "rsi": float(rsi[i]),
+                "volatility": float(volatility[i]),
+                "vwap": None if np.isnan(vwap[i]) else float(vwap[i]),
+                "volume_zscore": float(volume_zscore[i]),
+                "price_slope": float(price_slope[i]),
+                "volume_slope": float(volume_slope[i]),
+                "price_trend": self._trend_label(price_slope[i]),
+                "volume_trend": self._trend_label(volume_slope[i]),
+            })
+        return results
+
+    def _slopes(self, values):
+        """Pendiente de mínimos cuadrados por fila, ignorando NaN."""
+        mask = ~np.isnan(values)
+        x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+        n = mask.sum(axis=1)
+        y = np.where(mask, values, 0.0)
+        xm = np.where(mask, x, 0.0).sum(axis=1) / np.maximum(n, 1)
+        ym = y.sum(axis=1) / np.maximum(n, 1)
+        dx = np.where(mask, x - xm[:, None], 0.0)
+        dy = np.where(mask, y - ym[:, None], 0.0)
+        denominator = (dx * dx).sum(axis=1)
+        return np.where(denominator > 0, (dx * dy).sum(axis=1) / np.where(denominator > 0, denominator, 1), 0.0)
+
+    def _trend_label(self, slope):
+        if slope > self.trend_threshold:
+            return "up"
+        if slope < -self.trend_threshold:
+            return "down"
+        return "flat"
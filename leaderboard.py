@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# leaderboard.py - Ranking incremental de wallets por score con decay, sin reordenar en cada consulta
+
+import math
+import heapq
+import time
+
+DAY_SECONDS = 24 * 3600
+
+class ScoreLeaderboard:
+    """
+    Top-N de wallets por score actual (con decay), mantenido en cada cambio.
+
+    Todos los scores decaen con el mismo factor f por día, así que el orden
+    entre dos wallets no cambia con el paso del tiempo. Cada wallet se
+    guarda con una clave invariante:
+
+        clave = ln(score) - ((last_ts - origin) / día) * ln(f)
+
+    y el score actual es exp(clave + ((ahora - origin) / día) * ln(f)), una
+    transformación monótona común a todas. El heap usa borrado perezoso: una
+    actualización añade una entrada nueva y las obsoletas se descartan al
+    aparecer en la cima (o al compactar).
+    """
+
+    def __init__(self, decay_factor, origin=None):
+        """
+        Args:
+            decay_factor: Factor de decay diario de los scores (0-1]
+            origin: Epoch de referencia de las claves (por defecto, ahora)
+        """
+        self.decay_factor = decay_factor
+        self.log_decay = math.log(decay_factor)
+        self.origin = time.time() if origin is None else origin
+        self.keys = {}  # wallet -> clave vigente
+        self.heap = []  # (-clave, wallet), con entradas obsoletas
+
+    def _key(self, score, timestamp):
+        if score <= 0:
+            return -math.inf
+        return math.log(score) - (timestamp - self.origin) / DAY_SECONDS * self.log_decay
+
+    def update(self, wallet, score, timestamp):
+        """Registra el score de una wallet tras un cambio (O(log W))."""
+        key = self._key(score, timestamp)
+        if self.keys.get(wallet) == key:
+            return
+        self.keys[wallet] = key
+        heapq.heappush(self.heap, (-key, wallet))
+        if len(self.heap) > 2 * len(self.keys) + 64:
+            self._compact()
+
+    def remove(self, wallet):
+        self.keys.pop(wallet, None)
+
+    def rebuild(self, scores, decay_factor=None):
+        """
+        Reconstruye el ranking desde {wallet: (score, last_ts)}, p. ej. tras
+        la carga inicial o si cambia el factor de decay.
+        """
+        if decay_factor is not None:
+            self.decay_factor = decay_factor
+            self.log_decay = math.log(decay_factor)
+        self.keys = {wallet: self._key(score, ts) for wallet, (score, ts) in scores.items()}
+        self._compact()
+
+    def _compact(self):
+        self.heap = [(-key, wallet) for wallet, key in self.keys.items()]
+        heapq.heapify(self.heap)
+
+    def top(self, n):
+        """
+        Las n wallets con mayor score actual, de mayor a menor.
+        O((n + entradas obsoletas) log W); las obsoletas no vuelven al heap.
+        """
+        result = []
+        while self.heap and len(result) < n:
+            entry = heapq.heappop(self.heap)
+            wallet = entry[1]
+            if self.keys.get(wallet) == -entry[0] and (not result or result[-1][1] != wallet):
+                result.append(entry)
+        for entry in result:
+            heapq.heappush(self.heap, entry)
+        return [wallet for _, wallet in result]
+
+    def current_score(self, wallet, now=None):
+        """Score actual reconstruido desde la clave (None si la wallet no está)."""
+        key = self.keys.get(wallet)
+        if key is None:
+            return None
+        return math.exp(key + ((now or time.time()) - self.origin) / DAY_SECONDS * self.log_decay)
+
+    def __len__(self):
+        return len(self.keys)
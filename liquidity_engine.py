@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# liquidity_engine.py - Estimación de slippage y profundidad con un modelo constant-product agregado por pools
+
+import time
+import asyncio
+import logging
+import numpy as np
+import db
+from config import Config
+
+logger = logging.getLogger("liquidity_engine")
+
+# Tamaños de trade (USD) que se guardan en token_liquidity
+REFERENCE_SIZES = (1000.0, 10000.0)
+
+def estimate_price_impact(liquidities, sizes):
+    """
+    Slippage de compra (fracción 0-1) para cada tamaño de trade, repartiendo
+    la orden entre todos los pools.
+
+    Cada pool se modela como x*y=k con la mitad de su liquidez USD en el lado
+    de cotización. Repartir la orden de forma óptima entre pools con el mismo
+    precio spot (proporcional a sus reservas) equivale a un único pool con la
+    suma de las reservas, así que el impacto agregado es s / (X + s). También
+    se devuelve el impacto en el mejor pool individual (matriz tamaños x pools).
+
+    Args:
+        liquidities: Liquidez USD de cada pool
+        sizes: Tamaños de trade en USD
+
+    Returns:
+        tuple: (impacto agregado por tamaño, impacto en el mejor pool por tamaño)
+    """
+    reserves = np.asarray(liquidities, dtype=float) / 2
+    reserves = reserves[reserves > 0]
+    sizes = np.asarray(sizes, dtype=float)
+    if reserves.size == 0:
+        ones = np.ones_like(sizes)
+        return ones, ones
+    aggregated = sizes / (reserves.sum() + sizes)
+    per_pool = sizes[:, None] / (reserves[None, :] + sizes[:, None])
+    return aggregated, per_pool.min(axis=1)
+
+def max_size_for_impact(liquidities, max_impact):
+    """Mayor trade (USD) cuyo impacto agregado no supera `max_impact` (fracción 0-1)."""
+    reserves = np.asarray(liquidities, dtype=float) / 2
+    total = reserves[reserves > 0].sum()
+    if total <= 0 or max_impact <= 0:
+        return 0.0
+    return float(total * max_impact / (1 - max_impact))
+
+class LiquidityEngine:
+    """
+    Liquidez por token a partir de todos sus pools en DexScreener.
+
+    Los resultados se cachean por token durante cache_ttl segundos para que
+    RiskManager los consulte sin red, y se acumulan para guardarse en
+    token_liquidity con un único INSERT cada flush_interval segundos.
+    """
+
+    def __init__(self, dexscreener_client, cache_ttl=300, flush_interval=60, max_pools=30, on_estimate=None):
+        """
+        Args:
+            dexscreener_client: Cliente de DexScreener (get_token_pairs)
+            cache_ttl: Segundos que se reutiliza una estimación
+            flush_interval: Segundos entre escrituras en token_liquidity
+            max_pools: Pools por token que se tienen en cuenta
+            on_estimate: Callback(token, resultado) opcional tras cada estimación nueva
+        """
+        self.dexscreener_client = dexscreener_client
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.max_pools = max_pools
+        self.on_estimate = on_estimate
+        self.max_impact = float(Config.get("SLIPPAGE_WARNING_THRESHOLD", "10")) / 100
+        self.cache = {}  # token -> (timestamp, resultado)
+        self.pending_rows = {}  # token -> fila para token_liquidity (la última estimación gana)
+        self.flush_task = None
+        self.stats = {"estimates": 0, "cache_hits": 0, "rows_saved": 0, "warnings": 0}
+
+    def get(self, token, now=None):
+        """Última estimación cacheada del token (None si no hay o ha caducado)."""
+        entry = self.cache.get(token)
+        if entry is None:
+            return None
+        if (now or time.time()) - entry[0] > self.cache_ttl:
+            return None
+        return entry[1]
+
+    async def get_liquidity(self, token):
+        """
+        Estimación de liquidez del token, usando la caché si está vigente.
+
+        Returns:
+            dict: total_liquidity_usd, volume_24h, slippage_1k, slippage_10k
+                  (en %), best_pool_slippage_10k, max_trade_size, dex_sources,
+                  pools, slippage_warning; o None si no hay pools
+        """
+        cached = self.get(token)
+        if cached is not None:
+            self.stats["cache_hits"] += 1
+            return cached
+        pairs = await self.dexscreener_client.get_token_pairs(token, limit=self.max_pools)
+        if not pairs:
+            return None
+        result = self.estimate(pairs)
+        self.cache[token] = (time.time(), result)
+        self.pending_rows[token] = dict(result, token=token)
+        self.stats["estimates"] += 1
+        if self.on_estimate is not None:
+            self.on_estimate(token, result)
+        if result["slippage_warning"]:
+            self.stats["warnings"] += 1
+            logger.info(f"Slippage alto en {token}: {result['slippage_10k']:.2f}% para $10K "
+                        f"(liquidez ${result['total_liquidity_usd']:,.0f})")
+        return result
+
+    def estimate(self, pairs):
+        """Calcula la estimación a partir de la salida de get_token_pairs."""
+        liquidities = np.array([pair.get("liquidity") or 0 for pair in pairs], dtype=float)
+        aggregated, best_pool = estimate_price_impact(liquidities, REFERENCE_SIZES)
+        slippage_1k, slippage_10k = (float(v) * 100 for v in aggregated)
+        return {
+            "total_liquidity_usd": float(liquidities.sum()),
+            "volume_24h": float(sum(pair.get("volume_24h") or 0 for pair in pairs)),
+            "slippage_1k": slippage_1k,
+            "slippage_10k": slippage_10k,
+            "best_pool_slippage_10k": float(best_pool[1]) * 100,
+            "max_trade_size": max_size_for_impact(liquidities, self.max_impact),
+            "dex_sources": sorted({pair.get("dex") for pair in pairs if pair.get("dex")}),
+            "pools": int((liquidities > 0).sum()),
+            "slippage_warning": slippage_10k > self.max_impact * 100,
+        }
+
+    def start(self):
+        """Inicia el guardado periódico en token_liquidity (requiere un bucle en marcha)."""
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        """Guarda las estimaciones acumuladas en un único INSERT y purga la caché caducada."""
+        cutoff = time.time() - self.cache_ttl
+        for token in [t for t, (ts, _) in self.cache.items() if ts < cutoff]:
+            del self.cache[token]
+        if not self.pending_rows:
+            return
+        rows, self.pending_rows = list(self.pending_rows.values()), {}
+        try:
+            self.stats["rows_saved"] += await asyncio.to_thread(db.save_token_liquidity_batch, rows)
+        except Exception as e:
+            logger.error(f"Error guardando liquidez de {len(rows)} tokens: {e}")
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+
+    def get_stats(self):
+        return dict(self.stats, cached=len(self.cache), pending=len(self.pending_rows))
@@ -10,6 +10,8 @@ import traceback
 from datetime import datetime, timedelta
 from config import Config
 import db
+import http_client
+import settings_snapshot
 
 # Configurar logging
 logging.basicConfig(
@@ -32,6 +34,10 @@ from transaction_manager import TransactionManager
 # Componentes avanzados
 from market_metrics import MarketMetricsAnalyzer
 from token_analyzer import TokenAnalyzer
+from liquidity_engine import LiquidityEngine
+from trending_poller import TrendingPoller
+from feature_store import TokenFeatureStore
+from position_ledger import PositionLedger
 from trader_profiler import TraderProfiler
 
 # Utilidades
@@ -56,6 +62,10 @@ async def init_database():
         if not db.init_db():
             logger.critical("No se pudo inicializar la base de datos. Abortando.")
             return False
+        # Arranca el replayer para volcar escrituras pendientes de ejecuciones anteriores
+        db.get_spill_journal()
+        # Ajustes tipados para los caminos calientes (incluye bot_settings)
+        settings_snapshot.reload()
         return True
     except Exception as e:
         logger.critical(f"Error inicializando base de datos: {e}")
@@ -65,35 +75,88 @@ async def init_components():
     """Inicializa todos los componentes necesarios para el bot"""
     components = {}
     
+    # Recarga del snapshot de ajustes cuando cambia bot_settings
+    settings_watcher = settings_snapshot.SettingsWatcher(interval=float(Config.get("SETTINGS_POLL_INTERVAL", 30)))
+    settings_watcher.start()
+    
     # Inicializar componentes de mercado y análisis
     logger.info("🏗️ Inicializando componentes de análisis de mercado...")
     dexscreener_client = DexScreenerClient()
+    dexscreener_client.blocklist.load()
+    dexscreener_client.blocklist.start()
+    dexscreener_client.start_snapshots()
     market_metrics = MarketMetricsAnalyzer(dexscreener_client=dexscreener_client)
     token_analyzer = TokenAnalyzer(dexscreener_client=dexscreener_client)
+    token_analyzer.start()
+    trending_poller = TrendingPoller(
+        dexscreener_client,
+        interval=float(Config.get("TRENDING_POLL_INTERVAL", 300)),
+        ttl=float(Config.get("TRENDING_TTL_HOURS", 6)) * 3600
+    )
+    trending_poller.load()
+    trending_poller.start()
+    
+    # Features por token para el scoring (sin consultas a la BD por trade)
+    feature_store = TokenFeatureStore(
+        trending=trending_poller,
+        refresh_interval=float(Config.get("FEATURE_STORE_REFRESH_SECONDS", 300))
+    )
+    feature_store.load()
+    feature_store.start()
+    liquidity_engine = LiquidityEngine(
+        dexscreener_client,
+        cache_ttl=float(Config.get("LIQUIDITY_CACHE_TTL", 300)),
+        flush_interval=float(Config.get("LIQUIDITY_FLUSH_INTERVAL", 60)),
+        on_estimate=lambda token, result: feature_store.set_liquidity(token, result["total_liquidity_usd"])
+    )
+    liquidity_engine.start()
     
-    # Inicializar gestores de wallets
+    # Inicializar gestores de wallets (el scoring resuelve nombres con WalletManager)
     logger.info("👛 Inicializando gestores de wallets...")
     wallet_tracker = WalletTracker()  # Carga básica desde traders_data.json
     wallet_manager = WalletManager()  # Gestor avanzado con soporte para BD
     
+    # Posiciones por wallet/token para el PnL realizado; la cantidad se estima con el precio cacheado
+    position_ledger = PositionLedger(
+        price_lookup=lambda token: (dexscreener_client.cache.peek(token) or {}).get("price"),
+        flush_interval=float(Config.get("POSITION_LEDGER_FLUSH_INTERVAL", 30))
+    )
+    position_ledger.load()
+    position_ledger.start()
+    scoring_system = ScoringSystem(
+        trending=trending_poller,
+        features=feature_store,
+        ledger=position_ledger,
+        wallet_manager=wallet_manager,
+        batch_window=float(Config.get("SCORE_BATCH_WINDOW", 0.05))
+    )
+    scoring_system.start()
+    
     # Inicializar API de datos en tiempo real y procesamiento
     logger.info("🔄 Inicializando API de datos en tiempo real...")
     cielo_api = CieloAPI()
-    trader_profiler = TraderProfiler()
+    trader_profiler = TraderProfiler(scoring_system=scoring_system)
     
     # Inicializar lógica de señales
     logger.info("🚨 Inicializando lógica de señales...")
-    signal_logic = SignalLogic(dexscreener_client=dexscreener_client)
+    signal_logic = SignalLogic(
+        dexscreener_client=dexscreener_client,
+        market_metrics=market_metrics,
+        token_analyzer=token_analyzer,
+        liquidity_engine=liquidity_engine
+    )
     
     # Inicializar el gestor de transacciones con los componentes apropiados
     transaction_manager = TransactionManager(
         signal_logic=signal_logic,
         wallet_tracker=wallet_tracker,
+        scoring_system=scoring_system,
         wallet_manager=wallet_manager
     )
     transaction_manager.cielo_adapter = cielo_api  # Asignar el adaptador después de la inicialización
     
     components = {
+        'settings_watcher': settings_watcher,
         'dexscreener_client': dexscreener_client,
         'wallet_tracker': wallet_tracker,
         'wallet_manager': wallet_manager,
@@ -102,6 +165,11 @@ async def init_components():
         'signal_logic': signal_logic,
         'market_metrics': market_metrics,
         'token_analyzer': token_analyzer,
+        'liquidity_engine': liquidity_engine,
+        'trending_poller': trending_poller,
+        'feature_store': feature_store,
+        'scoring_system': scoring_system,
+        'position_ledger': position_ledger,
         'trader_profiler': trader_profiler
     }
     
@@ -152,6 +220,8 @@ async def cleanup_resources(components):
                 logger.info(f"✅ {name} cerrado correctamente")
             except Exception as e:
                 logger.error(f"Error cerrando {name}: {e}")
+    await http_client.close_session()
+    db.close_spill_journal()
 
 async def main_loop(components, all_wallets):
     """Bucle principal de funcionamiento del bot"""
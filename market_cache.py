@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# market_cache.py - Caché LRU acotada de datos de mercado con ventanas fresh/stale
+
+import os
+import json
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("market_cache")
+
+FRESH = "fresh"
+STALE = "stale"
+
+class MarketDataCache:
+    """
+    Caché LRU de datos de mercado por token.
+
+    - Dentro de fresh_ttl una entrada se sirve tal cual.
+    - Entre fresh_ttl y stale_ttl se sirve al momento, pero el llamador debe
+      lanzar un refresco en segundo plano (stale-while-revalidate).
+    - Pasado stale_ttl la entrada se considera ausente.
+    Al superar max_entries se expulsa la entrada usada hace más tiempo.
+    """
+
+    def __init__(self, max_entries=5000, fresh_ttl=60, stale_ttl=900):
+        self.max_entries = max_entries
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.entries = OrderedDict()  # token -> (data, timestamp)
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stale_on_error": 0, "evictions": 0}
+
+    def lookup(self, token, now=None):
+        """
+        Busca un token y contabiliza el resultado.
+
+        Returns:
+            tuple: (data, estado) con estado FRESH, STALE o None si no hay dato utilizable
+        """
+        now = now or time.time()
+        entry = self.entries.get(token)
+        if entry is not None:
+            data, timestamp = entry
+            age = now - timestamp
+            if age < self.stale_ttl:
+                self.entries.move_to_end(token)
+                if age < self.fresh_ttl:
+                    self.stats["hits"] += 1
+                    return data, FRESH
+                self.stats["stale_hits"] += 1
+                return data, STALE
+            del self.entries[token]
+        self.stats["misses"] += 1
+        return None, None
+
+    def get_stale(self, token, now=None):
+        """Último dato real dentro de la ventana stale, para servirlo cuando falla la API."""
+        entry = self.entries.get(token)
+        if entry is None or (now or time.time()) - entry[1] >= self.stale_ttl:
+            return None
+        self.stats["stale_on_error"] += 1
+        return entry[0]
+
+    def peek(self, token, now=None):
+        """Dato dentro de la ventana stale sin contabilizarlo ni moverlo en el LRU (lecturas auxiliares)."""
+        entry = self.entries.get(token)
+        if entry is None or (now or time.time()) - entry[1] >= self.stale_ttl:
+            return None
+        return entry[0]
+
+    def set(self, token, data, timestamp=None):
+        self.entries[token] = (data, timestamp or time.time())
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        """Copia de las entradas (token, data, timestamp) en orden LRU, para serializarla fuera del bucle."""
+        return [(token, data, timestamp) for token, (data, timestamp) in self.entries.items()]
+
+    @staticmethod
+    def write_snapshot(path, entries):
+        """Escribe un snapshot de forma atómica (archivo temporal + rename)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "saved_at": time.time(), "entries": entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load(self, path, now=None):
+        """
+        Carga un snapshot conservando los timestamps originales; las entradas
+        ya fuera de la ventana stale se descartan.
+
+        Returns:
+            int: Número de entradas cargadas
+        """
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path) as f:
+                entries = json.load(f).get("entries", [])
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer el snapshot de caché {path}: {e}")
+            return 0
+        now = now or time.time()
+        loaded = 0
+        for token, data, timestamp in entries:
+            if now - timestamp < self.stale_ttl:
+                self.set(token, data, timestamp)
+                loaded += 1
+        return loaded
+
+    def clear(self):
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            size=len(self.entries),
+            hit_rate=self.stats["hits"] / lookups if lookups else 0,
+            stale_rate=self.stats["stale_hits"] / lookups if lookups else 0,
+            miss_rate=self.stats["misses"] / lookups if lookups else 0
+        )
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# position_ledger.py - Posiciones abiertas por (wallet, token) en lotes FIFO con PnL realizado sin consultas a la BD
+
+import time
+import asyncio
+import logging
+from collections import deque
+import db
+
+logger = logging.getLogger("position_ledger")
+
+class PositionLedger:
+    """
+    Lotes de compra por (wallet, token) con su coste, para calcular el PnL
+    realizado de cada venta en memoria.
+
+    - Cada compra añade un lote [cantidad, coste USD, timestamp].
+    - Cada venta consume lotes en orden FIFO; un lote consumido a medias
+      conserva la parte proporcional de su coste (ventas parciales).
+    - Las operaciones cerradas se acumulan y se guardan en wallet_profits (y
+      wallet_profit_stats) con un único INSERT cada flush_interval segundos.
+
+    Las transacciones sólo traen el monto en USD. La cantidad de tokens se
+    toma de tx_data["token_amount"] si viene o se estima con el precio de
+    price_lookup(token). Una compra sin precio en caché (primer trade de un
+    token nuevo, cuyo precio trae poco después signal_logic) se valora con
+    el primer precio que aparezca en los price_wait segundos siguientes. Sin
+    cantidades (de la venta o de algún lote) no se puede calcular el PnL: la
+    venta consume lotes en FIFO por coste hasta su monto en USD y no se
+    registra como operación cerrada.
+
+    Al arrancar, load() reconstruye las posiciones abiertas reproduciendo las
+    transacciones de los últimos max_age_days días (sin precios históricos,
+    así que esos lotes no tienen cantidad).
+    """
+
+    def __init__(self, price_lookup=None, flush_interval=30, max_lots=20, max_age_days=30, price_wait=60):
+        """
+        Args:
+            price_lookup: Callable(token) -> precio USD o None, sin red
+            price_wait: Segundos que una compra sin precio espera a que lo haya
+            flush_interval: Segundos entre escrituras en wallet_profits
+            max_lots: Lotes por posición; al superarlos se fusionan los dos más antiguos
+            max_age_days: Días sin operaciones tras los que se descarta una posición
+        """
+        self.price_lookup = price_lookup
+        self.flush_interval = flush_interval
+        self.max_lots = max_lots
+        self.max_age = max_age_days * 24 * 3600
+        self.positions = {}  # (wallet, token) -> deque de lotes [cantidad o None, coste USD, timestamp]
+        self.last_trade = {}  # (wallet, token) -> timestamp de la última operación
+        self.pending_rows = []  # operaciones cerradas pendientes de guardar
+        self.price_wait = price_wait
+        self.unpriced = deque()  # (clave, lote, coste, timestamp) de compras sin precio, por orden de llegada
+        self.last_prune = time.time()
+        self.flush_task = None
+        self.stats = {"buys": 0, "sells": 0, "closed": 0, "unmatched_sells": 0, "unpriced_sells": 0, "late_priced": 0, "rows_saved": 0}
+
+    def _quantity(self, token, amount_usd, token_amount=None):
+        if token_amount:
+            return float(token_amount)
+        if self.price_lookup is not None:
+            price = self.price_lookup(token)
+            if price:
+                return amount_usd / price
+        return None
+
+    def load(self):
+        """
+        Reconstruye las posiciones abiertas desde transactions (lectura única
+        al arrancar). Las ventas reproducidas no generan filas nuevas en
+        wallet_profits. Devuelve el número de posiciones abiertas.
+        """
+        try:
+            rows = db.get_position_transactions(self.max_age / (24 * 3600))
+        except Exception as e:
+            logger.error(f"Error cargando posiciones abiertas: {e}")
+            return 0
+        for row in rows:
+            key = (row["wallet"], row["token"])
+            amount_usd = float(row["amount_usd"] or 0)
+            timestamp = float(row["created_at"])
+            if row["tx_type"] == "BUY":
+                self._open_lot(key, None, amount_usd, timestamp)
+            else:
+                self._close_lots(key, amount_usd, timestamp, None, record=False)
+        logger.info(f"Posiciones abiertas reconstruidas: {len(self.positions)} ({len(rows)} transacciones)")
+        return len(self.positions)
+
+    def record_buy(self, wallet, token, amount_usd, timestamp, token_amount=None):
+        """Abre un lote nuevo en la posición de la wallet."""
+        self._price_pending()
+        key = (wallet, token)
+        quantity = self._quantity(token, amount_usd, token_amount)
+        lot = self._open_lot(key, quantity, amount_usd, timestamp)
+        if lot is not None and quantity is None and self.price_lookup is not None:
+            self.unpriced.append((key, lot, amount_usd, time.time()))
+        self.stats["buys"] += 1
+
+    def _open_lot(self, key, quantity, amount_usd, timestamp):
+        if amount_usd <= 0:
+            return None
+        lots = self.positions.get(key)
+        if lots is None:
+            lots = self.positions[key] = deque()
+        lot = [quantity, amount_usd, timestamp]
+        lots.append(lot)
+        if len(lots) > self.max_lots:
+            self._merge_oldest(lots)
+        self.last_trade[key] = timestamp
+        return lot
+
+    def _price_pending(self, now=None):
+        """
+        Valora las compras sin precio en cuanto price_lookup lo tiene. Un lote
+        ya consumido, fusionado o reducido se deja sin cantidad.
+        """
+        if not self.unpriced:
+            return
+        now = now or time.time()
+        waiting = deque()
+        for entry in self.unpriced:
+            key, lot, cost, queued_at = entry
+            if lot[0] is not None or lot[1] != cost or not any(l is lot for l in self.positions.get(key, ())):
+                continue
+            price = self.price_lookup(key[1])
+            if price:
+                lot[0] = cost / price
+                self.stats["late_priced"] += 1
+            elif now - queued_at < self.price_wait:
+                waiting.append(entry)
+        self.unpriced = waiting
+
+    @staticmethod
+    def _merge_oldest(lots):
+        """Fusiona los dos lotes más antiguos (se consumen juntos en FIFO de todos modos)."""
+        first = lots.popleft()
+        second = lots[0]
+        quantity = first[0] + second[0] if first[0] is not None and second[0] is not None else None
+        cost = first[1] + second[1]
+        # Timestamp ponderado por coste para conservar el tiempo de retención medio
+        second[2] = (first[2] * first[1] + second[2] * second[1]) / cost
+        second[0], second[1] = quantity, cost
+
+    def record_sell(self, wallet, token, amount_usd, timestamp, token_amount=None):
+        """
+        Consume lotes de la posición y registra la operación cerrada.
+
+        Returns:
+            dict: buy_price (coste), sell_price, profit_percent, hold_time_hours,
+                  buy_timestamp; None si no había posición abierta o faltan cantidades
+        """
+        self.stats["sells"] += 1
+        self._price_pending()
+        key = (wallet, token)
+        if not self.positions.get(key) or amount_usd <= 0:
+            self.stats["unmatched_sells"] += 1
+            return None
+        return self._close_lots(key, amount_usd, timestamp, self._quantity(token, amount_usd, token_amount))
+
+    def _close_lots(self, key, amount_usd, timestamp, quantity, record=True):
+        lots = self.positions.get(key)
+        if not lots or amount_usd <= 0:
+            return None
+        if quantity is None or any(lot[0] is None for lot in lots):
+            # Sin cantidades no hay PnL: se reduce la posición por coste y no se registra
+            self._consume_cost(lots, amount_usd)
+            self._touch(key, lots, timestamp)
+            if record:
+                self.stats["unpriced_sells"] += 1
+            return None
+
+        consumed = []
+        remaining = quantity
+        while lots and remaining > 0:
+            lot = lots[0]
+            if lot[0] <= remaining:
+                remaining -= lot[0]
+                consumed.append((lot[1], lot[2]))
+                lots.popleft()
+            else:
+                cost = lot[1] * remaining / lot[0]
+                consumed.append((cost, lot[2]))
+                lot[0] -= remaining
+                lot[1] -= cost
+                remaining = 0
+        # Si se vende más de lo comprado, sólo cuenta la parte con coste conocido
+        proceeds = amount_usd * (quantity - remaining) / quantity
+        self._touch(key, lots, timestamp)
+
+        cost = sum(c for c, _ in consumed)
+        if cost <= 0:
+            return None
+        hold_seconds = sum(c * (timestamp - ts) for c, ts in consumed) / cost
+        result = {
+            "wallet": key[0],
+            "token": key[1],
+            "buy_price": cost,
+            "sell_price": proceeds,
+            "profit_percent": (proceeds - cost) / cost * 100,
+            "hold_time_hours": max(hold_seconds, 0) / 3600,
+            "buy_timestamp": min(ts for _, ts in consumed),
+            "sell_timestamp": timestamp,
+        }
+        if record:
+            self.pending_rows.append(result)
+            self.stats["closed"] += 1
+        return result
+
+    @staticmethod
+    def _consume_cost(lots, amount_usd):
+        """Consume lotes en FIFO por coste hasta amount_usd (ventas sin cantidades)."""
+        remaining = amount_usd
+        while lots and remaining > 0:
+            lot = lots[0]
+            if lot[1] <= remaining:
+                remaining -= lot[1]
+                lots.popleft()
+            else:
+                if lot[0] is not None:
+                    lot[0] *= (lot[1] - remaining) / lot[1]
+                lot[1] -= remaining
+                remaining = 0
+
+    def _touch(self, key, lots, timestamp):
+        if not lots:
+            del self.positions[key]
+            self.last_trade.pop(key, None)
+        else:
+            self.last_trade[key] = timestamp
+
+    def get_position(self, wallet, token):
+        """Cantidad (None si es desconocida) y coste USD abiertos de la posición."""
+        lots = self.positions.get((wallet, token))
+        if not lots:
+            return None
+        quantities = [lot[0] for lot in lots]
+        return {
+            "quantity": sum(quantities) if None not in quantities else None,
+            "cost_usd": sum(lot[1] for lot in lots),
+            "lots": len(lots),
+        }
+
+    def prune(self, now=None):
+        """Descarta posiciones sin operaciones en max_age_days."""
+        now = now or time.time()
+        stale = [key for key, ts in self.last_trade.items() if now - ts > self.max_age]
+        for key in stale:
+            self.positions.pop(key, None)
+            del self.last_trade[key]
+        self.last_prune = now
+        return len(stale)
+
+    def start(self):
+        """Inicia el guardado periódico en wallet_profits (requiere un bucle en marcha)."""
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self._price_pending()
+            await self.flush()
+            if time.time() - self.last_prune > 3600:
+                pruned = self.prune()
+                if pruned:
+                    logger.info(f"Descartadas {pruned} posiciones sin actividad")
+
+    async def flush(self):
+        """Guarda las operaciones cerradas acumuladas en un único INSERT."""
+        if not self.pending_rows:
+            return
+        rows, self.pending_rows = self.pending_rows, []
+        try:
+            self.stats["rows_saved"] += await asyncio.to_thread(db.save_wallet_profits_batch, rows)
+        except Exception as e:
+            # Se reintentan en el siguiente ciclo; el INSERT ignora duplicados
+            self.pending_rows = rows + self.pending_rows
+            logger.error(f"Error guardando {len(rows)} operaciones cerradas: {e}")
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+
+    def get_stats(self):
+        return dict(self.stats, positions=len(self.positions), pending=len(self.pending_rows),
+                    unpriced=len(self.unpriced))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# rate_limiter.py - Token bucket compartido por proceso para limitar peticiones a APIs externas
+
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger("rate_limiter")
+
+class TokenBucket:
+    """
+    Token bucket asíncrono con acquire O(1).
+
+    Los permisos se reponen de forma continua a `rate` por segundo hasta
+    `capacity`. Los llamadores esperan en el orden en que llegaron: el lock
+    de asyncio es FIFO y el primero de la cola lo retiene mientras duerme
+    lo justo para que se reponga su permiso.
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate: Permisos repuestos por segundo
+            capacity: Ráfaga máxima de permisos acumulables
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self, permits=1):
+        """Espera hasta disponer de `permits` permisos y los consume."""
+        start = time.monotonic()
+        async with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens < permits:
+                await asyncio.sleep((permits - self.tokens) / self.rate)
+                self._refill(time.monotonic())
+            self.tokens -= permits
+        waited = time.monotonic() - start
+        self.stats["acquired"] += 1
+        if waited > 0.001:
+            self.stats["waited"] += 1
+            self.stats["wait_seconds"] += waited
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+            logger.debug(f"Rate limit aplicado: {waited:.2f}s de espera")
+
+    def available(self):
+        """Permisos disponibles ahora mismo (O(1), sin consumir)."""
+        self._refill(time.monotonic())
+        return self.tokens
+
+    def get_stats(self):
+        acquired = self.stats["acquired"]
+        return dict(
+            self.stats,
+            available=self.tokens,
+            avg_wait_seconds=self.stats["wait_seconds"] / acquired if acquired else 0
+        )
+
+_limiters = {}
+
+def get_rate_limiter(name, rate, capacity):
+    """
+    Devuelve el limitador compartido del proceso para `name`, creándolo la
+    primera vez con la tasa y capacidad indicadas.
+
+    Args:
+        name: Identificador de la API ("dexscreener", ...)
+        rate: Permisos por segundo
+        capacity: Ráfaga máxima
+
+    Returns:
+        TokenBucket: Limitador compartido
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limiter = _limiters[name] = TokenBucket(rate, capacity)
+    return limiter
+
+def get_all_stats():
+    """Métricas de todos los limitadores del proceso."""
+    return {name: limiter.get_stats() for name, limiter in _limiters.items()}
@@ -8,10 +8,16 @@ from config import Config
 logger = logging.getLogger("risk_manager")
 
 class RiskManager:
-    def __init__(self):
+    def __init__(self, liquidity_engine=None):
         """
         Inicializa el gestor de riesgo con configuraciones básicas
+        
+        Args:
+            liquidity_engine: LiquidityEngine opcional; si tiene una estimación
+                cacheada del token, el tamaño se limita a la profundidad que
+                no supera el umbral de slippage
         """
+        self.liquidity_engine = liquidity_engine
         # Configuración de riesgo
         self.max_portfolio_risk = float(Config.get("max_portfolio_risk", "0.10"))  # 10% máximo del portfolio
         self.max_trade_risk = float(Config.get("max_trade_risk", "0.02"))  # 2% máximo por trade
@@ -48,8 +54,12 @@ class RiskManager:
             # Ajustar por capitalización (no más del 0.1% del market cap)
             max_by_mcap = market_cap * 0.001
             
+            # Ajustar por profundidad real de los pools (slippage constant-product)
+            liquidity = self.liquidity_engine.get(token) if self.liquidity_engine else None
+            max_by_liquidity = liquidity["max_trade_size"] if liquidity else float("inf")
+            
             # Tomar el mínimo de los límites
-            trade_size = min(base_risk, max_by_volume, max_by_mcap)
+            trade_size = min(base_risk, max_by_volume, max_by_mcap, max_by_liquidity)
             
             # Aplicar límites mínimos y máximos
             trade_size = max(self.min_trade_size, min(trade_size, self.max_trade_size))
@@ -58,6 +68,8 @@ class RiskManager:
             logger.info(f"  - Riesgo base: ${base_risk:.2f}")
             logger.info(f"  - Límite por volumen: ${max_by_volume:.2f}")
             logger.info(f"  - Límite por market cap: ${max_by_mcap:.2f}")
+            if liquidity:
+                logger.info(f"  - Límite por liquidez: ${max_by_liquidity:.2f} (slippage $10K: {liquidity['slippage_10k']:.2f}%)")
             logger.info(f"  - Tamaño final: ${trade_size:.2f}")
             
             return trade_size
@@ -1,22 +1,55 @@
 # scoring.py
 import time
 import math
+import asyncio
 import logging
-from config import Config
+import numpy as np
 import db
+import settings_snapshot
+from position_ledger import PositionLedger
+from leaderboard import ScoreLeaderboard
 
 logger = logging.getLogger("scoring_system")
 
 class ScoringSystem:
-    def __init__(self):
-        self.local_cache = {}  # {wallet: score}
+    def __init__(self, trending=None, features=None, ledger=None, wallet_manager=None, flush_interval=5, batch_window=0.05):
+        """
+        Args:
+            trending: TrendingPoller opcional; si se pasa, el chequeo de
+                tendencia es una consulta en memoria en lugar de una query
+            features: TokenFeatureStore opcional; si se pasa, los chequeos por
+                token (comprador temprano, calidad, ballenas) no consultan la BD
+            ledger: PositionLedger compartido (ya cargado) para el PnL de las
+                ventas; si no se pasa, se crea y carga uno propio que se
+                arranca y cierra con este
+            wallet_manager: WalletManager opcional para resolver nombres de
+                traders en memoria
+            flush_interval: Segundos entre escrituras agrupadas de scores
+            batch_window: Segundos que se acumulan trades antes de puntuarlos en lote
+        """
+        self.features = features
+        self.trending = trending
+        self.owns_ledger = ledger is None
+        self.ledger = ledger
+        if ledger is None:
+            self.ledger = PositionLedger()
+            self.ledger.load()
+        self.scores = {}  # {wallet: (score, timestamp del último cambio)}, decae al leerse
+        self.leaderboard = ScoreLeaderboard(self.decay_factor)
+        self.wallet_manager = wallet_manager
         self.last_cache_cleanup = time.time()
         self.wallet_tx_count = {}  # {wallet: count}
         self.boosters = {}  # {wallet: {multiplier, expires, active}}
         self.token_type_scores = {}  # {token_type: multiplier}
-        self.wallet_token_buys = {}  # {wallet: {token: [timestamps]}}
         self.wallet_profits = {}  # {wallet: {token: profit}}
         self.trader_performance = {}  # {wallet: {win_rate, avg_profit}}
+        self.dirty_scores = {}  # {wallet: (score, timestamp)} pendientes de guardar
+        self.pending_trades = []  # [(wallet, tx_data)] del micro-lote en curso
+        self.batch_window = batch_window
+        self.batch_flush_handle = None
+        self.flush_interval = flush_interval
+        self.flush_task = None
+        
         
         # Inicializar multiplicadores para diferentes tipos de token
         self._init_token_type_boosters()
@@ -24,6 +57,27 @@ class ScoringSystem:
         # Cargar scores iniciales
         self._load_initial_scores()
 
+    # Parámetros del cálculo: acceso a atributo sobre el snapshot de ajustes vigente
+    @property
+    def default_score(self):
+        return settings_snapshot.get().default_score
+
+    @property
+    def decay_factor(self):
+        return settings_snapshot.get().score_decay_factor
+
+    @property
+    def min_tx_factor(self):
+        return settings_snapshot.get().min_tx_score_impact
+
+    @property
+    def max_tx_factor(self):
+        return settings_snapshot.get().max_tx_score_impact
+
+    @property
+    def whale_threshold(self):
+        return settings_snapshot.get().whale_transaction_threshold
+
     def _init_token_type_boosters(self):
         """Inicializa los multiplicadores por tipo de token"""
         self.token_type_scores = {
@@ -41,11 +95,15 @@ class ScoringSystem:
         """Carga scores iniciales desde la base de datos"""
         try:
             wallet_scores = db.execute_cached_query(
-                "SELECT wallet, score FROM wallet_scores",
-                max_age=3600
+                "SELECT wallet, score, EXTRACT(EPOCH FROM updated_at) AS updated_at FROM wallet_scores",
+                max_age=3600,
+                query_class=db.QUERY_ANALYTICS
             )
+            now = time.time()
             for item in wallet_scores:
-                self.local_cache[item['wallet']] = float(item['score'])
+                updated_at = float(item['updated_at']) if item['updated_at'] is not None else now
+                self.scores[item['wallet']] = (float(item['score']), updated_at)
+            self.leaderboard.rebuild(self.scores)
             logger.info(f"Loaded {len(wallet_scores)} initial wallet scores")
         except Exception as e:
             logger.error(f"Error loading initial scores: {e}")
@@ -60,10 +118,8 @@ class ScoringSystem:
         Returns:
             float: Score entre 0 y 10
         """
-        if wallet not in self.local_cache:
-            self.local_cache[wallet] = db.get_wallet_score(wallet)
-        
-        base_score = self.local_cache[wallet]
+        # Todos los scores se cargan al arrancar; una wallet sin score tiene el de por defecto
+        base_score = self._current_score(wallet, time.time())
         
         # Aplicar booster si está activo
         if wallet in self.boosters and self.boosters[wallet]['active']:
@@ -83,49 +139,40 @@ class ScoringSystem:
             wallet: Dirección del wallet
             tx_data: Datos de la transacción
         """
-        if wallet not in self.local_cache:
-            current_score = db.get_wallet_score(wallet)
-            self.local_cache[wallet] = current_score
-        else:
-            current_score = self.local_cache[wallet]
+        stored = self.scores.get(wallet)
+        current_score = stored[0] if stored else self.default_score
+        is_buy, amount_usd, timestamp, impact_multiplier, bonus = self._trade_factors(wallet, tx_data)
+        # Una wallet sin score parte del de por defecto sin decay
+        decay_multiplier = self._decay_multiplier(timestamp, stored[1]) if stored else 1.0
+        new_score = self._score_after_trade(current_score, decay_multiplier, is_buy, amount_usd, impact_multiplier, bonus)
+        
+        # Actualizar caché; la BD se actualiza en lote desde flush_scores()
+        self._set_score(wallet, new_score, max(timestamp, stored[1]) if stored else timestamp)
         
-        # Inicializar contadores de transacciones
-        if wallet not in self.wallet_tx_count:
-            self.wallet_tx_count[wallet] = 0
+        logger.debug(f"Score updated for {wallet}: {current_score:.2f} -> {new_score:.2f}")
+        return new_score
+
+    def _trade_factors(self, wallet, tx_data):
+        """
+        Parte del scoring que depende del estado acumulado (compras previas,
+        contador de transacciones, features del token). Debe llamarse en el
+        orden de llegada de los trades.
         
+        Returns:
+            tuple: (is_buy, amount_usd, timestamp, impact_multiplier, bonus)
+        """
         # Obtener parámetros de la transacción
         token = tx_data.get("token", "")
         amount_usd = tx_data.get("amount_usd", 0)
         tx_type = tx_data.get("type", "").upper()
         timestamp = tx_data.get("timestamp", time.time())
         
-        # Obtener factores de ajuste desde configuración
-        decay_factor = float(Config.get("SCORE_DECAY_FACTOR", 0.995))
-        min_tx_factor = float(Config.get("MIN_TX_SCORE_IMPACT", 0.01))
-        max_tx_factor = float(Config.get("MAX_TX_SCORE_IMPACT", 0.2))
-        
-        # Aplicar decay temporal al score existente
-        if wallet in self.local_cache:
-            time_since_last_update = timestamp - self.last_cache_cleanup
-            days_since_update = time_since_last_update / (24 * 3600)
-            decay_multiplier = decay_factor ** days_since_update
-            current_score = current_score * decay_multiplier
-        
-        # Calcular impacto de la transacción actual
-        # Impacto base basado en monto (USD)
-        base_impact = 0.01 + (amount_usd / 5000) * 0.1  # 0.01 a 0.11 para $0-$5000
-        base_impact = min(base_impact, max_tx_factor)  # Limitar impacto máximo
-        
         # Ajustar el impacto según el tipo de transacción y otras condiciones
         if tx_type == "BUY":
             impact_multiplier = 1.0
             
-            # Registro de compras para análisis de patrón
-            if wallet not in self.wallet_token_buys:
-                self.wallet_token_buys[wallet] = {}
-            if token not in self.wallet_token_buys[wallet]:
-                self.wallet_token_buys[wallet][token] = []
-            self.wallet_token_buys[wallet][token].append(timestamp)
+            # Nuevo lote en la posición del trader
+            self.ledger.record_buy(wallet, token, amount_usd, timestamp, tx_data.get("token_amount"))
             
             # ¿El trader tiende a comprar antes de otros? (indicador de calidad)
             if self._is_early_buyer(wallet, token, timestamp):
@@ -134,8 +181,9 @@ class ScoringSystem:
         elif tx_type == "SELL":
             impact_multiplier = 0.8  # Impacto ligeramente menor para ventas
             
-            # ¿El trader vendió con beneficio?
-            profit_pct = self._calculate_trade_profit(wallet, token, tx_data)
+            # ¿El trader vendió con beneficio? (PnL realizado FIFO, sin consultas a la BD)
+            realized = self.ledger.record_sell(wallet, token, amount_usd, timestamp, tx_data.get("token_amount"))
+            profit_pct = realized["profit_percent"] if realized else 0
             if profit_pct > 0:
                 # Actualizar histórico de ganancias
                 if wallet not in self.wallet_profits:
@@ -166,7 +214,7 @@ class ScoringSystem:
         
         # 3. Verificar si hay actividad de whales en el token
         whale_activity = self._check_whale_activity(token)
-        if whale_activity and amount_usd > float(Config.get("WHALE_TRANSACTION_THRESHOLD", 10000)):
+        if whale_activity and amount_usd > self.whale_threshold:
             impact_multiplier *= 1.3  # Bonus por actividad de ballena
         
         # 4. Verificar si el token está en trending
@@ -174,29 +222,161 @@ class ScoringSystem:
         if is_trending:
             impact_multiplier *= 1.1  # Bonus por token trending
         
+        if self.features is not None:
+            self.features.record_transaction(token, tx_type, amount_usd, timestamp)
+        
+        return tx_type == "BUY", amount_usd, timestamp, impact_multiplier, consistency_bonus + token_factor
+
+    def _decay_multiplier(self, timestamp, last_update):
+        """
+        Factor de decay entre el último cambio del score y `timestamp`:
+        decay_factor por cada día transcurrido. Se calcula siempre con el pow
+        de Python (también en lote) para que ambos caminos den el mismo resultado.
+        """
+        days_since_update = max(0.0, timestamp - last_update) / (24 * 3600)
+        return self.decay_factor ** days_since_update
+
+    def _current_score(self, wallet, now):
+        """Score guardado con el decay acumulado hasta `now` (forma cerrada, O(1))."""
+        stored = self.scores.get(wallet)
+        if stored is None:
+            return self.default_score
+        score, last_update = stored
+        return score * self._decay_multiplier(now, last_update)
+
+    def _set_score(self, wallet, score, timestamp):
+        self.scores[wallet] = (score, timestamp)
+        self.dirty_scores[wallet] = (score, timestamp)
+        self.leaderboard.update(wallet, score, timestamp)
+
+    def _score_after_trade(self, current_score, decay_multiplier, is_buy, amount_usd, impact_multiplier, bonus):
+        """Aplica decay e impacto de un trade a un score (versión escalar de _score_batch)."""
+        # Aplicar decay temporal al score existente
+        current_score = current_score * decay_multiplier
+        
+        # Impacto base basado en monto (USD)
+        base_impact = 0.01 + (amount_usd / 5000) * 0.1  # 0.01 a 0.11 para $0-$5000
+        base_impact = min(base_impact, self.max_tx_factor)  # Limitar impacto máximo
+        
         # Calcular el impacto final
         final_impact = base_impact * impact_multiplier
-        final_impact = max(min_tx_factor, min(final_impact, max_tx_factor))
+        final_impact = max(self.min_tx_factor, min(final_impact, self.max_tx_factor))
         
         # Añadir bonificaciones de consistencia y token
-        final_impact += consistency_bonus + token_factor
+        final_impact += bonus
         
         # Aplicar el impacto al score
-        if tx_type == "BUY":
-            new_score = min(10.0, current_score + final_impact)
-        else:
-            # Para transacciones que no son compras, el impacto es más neutro
-            if final_impact > 0.02:  # Si el impacto es significativo
-                new_score = min(10.0, current_score + (final_impact * 0.7))  # Impacto reducido
-            else:
-                new_score = current_score  # Sin cambio para impactos menores
+        if is_buy:
+            return min(10.0, current_score + final_impact)
+        # Para transacciones que no son compras, el impacto es más neutro
+        if final_impact > 0.02:  # Si el impacto es significativo
+            return min(10.0, current_score + (final_impact * 0.7))  # Impacto reducido
+        return current_score  # Sin cambio para impactos menores
+
+    def _score_batch(self, wallet_idx, rank, initial_scores, decay_multiplier, is_buy, amount_usd, impact_multiplier, bonus):
+        """
+        Versión vectorizada de _score_after_trade para un micro-lote.
         
-        # Actualizar caché y base de datos
-        self.local_cache[wallet] = new_score
-        db.update_wallet_score(wallet, new_score)
+        Las operaciones elemento a elemento son las mismas (y en el mismo
+        orden) que en la versión escalar, así que el resultado es idéntico
+        bit a bit. Los trades de una misma wallet se aplican en orden: el
+        paso k procesa a la vez el k-ésimo trade de cada wallet.
         
-        logger.debug(f"Score updated for {wallet}: {current_score:.2f} -> {new_score:.2f} (impact: {final_impact:.4f})")
-        return new_score
+        Args:
+            wallet_idx: Índice de wallet de cada trade
+            rank: Posición del trade dentro de los de su wallet
+            initial_scores: Score inicial de cada wallet
+            (resto): Arrays por trade con los factores de _trade_factors
+            
+        Returns:
+            tuple: (scores finales por wallet, score tras cada trade)
+        """
+        base_impact = np.minimum(0.01 + (amount_usd / 5000) * 0.1, self.max_tx_factor)
+        final_impact = np.maximum(self.min_tx_factor, np.minimum(base_impact * impact_multiplier, self.max_tx_factor))
+        final_impact = final_impact + bonus
+        
+        scores = initial_scores.copy()
+        results = np.empty(len(wallet_idx))
+        order = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[order], np.arange(rank.max() + 2))
+        for k in range(len(bounds) - 1):
+            step = order[bounds[k]:bounds[k + 1]]
+            wallets = wallet_idx[step]
+            current = scores[wallets]
+            current = current * decay_multiplier[step]
+            impact = final_impact[step]
+            new = np.where(
+                is_buy[step],
+                np.minimum(10.0, current + impact),
+                np.where(impact > 0.02, np.minimum(10.0, current + (impact * 0.7)), current)
+            )
+            scores[wallets] = new
+            results[step] = new
+        return scores, results
+
+    def update_scores_batch(self, trades):
+        """
+        Actualiza los scores de un micro-lote de trades, con el mismo
+        resultado que llamar a update_score_on_trade con cada uno en orden.
+        
+        Args:
+            trades: Lista de (wallet, tx_data) en orden de llegada
+            
+        Returns:
+            list: Score de la wallet tras cada trade
+        """
+        if not trades:
+            return []
+        wallet_index = {}
+        counts = []
+        last_update = {}  # wallet -> timestamp del último cambio, avanzando trade a trade
+        wallet_idx, rank, decay_multipliers, factors = [], [], [], []
+        for wallet, tx_data in trades:
+            idx = wallet_index.setdefault(wallet, len(wallet_index))
+            if idx == len(counts):
+                counts.append(0)
+                if wallet in self.scores:
+                    last_update[wallet] = self.scores[wallet][1]
+            seen = counts[idx]
+            counts[idx] += 1
+            wallet_idx.append(idx)
+            rank.append(seen)
+            factor = self._trade_factors(wallet, tx_data)
+            factors.append(factor)
+            # Como en update_score_on_trade: sólo decae si la wallet ya tenía score
+            previous = last_update.get(wallet)
+            decay_multipliers.append(self._decay_multiplier(factor[2], previous) if previous is not None else 1.0)
+            last_update[wallet] = factor[2] if previous is None else max(factor[2], previous)
+        
+        is_buy, amount_usd, _, impact_multiplier, bonus = (np.array(column) for column in zip(*factors))
+        initial_scores = np.array([
+            self.scores[wallet][0] if wallet in self.scores else self.default_score for wallet in wallet_index
+        ], dtype=float)
+        scores, results = self._score_batch(
+            np.array(wallet_idx), np.array(rank), initial_scores, np.array(decay_multipliers, dtype=float),
+            is_buy.astype(bool), amount_usd.astype(float), impact_multiplier.astype(float), bonus.astype(float)
+        )
+        for wallet, idx in wallet_index.items():
+            self._set_score(wallet, float(scores[idx]), last_update[wallet])
+        logger.debug(f"Scores actualizados en lote: {len(trades)} trades, {len(wallet_index)} wallets")
+        return results.tolist()
+
+    def submit_trade(self, wallet, tx_data):
+        """
+        Encola un trade para el siguiente micro-lote (batch_window segundos).
+        Requiere un bucle de eventos en marcha.
+        """
+        self.pending_trades.append((wallet, tx_data))
+        if self.batch_flush_handle is None:
+            self.batch_flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush_trades)
+
+    def _flush_trades(self):
+        self.batch_flush_handle = None
+        trades, self.pending_trades = self.pending_trades, []
+        try:
+            self.update_scores_batch(trades)
+        except Exception as e:
+            logger.error(f"Error actualizando scores de {len(trades)} trades: {e}", exc_info=True)
 
     def _is_early_buyer(self, wallet, token, timestamp):
         """
@@ -210,6 +390,12 @@ class ScoringSystem:
         Returns:
             bool: True si es comprador temprano
         """
+        if self.features is not None:
+            first_tx_time = self.features.get_first_seen(token)
+            if first_tx_time is None:
+                return True  # Primera compra observada del token
+            token_age = time.time() - first_tx_time
+            return token_age > 0 and (timestamp - first_tx_time) / token_age < 0.1
         try:
             # Consultar primera compra registrada para este token
             query = """
@@ -217,7 +403,7 @@ class ScoringSystem:
             FROM transactions 
             WHERE token = %s AND tx_type = 'BUY'
             """
-            result = db.execute_cached_query(query, (token,), max_age=300)
+            result = db.execute_cached_query(query, (db.encode_address(token),), max_age=300)
             if result and result[0]['first_tx']:
                 first_tx_time = result[0]['first_tx'].timestamp()
                 # Considerar early buyer si está en el primer 10% del tiempo total
@@ -229,70 +415,6 @@ class ScoringSystem:
             logger.warning(f"Error checking early buyer status: {e}")
             return False
 
-    def _calculate_trade_profit(self, wallet, token, sell_tx):
-        """
-        Calcula la ganancia aproximada de una venta basándose en compras anteriores
-        
-        Args:
-            wallet: Dirección del wallet
-            token: Dirección del token
-            sell_tx: Datos de la transacción de venta
-            
-        Returns:
-            float: Porcentaje de ganancia estimado
-        """
-        if wallet not in self.wallet_token_buys or token not in self.wallet_token_buys[wallet]:
-            return 0
-        
-        # Obtener el precio de venta
-        sell_amount_usd = sell_tx.get("amount_usd", 0)
-        if sell_amount_usd <= 0:
-            return 0
-            
-        try:
-            # Buscar la última compra registrada antes de esta venta
-            buy_timestamps = [ts for ts in self.wallet_token_buys[wallet][token] if ts < sell_tx.get("timestamp", 0)]
-            if not buy_timestamps:
-                return 0
-                
-            latest_buy_time = max(buy_timestamps)
-            
-            # Obtener precio de compra
-            query = """
-            SELECT amount_usd 
-            FROM transactions 
-            WHERE wallet = %s AND token = %s AND tx_type = 'BUY' AND created_at <= to_timestamp(%s)
-            ORDER BY created_at DESC
-            LIMIT 1
-            """
-            result = db.execute_cached_query(query, (wallet, token, latest_buy_time), max_age=60)
-            if not result:
-                return 0
-                
-            buy_amount_usd = result[0]["amount_usd"]
-            if buy_amount_usd <= 0:
-                return 0
-                
-            # Calcular cambio porcentual
-            percent_change = ((sell_amount_usd - buy_amount_usd) / buy_amount_usd) * 100
-            
-            # Registrar profit en DB para análisis
-            hold_time_hours = (sell_tx.get("timestamp", 0) - latest_buy_time) / 3600
-            db.save_wallet_profit(
-                wallet=wallet,
-                token=token,
-                buy_price=buy_amount_usd,
-                sell_price=sell_amount_usd,
-                profit_percent=percent_change,
-                hold_time_hours=hold_time_hours,
-                buy_timestamp=datetime.fromtimestamp(latest_buy_time)
-            )
-            
-            return percent_change
-        except Exception as e:
-            logger.warning(f"Error calculating trade profit: {e}")
-            return 0
-
     def _get_token_quality(self, token):
         """
         Calcula un score de calidad para el token basado en historiales y métricas
@@ -303,6 +425,9 @@ class ScoringSystem:
         Returns:
             float: Score de calidad entre 0 y 1
         """
+        if self.features is not None:
+            performance_score = self._performance_score(self.features.get_avg_performance_1h(token))
+            return (performance_score * 0.6) + (self.features.get_liquidity_tier(token) * 0.4)
         try:
             # 1. Verificar historial de rendimiento
             query = """
@@ -312,19 +437,7 @@ class ScoringSystem:
             """
             result = db.execute_cached_query(query, (token,), max_age=300)
             
-            performance_score = 0.5  # Score neutral por defecto
-            if result and result[0]["avg_performance"] is not None:
-                avg_perf = result[0]["avg_performance"]
-                if avg_perf > 20:
-                    performance_score = 1.0
-                elif avg_perf > 10:
-                    performance_score = 0.8
-                elif avg_perf > 5:
-                    performance_score = 0.7
-                elif avg_perf > 0:
-                    performance_score = 0.6
-                elif avg_perf < -10:
-                    performance_score = 0.3
+            performance_score = self._performance_score(result[0]["avg_performance"] if result else None)
             
             # 2. Verificar liquidez
             liquidity_score = 0.5
@@ -351,6 +464,23 @@ class ScoringSystem:
             logger.warning(f"Error getting token quality: {e}")
             return 0.5  # Score neutral en caso de error
 
+    @staticmethod
+    def _performance_score(avg_perf):
+        """Score entre 0.3 y 1.0 según el rendimiento medio 1h (0.5 si no hay datos)."""
+        if avg_perf is None:
+            return 0.5  # Score neutral por defecto
+        if avg_perf > 20:
+            return 1.0
+        if avg_perf > 10:
+            return 0.8
+        if avg_perf > 5:
+            return 0.7
+        if avg_perf > 0:
+            return 0.6
+        if avg_perf < -10:
+            return 0.3
+        return 0.5
+
     def _check_whale_activity(self, token):
         """
         Verifica si hay actividad reciente de ballenas en el token
@@ -361,13 +491,15 @@ class ScoringSystem:
         Returns:
             bool: True si hay actividad de ballenas
         """
+        if self.features is not None:
+            return self.features.has_whale_activity(token)
         try:
             query = """
             SELECT COUNT(*) as count
             FROM whale_activity
             WHERE token = %s AND created_at > NOW() - INTERVAL '1 HOUR'
             """
-            result = db.execute_cached_query(query, (token,), max_age=60)
+            result = db.execute_cached_query(query, (db.encode_address(token),), max_age=60)
             return result and result[0]["count"] > 0
         except Exception as e:
             logger.debug(f"Error checking whale activity: {e}")
@@ -383,6 +515,10 @@ class ScoringSystem:
         Returns:
             bool: True si el token está en trending
         """
+        if self.trending is not None:
+            return self.trending.is_trending(token)
+        if self.features is not None:
+            return self.features.is_trending(token)
         try:
             query = """
             SELECT COUNT(*) as count
@@ -452,11 +588,12 @@ class ScoringSystem:
         technical_factor = (volume_growth_normalized * 0.7) + (volume_accel_normalized * 0.3)
         
         # Obtener pesos desde configuración
-        trader_weight = float(Config.get("TRADER_QUALITY_WEIGHT", 0.35))
-        whale_weight = float(Config.get("WHALE_ACTIVITY_WEIGHT", 0.20))
-        holder_weight = float(Config.get("HOLDER_GROWTH_WEIGHT", 0.15))
-        liquidity_weight = float(Config.get("LIQUIDITY_HEALTH_WEIGHT", 0.15))
-        technical_weight = float(Config.get("TECHNICAL_FACTORS_WEIGHT", 0.15))
+        settings = settings_snapshot.get()
+        trader_weight = settings.trader_quality_weight
+        whale_weight = settings.whale_activity_weight
+        holder_weight = settings.holder_growth_weight
+        liquidity_weight = settings.liquidity_health_weight
+        technical_weight = settings.technical_factors_weight
         
         # Calcular score compuesto
         composite_score = (
@@ -484,6 +621,43 @@ class ScoringSystem:
         
         return round(final_score, 3)
 
+    def start(self):
+        """Inicia el guardado periódico de scores (requiere un bucle en marcha)."""
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_loop())
+        if self.owns_ledger:
+            self.ledger.start()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush_scores()
+
+    async def flush_scores(self):
+        """Guarda en un único upsert los scores modificados desde el último guardado."""
+        if not self.dirty_scores:
+            return
+        scores, self.dirty_scores = self.dirty_scores, {}
+        try:
+            await asyncio.to_thread(db.update_wallet_scores_batch, scores)
+            logger.debug(f"Guardados {len(scores)} scores")
+        except Exception as e:
+            # Se reintentan en el siguiente ciclo salvo que ya haya un valor más reciente
+            for wallet, score in scores.items():
+                self.dirty_scores.setdefault(wallet, score)
+            logger.error(f"Error guardando {len(scores)} scores: {e}")
+
+    async def close(self):
+        if self.batch_flush_handle is not None:
+            self.batch_flush_handle.cancel()
+            self._flush_trades()
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush_scores()
+        if self.owns_ledger:
+            await self.ledger.close()
+
     def add_score_booster(self, wallet, multiplier, duration_hours=24):
         """
         Añade un potenciador temporal al score de un wallet
@@ -503,15 +677,20 @@ class ScoringSystem:
 
     def get_all_scores(self):
         """
-        Devuelve un diccionario con todos los scores conocidos
+        Devuelve un diccionario con todos los scores conocidos, con el decay
+        aplicado hasta ahora
         """
-        return self.local_cache
+        now = time.time()
+        return {wallet: self._current_score(wallet, now) for wallet in self.scores}
 
     def get_trader_name_from_wallet(self, wallet):
         """
-        Retorna un nombre humano para la wallet, si se tiene
+        Retorna un nombre humano para la wallet, si se tiene (la propia
+        wallet si no). Se resuelve en memoria con el WalletManager.
         """
-        return db.get_trader_name_from_wallet(wallet)
+        if self.wallet_manager is None:
+            return wallet
+        return self.wallet_manager.get_trader_name(wallet) or wallet
 
     def get_top_traders(self, limit=10):
         """
@@ -523,11 +702,15 @@ class ScoringSystem:
         Returns:
             list: Lista de diccionarios con wallet y score
         """
-        scores = [(wallet, score) for wallet, score in self.local_cache.items()]
-        scores.sort(key=lambda x: x[1], reverse=True)
+        # El ranking se mantiene en cada cambio de score; sólo se reconstruye
+        # si ha cambiado el factor de decay en los ajustes
+        if self.leaderboard.decay_factor != self.decay_factor:
+            self.leaderboard.rebuild(self.scores, self.decay_factor)
+        now = time.time()
         
         result = []
-        for wallet, score in scores[:limit]:
+        for wallet in self.leaderboard.top(limit):
+            score = self._current_score(wallet, now)
             name = self.get_trader_name_from_wallet(wallet)
             result.append({
                 "wallet": wallet,
@@ -634,19 +817,82 @@ class ScoringSystem:
         for wallet in boosters_to_remove:
             del self.boosters[wallet]
         
-        # Limitar tamaño de historial de compras
-        for wallet, tokens in self.wallet_token_buys.items():
-            for token, timestamps in list(tokens.items()):
-                # Mantener solo las compras de los últimos 30 días
-                self.wallet_token_buys[wallet][token] = [
-                    ts for ts in timestamps if now - ts < 30 * 24 * 3600
-                ]
-                # Eliminar tokens sin compras
-                if not self.wallet_token_buys[wallet][token]:
-                    del self.wallet_token_buys[wallet][token]
-            
-            # Eliminar wallets sin tokens
-            if not self.wallet_token_buys[wallet]:
-                del self.wallet_token_buys[wallet]
+        # Descartar posiciones sin operaciones en los últimos 30 días
+        self.ledger.prune(now)
         
         logger.info(f"Cleaned {len(boosters_to_remove)} expired boosters")
+
+def _synthetic_trades(count, wallets=40, tokens=30, seed=1):
+    """Trades aleatorios reproducibles para comprobar el scoring en lote."""
+    import random
+    rng = random.Random(seed)
+    start = time.time() - count * 3
+    return [
+        (f"Wallet{rng.randint(0, wallets)}", {
+            "token": f"Token{rng.randint(0, tokens)}",
+            "amount_usd": rng.choice([50, 300, 5000, 20000, rng.uniform(0, 30000)]),
+            "type": rng.choice(["BUY", "BUY", "SELL", "OTHER"]),
+            "timestamp": start + i * 3
+        })
+        for i in range(count)
+    ]
+
+def _verify_batch(trades, max_batch=200, seed=1):
+    """
+    Reproduce los trades con update_score_on_trade uno a uno y con
+    update_scores_batch en micro-lotes de tamaño aleatorio, y comprueba que
+    los scores tras cada trade y los finales coinciden bit a bit.
+
+    Returns:
+        list: Índices de los trades cuyo score difiere (vacía si todo coincide)
+    """
+    import random
+    from feature_store import TokenFeatureStore
+    rng = random.Random(seed)
+    # Mismo estado inicial y sin consultas por trade: features y ledger en memoria
+    sequential = ScoringSystem(features=TokenFeatureStore(), ledger=PositionLedger())
+    batched = ScoringSystem(features=TokenFeatureStore(), ledger=PositionLedger())
+    batched.scores = dict(sequential.scores)
+    batched.leaderboard.rebuild(batched.scores)
+
+    mismatches = []
+    i = 0
+    while i < len(trades):
+        chunk = trades[i:i + rng.randint(1, max_batch)]
+        expected = [sequential.update_score_on_trade(wallet, dict(tx)) for wallet, tx in chunk]
+        results = batched.update_scores_batch([(wallet, dict(tx)) for wallet, tx in chunk])
+        mismatches += [i + k for k, (a, b) in enumerate(zip(expected, results)) if a != b]
+        i += len(chunk)
+    if sequential.scores != batched.scores:
+        mismatches.append(len(trades))
+    return mismatches
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Comprobaciones del sistema de scoring")
+    parser.add_argument("--verify-batch", action="store_true",
+                        help="Comprueba que el scoring en lote coincide con el secuencial")
+    parser.add_argument("--from-db", type=float, metavar="DAYS",
+                        help="Reproduce las transacciones registradas de los últimos DAYS días")
+    parser.add_argument("--trades", type=int, default=4000, help="Trades sintéticos si no se usa --from-db")
+    parser.add_argument("--max-batch", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.verify_batch:
+        parser.print_help()
+        sys.exit(0)
+    if args.from_db:
+        trades = [
+            (row["wallet"], {"token": row["token"], "amount_usd": float(row["amount_usd"] or 0),
+                             "type": row["tx_type"], "timestamp": float(row["created_at"])})
+            for row in db.get_position_transactions(args.from_db)
+        ]
+    else:
+        trades = _synthetic_trades(args.trades, seed=args.seed)
+    mismatches = _verify_batch(trades, args.max_batch, args.seed)
+    if mismatches:
+        print(f"❌ {len(mismatches)} diferencias entre scoring en lote y secuencial (primeras: {mismatches[:10]})")
+        sys.exit(1)
+    print(f"✅ {len(trades)} trades: scoring en lote idéntico al secuencial")
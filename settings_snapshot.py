@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# settings_snapshot.py - Snapshot inmutable y tipado de los ajustes usados en caminos calientes
+
+import asyncio
+import logging
+from dataclasses import dataclass, fields, replace
+from config import Config
+
+logger = logging.getLogger("settings_snapshot")
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """
+    Ajustes ya convertidos a su tipo. Cada campo se toma de bot_settings y,
+    si la clave no está, del atributo de Config (que siempre tiene valor por
+    defecto) o del valor por defecto del campo; así un cambio en la BD se
+    aplica aunque Config defina la clave. Nunca se modifica: cuando cambian
+    los ajustes se construye uno nuevo y se sustituye la referencia global.
+    """
+    min_transaction_usd: float = 200.0
+    default_score: float = 5.0
+    score_decay_factor: float = 0.995
+    min_tx_score_impact: float = 0.01
+    max_tx_score_impact: float = 0.2
+    whale_transaction_threshold: float = 10000.0
+    trader_quality_weight: float = 0.35
+    whale_activity_weight: float = 0.20
+    holder_growth_weight: float = 0.15
+    liquidity_health_weight: float = 0.15
+    technical_factors_weight: float = 0.15
+    max_tx_history_per_token: int = 10
+    version: tuple = ()
+
+    @classmethod
+    def build(cls, db_settings=None, version=()):
+        """
+        Construye un snapshot a partir de Config y de las filas de bot_settings.
+
+        Args:
+            db_settings: Dict {clave: valor} de bot_settings
+            version: (filas, último updated_at) de bot_settings con el que se construyó
+        """
+        db_settings = db_settings or {}
+        values = {"version": version}
+        for field in fields(cls):
+            if field.name == "version":
+                continue
+            key = field.name.upper()
+            raw = db_settings.get(key, db_settings.get(field.name))
+            if raw is None:
+                raw = getattr(Config, key, None)
+            if raw is None:
+                continue
+            try:
+                values[field.name] = _convert(field, raw)
+            except (ValueError, TypeError):
+                logger.warning(f"Valor inválido para {key}: {raw!r}, se usa {field.default}")
+        return cls(**values)
+
+def _convert(field, raw):
+    return field.type(float(raw))
+
+_current = SettingsSnapshot.build()
+
+def get():
+    """Snapshot vigente. Leer un ajuste es acceso a atributo: settings_snapshot.get().min_transaction_usd"""
+    return _current
+
+def reload(db_settings=None, version=None):
+    """
+    Reconstruye el snapshot y lo sustituye (una sola asignación, atómica
+    para el resto del proceso). Sin argumentos, lee bot_settings.
+    """
+    global _current
+    if db_settings is None:
+        import db
+        try:
+            version = _read_version(db)
+            db_settings = {row["key"]: row["value"] for row in db.get_all_settings()}
+        except Exception as e:
+            logger.error(f"Error leyendo bot_settings, se mantiene el snapshot actual: {e}")
+            return _current
+    _current = SettingsSnapshot.build(db_settings, version or ())
+    return _current
+
+def apply(key, value):
+    """
+    Publica un snapshot con un ajuste cambiado en memoria, sin leer la BD
+    (para Config.update_setting). SettingsWatcher recarga después el
+    snapshot completo al ver la nueva versión de bot_settings.
+    """
+    global _current
+    for field in fields(SettingsSnapshot):
+        if field.name != "version" and field.name == key.lower():
+            try:
+                _current = replace(_current, **{field.name: _convert(field, value)})
+            except (ValueError, TypeError):
+                logger.warning(f"Valor inválido para {key.upper()}: {value!r}, se mantiene {getattr(_current, field.name)}")
+            break
+    return _current
+
+def _read_version(db):
+    row = db.get_settings_version()
+    return (int(row["count"]), float(row["version"] or 0)) if row else ()
+
+class SettingsWatcher:
+    """
+    Detecta cambios en bot_settings con una consulta barata (número de filas
+    y último updated_at) cada `interval` segundos, fuera del bucle de
+    eventos, y reconstruye el snapshot sólo cuando cambian.
+    """
+
+    def __init__(self, interval=30):
+        self.interval = interval
+        self.task = None
+        self.stats = {"polls": 0, "reloads": 0, "errors": 0}
+
+    def start(self):
+        """Inicia el sondeo de versión (requiere un bucle en marcha)."""
+        if self.task is None:
+            self.task = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self):
+        import db
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                version = await asyncio.to_thread(_read_version, db)
+                self.stats["polls"] += 1
+                if version != _current.version:
+                    await asyncio.to_thread(reload)
+                    self.stats["reloads"] += 1
+                    logger.info("Ajustes recargados desde bot_settings")
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Error comprobando versión de bot_settings: {e}")
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def get_stats(self):
+        return dict(self.stats, version=_current.version)
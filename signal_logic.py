@@ -13,6 +13,8 @@ from token_analyzer import TokenAnalyzer
 from trader_profiler import TraderProfiler
 from telegram_utils import send_enhanced_signal
 from risk_manager import RiskManager
+from watchlist_refresher import WatchlistRefresher
+from liquidity_engine import LiquidityEngine
 
 # Configurar logging más detallado
 logger = logging.getLogger("signal_logic")
@@ -27,23 +29,24 @@ if not logger.handlers:
     logger.addHandler(console_handler)
 
 class SignalLogic:
-    def __init__(self, dexscreener_client):
+    def __init__(self, dexscreener_client, market_metrics=None, token_analyzer=None, liquidity_engine=None):
         """
-        Inicialización simplificada que solo requiere el cliente DexScreener
+        Inicialización simplificada que solo requiere el cliente DexScreener;
+        los analizadores ya creados por main se reutilizan si se pasan.
         """
         self.dexscreener_client = dexscreener_client
         self.token_candidates = {}
         self.recent_signals = []
         self.last_signal_check = time.time()
-        self.watched_tokens = set()
         
         # Inicializar analizadores
-        self.market_metrics = MarketMetricsAnalyzer(dexscreener_client=dexscreener_client)
-        self.token_analyzer = TokenAnalyzer(dexscreener_client=dexscreener_client)
+        self.market_metrics = market_metrics or MarketMetricsAnalyzer(dexscreener_client=dexscreener_client)
+        self.token_analyzer = token_analyzer or TokenAnalyzer(dexscreener_client=dexscreener_client)
         self.trader_profiler = TraderProfiler()
         
-        # Inicializar Risk Manager
-        self.risk_manager = RiskManager()
+        # Inicializar Risk Manager (limitado por la profundidad estimada de los pools)
+        self.liquidity_engine = liquidity_engine or LiquidityEngine(dexscreener_client)
+        self.risk_manager = RiskManager(liquidity_engine=self.liquidity_engine)
         
         # Configuración de umbrales
         self.min_market_cap = float(Config.get("mcap_threshold", "50000"))  # Reducido a $50K
@@ -52,8 +55,18 @@ class SignalLogic:
         
         logger.info(f"SignalLogic inicializado con umbrales: Market Cap=${self.min_market_cap}, Volumen=${self.min_volume}, Min Trans=${self.min_transaction_usd}")
         
+        # Watchlist: refresco concurrente con intervalos según actividad, compartiendo el presupuesto de DexScreener
+        self.watchlist = WatchlistRefresher(
+            refresh=self.get_token_market_data,
+            on_data=self._evaluate_watched_token,
+            rate_limiter=getattr(dexscreener_client, "rate_limiter", None),
+            max_concurrency=int(Config.get("WATCHLIST_MAX_CONCURRENCY", 8)),
+            min_interval=float(Config.get("WATCHLIST_MIN_INTERVAL", 60)),
+            max_interval=float(Config.get("WATCHLIST_MAX_INTERVAL", 600))
+        )
+        
         # Iniciar monitoreo periódico
-        asyncio.create_task(self.periodic_monitoring())
+        asyncio.create_task(self.watchlist.run())
         
     async def process_transaction(self, tx_data: Dict[str, Any]) -> None:
         """
@@ -69,6 +82,8 @@ class SignalLogic:
             token = tx_data["token"]
             wallet = tx_data["wallet"]
             amount_usd = float(tx_data["amount_usd"])
+            self.watchlist.record_activity(token)
+            self.token_analyzer.record_trade(token, amount_usd, tx_data["type"], tx_data.get("timestamp"))
             
             logger.info(f"Transacción válida recibida: Token={token}, Wallet={wallet}, Amount=${amount_usd}")
             
@@ -97,8 +112,10 @@ class SignalLogic:
                 "price": market_data.get("price"),
                 "timestamp": time.time()
             }
+            signal_data.update(self.token_analyzer.get_volume_features(token))
             
             # Calcular tamaño del trade
+            await self._attach_liquidity(signal_data)
             trade_size = self.risk_manager.calculate_trade_size(token, signal_data)
             if not trade_size:
                 logger.warning(f"No se pudo calcular tamaño de trade para {token}")
@@ -127,8 +144,9 @@ class SignalLogic:
             logger.debug(f"Transacción inválida: faltan campos requeridos. Campos presentes: {list(tx_data.keys())}")
             return False
             
-        if tx_data["token"] in ["native", "So11111111111111111111111111111111111111112"]:
-            logger.debug(f"Transacción inválida: token nativo {tx_data['token']}")
+        # Tokens nativos, stables y tokens sin datos recientes se rechazan sin consultar la red
+        if self.dexscreener_client.blocklist.is_blocked(tx_data["token"]):
+            logger.debug(f"Transacción inválida: {self.dexscreener_client.blocklist.get_reason(tx_data['token'])} {tx_data['token']}")
             return False
             
         amount = float(tx_data["amount_usd"])
@@ -163,6 +181,7 @@ class SignalLogic:
             data = await self.dexscreener_client.fetch_token_data(token)
             if data:
                 logger.debug(f"Datos obtenidos para {token}: {data}")
+                await self.token_analyzer.update_price_data(token, market_data=data)
             else:
                 logger.warning(f"No se obtuvieron datos para {token}")
             return data
@@ -170,6 +189,20 @@ class SignalLogic:
             logger.error(f"Error obteniendo datos de mercado para {token}: {e}", exc_info=True)
             return None
             
+    async def _attach_liquidity(self, signal_data: Dict[str, Any]) -> None:
+        """
+        Añade a la señal el slippage estimado del token (y deja la estimación
+        cacheada para que RiskManager limite el tamaño del trade)
+        """
+        try:
+            liquidity = await self.liquidity_engine.get_liquidity(signal_data["token"])
+            if liquidity:
+                signal_data["liquidity_usd"] = liquidity["total_liquidity_usd"]
+                signal_data["slippage_1k"] = liquidity["slippage_1k"]
+                signal_data["slippage_10k"] = liquidity["slippage_10k"]
+        except Exception as e:
+            logger.error(f"Error estimando liquidez de {signal_data['token']}: {e}")
+            
     async def _generate_signal(self, signal_data: Dict[str, Any]) -> None:
         """
         Genera una señal de trading
@@ -239,53 +272,42 @@ class SignalLogic:
                 await self.process_transaction(tx)
                 
             # También revisar los tokens en watchlist
-            tokens_checked = 0
-            if hasattr(self, 'watched_tokens') and self.watched_tokens:
-                tokens_checked = len(self.watched_tokens)
+            tokens_checked = len(self.watchlist)
                 
             logger.debug(f"Procesamiento de señales completado. Transacciones: {len(recent_txs)}, Tokens en watchlist: {tokens_checked}")
             
         except Exception as e:
             logger.error(f"Error en process_signals: {e}", exc_info=True)
             
-    async def periodic_monitoring(self):
+    def get_active_candidates_count(self):
+        """Número de tokens en la watchlist."""
+        return len(self.watchlist)
+
+    async def _evaluate_watched_token(self, token: str, market_data: Optional[Dict[str, Any]]) -> None:
         """
-        Monitoreo periódico de tokens
+        Evalúa un token de la watchlist tras refrescar sus datos de mercado
         """
-        logger.info("Iniciando monitoreo periódico de tokens")
-        while True:
-            try:
-                logger.debug(f"Monitoreando {len(self.watched_tokens)} tokens")
-                for token in self.watched_tokens:
-                    logger.debug(f"Revisando token {token}")
-                    market_data = await self.get_token_market_data(token)
-                    if market_data and self._check_market_criteria(market_data):
-                        logger.info(f"Token {token} cumple criterios en monitoreo periódico")
-                        
-                        # Preparar datos de señal
-                        signal_data = {
-                            "token": token,
-                            "wallet": "system",
-                            "amount_usd": 0,
-                            "market_cap": market_data.get("marketCap"),
-                            "volume_24h": market_data.get("volume24h"),
-                            "price": market_data.get("price"),
-                            "timestamp": time.time()
-                        }
-                        
-                        # Calcular tamaño del trade
-                        trade_size = self.risk_manager.calculate_trade_size(token, signal_data)
-                        if trade_size and self.risk_manager.can_open_trade(token, trade_size):
-                            signal_data["trade_size"] = trade_size
-                            await self._generate_signal(signal_data)
-                        else:
-                            logger.debug(f"Token {token} no cumple criterios de riesgo")
-                    else:
-                        logger.debug(f"Token {token} no cumple criterios en monitoreo periódico")
-                        
-                logger.debug("Esperando 5 minutos para próximo ciclo de monitoreo")
-                await asyncio.sleep(300)  # Revisar cada 5 minutos
-                
-            except Exception as e:
-                logger.error(f"Error en monitoreo periódico: {e}", exc_info=True)
-                await asyncio.sleep(60)  # Esperar 1 minuto en caso de error
+        if market_data and self._check_market_criteria(market_data):
+            logger.info(f"Token {token} cumple criterios en monitoreo periódico")
+            
+            # Preparar datos de señal
+            signal_data = {
+                "token": token,
+                "wallet": "system",
+                "amount_usd": 0,
+                "market_cap": market_data.get("marketCap"),
+                "volume_24h": market_data.get("volume24h"),
+                "price": market_data.get("price"),
+                "timestamp": time.time()
+            }
+            
+            # Calcular tamaño del trade
+            await self._attach_liquidity(signal_data)
+            trade_size = self.risk_manager.calculate_trade_size(token, signal_data)
+            if trade_size and self.risk_manager.can_open_trade(token, trade_size):
+                signal_data["trade_size"] = trade_size
+                await self._generate_signal(signal_data)
+            else:
+                logger.debug(f"Token {token} no cumple criterios de riesgo")
+        else:
+            logger.debug(f"Token {token} no cumple criterios en monitoreo periódico")
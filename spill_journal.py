@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# spill_journal.py - Journal local append-only para escrituras durante caídas de la base de datos
+
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger("spill_journal")
+
+class SpillJournal:
+    """
+    Journal local de escrituras pendientes, organizado en segmentos JSONL.
+
+    - append() escribe en el segmento activo y agrupa los fsync (por número
+      de registros o por intervalo) para no pagar un fsync por escritura.
+    - Los segmentos se sellan por tamaño o cuando el replayer los reclama,
+      y se nombran de forma que el orden lexicográfico es el orden de escritura.
+    - El replayer entrega cada segmento sellado completo a apply_segment(),
+      que debe ser idempotente por nombre de segmento; sólo si tiene éxito
+      se borra el archivo.
+    """
+
+    def __init__(self, directory, apply_segment, is_available,
+                 segment_max_bytes=4 * 1024 * 1024, fsync_batch=256,
+                 fsync_interval=0.2, replay_interval=5):
+        """
+        Args:
+            directory: Carpeta donde se guardan los segmentos
+            apply_segment: Callable(segment_name, records) que vuelca un segmento en la BD
+            is_available: Callable() -> bool que indica si la BD vuelve a responder
+            segment_max_bytes: Tamaño a partir del cual se rota el segmento activo
+            fsync_batch: Registros pendientes que fuerzan un fsync inmediato
+            fsync_interval: Segundos máximos entre fsync de registros pendientes
+            replay_interval: Segundos entre intentos del replayer
+        """
+        self.directory = directory
+        self.apply_segment = apply_segment
+        self.is_available = is_available
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.replay_interval = replay_interval
+
+        self.lock = threading.Lock()
+        self.active_file = None
+        self.active_path = None
+        self.active_size = 0
+        self.unsynced = 0
+        self.segment_seq = 0
+        self.pending_records = 0
+        self.stats = {"spilled": 0, "replayed": 0, "segments_replayed": 0, "replay_errors": 0}
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Segmentos que quedaron abiertos tras un cierre abrupto se sellan tal cual
+        for name in os.listdir(self.directory):
+            if name.endswith(".open"):
+                path = os.path.join(self.directory, name)
+                os.rename(path, path[:-len(".open")])
+        for name in self._sealed_segments():
+            with open(os.path.join(self.directory, name), "rb") as f:
+                self.pending_records += sum(1 for _ in f)
+        if self.pending_records:
+            logger.warning(f"⚠️ Journal con {self.pending_records} escrituras pendientes de una ejecución anterior")
+
+        self._stop = threading.Event()
+        self._replayer = threading.Thread(target=self._run, name="spill-journal", daemon=True)
+        self._replayer.start()
+
+    def has_pending(self):
+        """Indica si hay registros aún no volcados en la BD."""
+        return self.pending_records > 0
+
+    def append(self, kind, data):
+        """
+        Añade un registro al journal.
+
+        Args:
+            kind: Tipo de escritura ("transaction", "signal", ...)
+            data: Diccionario serializable con los datos de la escritura
+        """
+        line = (json.dumps({"kind": kind, "ts": time.time(), "data": data}, default=str) + "\n").encode("utf-8")
+        with self.lock:
+            if self.active_file is None or self.active_size >= self.segment_max_bytes:
+                self._open_segment()
+            self.active_file.write(line)
+            self.active_size += len(line)
+            self.unsynced += 1
+            self.pending_records += 1
+            self.stats["spilled"] += 1
+            if self.unsynced >= self.fsync_batch:
+                self._fsync()
+
+    def get_stats(self):
+        return dict(self.stats, pending=self.pending_records)
+
+    def close(self):
+        """Detiene el replayer y sincroniza el segmento activo."""
+        self._stop.set()
+        with self.lock:
+            self._seal_active()
+
+    def _open_segment(self):
+        self._seal_active()
+        self.segment_seq += 1
+        name = f"{int(time.time() * 1000):015d}-{os.getpid()}-{self.segment_seq:06d}.jsonl"
+        self.active_path = os.path.join(self.directory, name + ".open")
+        self.active_file = open(self.active_path, "ab")
+        self.active_size = 0
+
+    def _fsync(self):
+        if self.active_file is not None and self.unsynced:
+            self.active_file.flush()
+            os.fsync(self.active_file.fileno())
+            self.unsynced = 0
+
+    def _seal_active(self):
+        if self.active_file is None:
+            return
+        self._fsync()
+        self.active_file.close()
+        os.rename(self.active_path, self.active_path[:-len(".open")])
+        self.active_file = None
+        self.active_path = None
+
+    def _sealed_segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+
+    def _run(self):
+        last_replay = 0
+        while not self._stop.wait(self.fsync_interval):
+            with self.lock:
+                self._fsync()
+            now = time.time()
+            if not self.pending_records or now - last_replay < self.replay_interval:
+                continue
+            last_replay = now
+            try:
+                if self.is_available():
+                    self._replay()
+            except Exception as e:
+                self.stats["replay_errors"] += 1
+                logger.warning(f"⚠️ Error reproduciendo journal: {e}")
+
+    def _replay(self):
+        with self.lock:
+            self._seal_active()
+        for name in self._sealed_segments():
+            path = os.path.join(self.directory, name)
+            records = []
+            line_count = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    line_count += 1
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Última línea truncada por un corte abrupto
+                        logger.warning(f"Registro corrupto ignorado en {name}")
+            self.apply_segment(name, records)
+            os.remove(path)
+            with self.lock:
+                self.pending_records = max(0, self.pending_records - line_count)
+            self.stats["replayed"] += len(records)
+            self.stats["segments_replayed"] += 1
+            logger.info(f"✅ Segmento {name} volcado en BD ({len(records)} registros)")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# storage_benchmark.py - Compara el schema TEXT/NUMERIC con el schema compacto BYTEA/DOUBLE PRECISION
+
+import argparse
+import logging
+import os
+import time
+import psycopg2.extras
+import db
+
+logger = logging.getLogger("storage_benchmark")
+
+LAYOUTS = {
+    "text_numeric": {
+        "address_type": "TEXT",
+        "amount_type": "NUMERIC",
+        "encode": lambda address: address
+    },
+    "bytea_double": {
+        "address_type": "BYTEA",
+        "amount_type": "DOUBLE PRECISION",
+        "encode": db.encode_address
+    }
+}
+
+def _random_address():
+    return db.decode_address(os.urandom(db.ADDRESS_BYTES))
+
+def _generate_rows(rows, wallets, tokens):
+    wallet_pool = [_random_address() for _ in range(wallets)]
+    token_pool = [_random_address() for _ in range(tokens)]
+    return [
+        (wallet_pool[i % wallets], token_pool[(i * 7) % tokens], "BUY" if i % 3 else "SELL", 200 + (i % 5000) * 1.37)
+        for i in range(rows)
+    ], wallet_pool
+
+def _time_query(cur, query, params=None, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(query, params)
+        cur.fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmark(rows=200000, wallets=500, tokens=2000):
+    """
+    Crea una tabla temporal por layout con las mismas transacciones sintéticas y
+    mide el tamaño en disco (tabla + índices) y el tiempo de consultas típicas.
+
+    Args:
+        rows: Número de transacciones a generar
+        wallets: Número de wallets distintas
+        tokens: Número de tokens distintos
+
+    Returns:
+        dict: Resultados por layout
+    """
+    data, wallet_pool = _generate_rows(rows, wallets, tokens)
+    sample_wallet = wallet_pool[0]
+    results = {}
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        for name, layout in LAYOUTS.items():
+            table = f"bench_transactions_{name}"
+            encode = layout["encode"]
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+            cur.execute(f"""
+                CREATE TEMP TABLE {table} (
+                    id SERIAL PRIMARY KEY,
+                    wallet {layout['address_type']},
+                    token {layout['address_type']},
+                    tx_type TEXT,
+                    amount_usd {layout['amount_type']},
+                    created_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            psycopg2.extras.execute_values(
+                cur,
+                f"INSERT INTO {table} (wallet, token, tx_type, amount_usd) VALUES %s",
+                [(encode(w), encode(t), tx_type, amount) for w, t, tx_type, amount in data],
+                page_size=5000
+            )
+            cur.execute(f"CREATE INDEX ON {table}(wallet)")
+            cur.execute(f"CREATE INDEX ON {table}(token)")
+            cur.execute(f"ANALYZE {table}")
+            cur.execute(
+                "SELECT pg_relation_size(%s), pg_indexes_size(%s)",
+                (table, table)
+            )
+            table_bytes, index_bytes = cur.fetchone()
+            results[name] = {
+                "table_mb": table_bytes / 1024 / 1024,
+                "index_mb": index_bytes / 1024 / 1024,
+                "aggregate_ms": _time_query(
+                    cur,
+                    f"SELECT token, SUM(amount_usd), COUNT(*) FROM {table} GROUP BY token"
+                ),
+                "wallet_lookup_ms": _time_query(
+                    cur,
+                    f"SELECT token, amount_usd FROM {table} WHERE wallet = %s",
+                    (encode(sample_wallet),)
+                )
+            }
+        conn.rollback()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del schema compacto de almacenamiento")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--wallets", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.wallets, args.tokens)
+    baseline = results["text_numeric"]
+    for name, metrics in results.items():
+        print(f"{name}:")
+        for key, value in metrics.items():
+            change = (1 - value / baseline[key]) * 100 if baseline[key] else 0
+            print(f"  {key:<18} {value:10.2f}  (reducción {change:.1f}% vs text_numeric)")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
 import logging
-import requests
 import time
 import asyncio
 import json
 from typing import Dict, List, Callable, Any, Optional
 from config import Config
 import db
+import http_client
 
 logger = logging.getLogger("telegram_utils")
 
-def send_telegram_message(message: str) -> bool:
+async def send_telegram_message(message: str) -> bool:
     if len(message) > 4096:
         message = message[:4090] + "...\n[Message truncated]"
         logger.warning("Message truncated due to length.")
@@ -24,19 +24,20 @@ def send_telegram_message(message: str) -> bool:
     delay = 2
     for i in range(retries):
         try:
-            response = requests.post(url, data=data, timeout=10)
-            if response.status_code == 200:
-                logger.debug("Message sent")
-                return True
-            else:
-                logger.warning(f"Error {response.status_code}: {response.text}")
+            session = await http_client.get_session()
+            async with session.post(url, data=data, timeout=10) as response:
+                if response.status == 200:
+                    logger.debug("Message sent")
+                    return True
+                else:
+                    logger.warning(f"Error {response.status}: {await response.text()}")
         except Exception as e:
             logger.error(f"Error sending telegram message (attempt {i+1}): {e}")
-        time.sleep(delay)
+        await asyncio.sleep(delay)
         delay *= 2
     return False
 
-def send_enhanced_signal(
+async def send_enhanced_signal(
     token: str,
     confidence: float,
     tx_velocity: float,
@@ -130,9 +131,9 @@ def send_enhanced_signal(
         f"• [NeoBullX]({neobullx_link})\n"
     )
     
-    return send_telegram_message(msg)
+    return await send_telegram_message(msg)
 
-def send_performance_report(
+async def send_performance_report(
     token: str,
     signal_id: int,
     timeframe: str,
@@ -186,7 +187,7 @@ def send_performance_report(
         f"• [NeoBullX]({neobullx_link})\n"
     )
     
-    return send_telegram_message(message)
+    return await send_telegram_message(message)
 
 def fix_telegram_commands() -> Callable[..., Any]:
     async def process_telegram_commands(bot_token: str, chat_id: str, signal_logic: Any, wallet_manager: Optional[Any] = None):
@@ -221,14 +222,21 @@ def fix_telegram_commands() -> Callable[..., Any]:
             signals_today = db.count_signals_today()
             txs_today = db.count_transactions_today()
             
-            update.message.reply_text(
+            status_text = (
                 f"*Bot Status:*\n"
                 f"Active: {'✅' if bot_status['active'] else '🛑'}\n"
                 f"Tokens monitored: `{active_tokens}`\n"
                 f"Signals today: `{signals_today}`\n"
-                f"Transactions processed: `{txs_today}`", 
-                parse_mode=ParseMode.MARKDOWN
+                f"Transactions processed: `{txs_today}`"
             )
+            dex_client = getattr(signal_logic, "dexscreener_client", None)
+            if dex_client is not None and hasattr(dex_client, "get_stats"):
+                coalescing = dex_client.get_stats()["coalescing"]
+                status_text += (
+                    f"\nDexScreener fetches: `{coalescing['leaders']}` "
+                    f"(coalesced: `{coalescing['coalesced']}`)"
+                )
+            update.message.reply_text(status_text, parse_mode=ParseMode.MARKDOWN)
 
         def stats_command(update: Update, context: CallbackContext):
             if str(update.effective_chat.id) != str(chat_id):
@@ -334,7 +342,7 @@ def fix_telegram_commands() -> Callable[..., Any]:
                         msg += (
                             f"\n*Estadísticas de Trading:*\n"
                             f"Trades: {profit_stats.get('trade_count', 0)}\n"
-                            f"Win Rate: {profit_stats.get('win_rate', 0):.1f}%\n"
+                            f"Win Rate: {profit_stats.get('win_rate', 0) * 100:.1f}%\n"
                             f"Profit Promedio: {profit_stats.get('avg_profit', 0):.1f}%\n"
                             f"Tiempo de Retención: {profit_stats.get('avg_hold_time', 0):.1f}h\n"
                         )
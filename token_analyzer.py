@@ -1,21 +1,75 @@
 import asyncio
 import logging
+import db
 from config import Config
+from candle_store import CandleStore
+from indicators import IndicatorEngine
 
 logger = logging.getLogger("token_analyzer")
 
 class TokenAnalyzer:
     def __init__(self, dexscreener_client=None):
         self.dexscreener_client = dexscreener_client
+        # Historial de velas por token alimentado por snapshots de mercado y trades observados
+        self.candles = CandleStore(max_tokens=int(Config.get("CANDLE_STORE_MAX_TOKENS", 1000)))
+        # Indicadores técnicos de todos los tokens vigilados, calculados en bloque cada tick
+        self.indicators = IndicatorEngine(window=int(Config.get("INDICATOR_WINDOW", 60)))
+        self.indicator_interval = float(Config.get("INDICATOR_TICK_SECONDS", 60))
+        self.indicator_task = None
+        self.latest_indicators = {}
 
     async def update_price_data(self, token: str, current_price: float = None, current_volume: float = None, market_data: dict = None):
         try:
-            if self.dexscreener_client:
-                token_data = await self.dexscreener_client.fetch_token_data(token)
-                if token_data:
-                    return token_data
+            if market_data is None and self.dexscreener_client:
+                market_data = await self.dexscreener_client.fetch_token_data(token)
+            if market_data is None and current_price is not None:
+                market_data = {"price": current_price, "volume": current_volume or 0}
+            if market_data:
+                self.candles.record_snapshot(token, market_data)
+                self.indicators.observe_price(token, market_data.get("price") or 0)
+                return market_data
         except Exception as e:
             logger.error(f"Error actualizando datos de precio para {token}: {e}")
         return {}
 
-    # Otros métodos de análisis técnico pueden ir aquí
+    def record_trade(self, token: str, amount_usd: float, tx_type: str, timestamp: float = None):
+        """Registra un trade observado en el historial de velas del token."""
+        self.candles.record_trade(token, amount_usd, tx_type, timestamp)
+        self.indicators.observe_volume(token, amount_usd)
+
+    def get_volume_features(self, token: str) -> dict:
+        """
+        Features de volumen calculadas sobre el historial local (sin red ni BD):
+        volume_acceleration, recent_volume_growth, trades_1h, buy_ratio_1h.
+        """
+        return self.candles.get_features(token)
+
+    def get_indicators(self, token: str) -> dict:
+        """Indicadores del último tick para el token (vacío si aún no hay muestras suficientes)."""
+        return self.latest_indicators.get(token, {})
+
+    def start(self):
+        """Inicia el cálculo periódico de indicadores (requiere un bucle en marcha)."""
+        if self.indicator_task is None:
+            self.indicator_task = asyncio.create_task(self._indicator_loop())
+
+    async def _indicator_loop(self):
+        while True:
+            await asyncio.sleep(self.indicator_interval)
+            await self.run_indicator_tick()
+
+    async def run_indicator_tick(self):
+        """Calcula los indicadores de todos los tokens y los guarda en un solo INSERT."""
+        try:
+            results = self.indicators.tick()
+            self.latest_indicators = {r["token"]: r for r in results}
+            if results:
+                await asyncio.to_thread(db.save_token_analysis_batch, results)
+                logger.debug(f"Indicadores guardados para {len(results)} tokens")
+        except Exception as e:
+            logger.error(f"Error calculando indicadores técnicos: {e}")
+
+    async def close(self):
+        if self.indicator_task is not None:
+            self.indicator_task.cancel()
+            self.indicator_task = None
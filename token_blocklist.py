@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# token_blocklist.py - Caché negativa de tokens (sin pares, nativos, stables) respaldada por failed_tokens
+
+import time
+import asyncio
+import logging
+import db
+from config import Config
+
+logger = logging.getLogger("token_blocklist")
+
+# Tokens que nunca generan señales: SOL nativo/envuelto y stablecoins
+PERMANENT_TOKENS = {
+    "native": "token nativo",
+    "So11111111111111111111111111111111111111112": "SOL envuelto",
+    "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v": "stablecoin (USDC)",
+    "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB": "stablecoin (USDT)",
+}
+# Tokens adicionales vía configuración (lista separada por comas)
+PERMANENT_TOKENS.update({
+    token.strip(): "bloqueado por configuración"
+    for token in Config.BLOCKED_TOKENS.split(",") if token.strip()
+})
+
+class TokenBlocklist:
+    """
+    Conjunto en memoria de tokens que se rechazan sin hacer ninguna llamada de red.
+
+    - Los bloqueos permanentes (nativos, stables, configuración) no caducan.
+    - Los fallos de datos (sin pares, sin datos tras reintentos) se vuelven a
+      comprobar tras base_interval * 2^(fallos-1), con tope en max_interval.
+    El estado se carga de failed_tokens al arrancar; los cambios se acumulan
+    en memoria y se guardan fuera del bucle de eventos cada flush_interval
+    segundos, así que el camino de fetch nunca espera a la BD.
+    """
+
+    def __init__(self, base_interval=600, max_interval=86400, flush_interval=10):
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.flush_interval = flush_interval
+        self.blocked = set(PERMANENT_TOKENS)
+        self.entries = {}  # token -> (fail_count, next_check_at o None si es permanente)
+        self.pending_writes = {}  # token -> (reason, fail_count, next_check_at), o None para borrarlo
+        self.flush_task = None
+        self.stats = {"rejected": 0, "failures": 0, "rechecks": 0, "recovered": 0}
+
+    def load(self):
+        """Carga failed_tokens en memoria. Devuelve el número de tokens cargados."""
+        try:
+            rows = db.get_failed_tokens()
+        except Exception as e:
+            logger.error(f"Error cargando tokens fallidos: {e}")
+            return 0
+        for row in rows:
+            next_check_at = row["next_check_at"]
+            self.entries[row["token"]] = (
+                row["fail_count"] or 1,
+                float(next_check_at) if next_check_at is not None else None
+            )
+            self.blocked.add(row["token"])
+        logger.info(f"Cargados {len(rows)} tokens fallidos/bloqueados")
+        return len(rows)
+
+    def is_blocked(self, token, now=None):
+        """
+        Indica si el token debe rechazarse. Cuando vence su intervalo de
+        re-chequeo se deja pasar una vez; si vuelve a fallar, record_failure()
+        lo bloquea con un intervalo el doble de largo.
+        """
+        if token not in self.blocked:
+            return False
+        entry = self.entries.get(token)
+        if entry is not None and entry[1] is not None and (now or time.time()) >= entry[1]:
+            self.blocked.discard(token)
+            self.stats["rechecks"] += 1
+            return False
+        self.stats["rejected"] += 1
+        return True
+
+    def get_reason(self, token):
+        return PERMANENT_TOKENS.get(token, "token fallido")
+
+    def record_failure(self, token, reason):
+        """Registra un fallo de datos y programa el siguiente re-chequeo."""
+        fail_count = self.entries.get(token, (0, None))[0] + 1
+        interval = min(self.base_interval * 2 ** (fail_count - 1), self.max_interval)
+        next_check_at = time.time() + interval
+        self.entries[token] = (fail_count, next_check_at)
+        self.blocked.add(token)
+        self.stats["failures"] += 1
+        logger.info(f"Token {token} marcado como fallido ({reason}), re-chequeo en {interval/60:.0f} min")
+        self.pending_writes[token] = (reason, fail_count, next_check_at)
+
+    def record_success(self, token):
+        """Limpia el historial de fallos de un token que vuelve a tener datos."""
+        if self.entries.pop(token, None) is not None:
+            self.blocked.discard(token)
+            self.stats["recovered"] += 1
+            self.pending_writes[token] = None
+
+    def start(self):
+        """Inicia el guardado periódico en failed_tokens (requiere un bucle en marcha)."""
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    @staticmethod
+    def _write(writes):
+        """Aplica los cambios en failed_tokens; devuelve los que no se pudieron guardar."""
+        failed = {}
+        for token, write in writes.items():
+            if write is None:
+                saved = db.delete_failed_token(token)
+            else:
+                saved = db.save_failed_token(token, *write)
+            if not saved:
+                failed[token] = write
+        return failed
+
+    async def flush(self):
+        """Guarda en failed_tokens los cambios acumulados (fuera del bucle de eventos)."""
+        if not self.pending_writes:
+            return
+        writes, self.pending_writes = self.pending_writes, {}
+        try:
+            failed = await asyncio.to_thread(self._write, writes)
+        except Exception as e:
+            logger.error(f"Error guardando {len(writes)} tokens fallidos: {e}")
+            failed = writes
+        # Se reintentan en el siguiente ciclo salvo que ya haya un cambio más reciente
+        for token, write in failed.items():
+            self.pending_writes.setdefault(token, write)
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+
+    def get_stats(self):
+        return dict(self.stats, blocked=len(self.blocked), pending_writes=len(self.pending_writes))
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import math
 from collections import deque, defaultdict
 import db
+import settings_snapshot
 from config import Config
 
 logger = logging.getLogger("trader_profiler")
@@ -95,7 +96,7 @@ class TraderProfiler:
         })
         
         # Limitar el número de transacciones almacenadas
-        max_tx_history = int(Config.get("MAX_TX_HISTORY_PER_TOKEN", 10))
+        max_tx_history = settings_snapshot.get().max_tx_history_per_token
         if len(self.transaction_history[wallet]["tokens"][token]) > max_tx_history:
             self.transaction_history[wallet]["tokens"][token] = self.transaction_history[wallet]["tokens"][token][-max_tx_history:]
         
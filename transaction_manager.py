@@ -4,9 +4,11 @@ import time
 import logging
 import json
 import os
+from collections import OrderedDict
 from datetime import datetime
 from config import Config
 import db
+import settings_snapshot
 
 logger = logging.getLogger("transaction_manager")
 
@@ -37,12 +39,16 @@ class TransactionManager:
         self.source_timeout = int(Config.get("SOURCE_TIMEOUT", "300"))
         self.running = False
         self.tasks = []
+        self.signal_tasks = set()  # Evaluaciones de signal_logic en curso
         self.health_check_task = None
 
         self.processed_tx_cache = {}
         self.cache_cleanup_time = 0
         self.cache_ttl = 3600
         self.processed_tx_lock = asyncio.Lock()
+        # Eventos con firma que la BD no pudo deduplicar (journal local o error)
+        self.unconfirmed_events = OrderedDict()
+        self.max_unconfirmed_events = 50000
         
         # Contadores y estadísticas de transacciones (incluye nuevo campo by_message_type)
         self.tx_counts = {
@@ -152,7 +158,7 @@ class TransactionManager:
             except asyncio.CancelledError:
                 pass
             
-        for task in self.tasks:
+        for task in self.tasks + list(self.signal_tasks):
             task.cancel()
             try:
                 await task
@@ -236,6 +242,7 @@ class TransactionManager:
                     "token": tx_data.get("token", ""),
                     "type": tx_data.get("txType", "").upper(),
                     "amount_usd": float(tx_data.get("amountUsd", 0)),
+                    "signature": tx_data.get("tx_hash") or tx_data.get("signature", ""),
                     "timestamp": time.time(),
                     "source": "cielo"
                 }
@@ -302,39 +309,47 @@ class TransactionManager:
         """
         try:
             logger.debug(f"Procesando tx: {json.dumps(tx_data)}")
-            min_usd = float(Config.get("MIN_TRANSACTION_USD", "200"))
+            min_usd = settings_snapshot.get().min_transaction_usd
             if tx_data.get("amount_usd", 0) < min_usd:
                 logger.debug(f"Transacción ignorada: monto ${tx_data.get('amount_usd', 0):.2f} < ${min_usd}")
                 self.tx_counts["filtered_out"] += 1
                 return
             
-            is_duplicate = await self.is_duplicate_transaction(tx_data)
-            if is_duplicate:
-                logger.debug(f"Transacción duplicada ignorada: {tx_data['wallet']} - {tx_data['token']}")
-                self.tx_counts["duplicates"] += 1
-                return
+            # Con firma on-chain la deduplicación la hace la BD (índice único);
+            # sólo las transacciones sin firma usan la caché en memoria
+            if not tx_data.get("signature"):
+                is_duplicate = await self.is_duplicate_transaction(tx_data)
+                if is_duplicate:
+                    logger.debug(f"Transacción duplicada ignorada: {tx_data['wallet']} - {tx_data['token']}")
+                    self.tx_counts["duplicates"] += 1
+                    return
             
             try:
-                db.save_transaction(tx_data)
-                logger.info(f"Transacción guardada en BD: {tx_data['wallet']} {tx_data['type']} {tx_data['token']} ${tx_data['amount_usd']:.2f}")
+                inserted = db.save_transaction(tx_data)
             except Exception as e:
                 logger.error(f"❌ Error guardando transacción en BD: {e}", exc_info=True)
-            
-            if self.signal_logic:
-                try:
-                    logger.info("Enviando transacción a signal_logic...")
-                    self.signal_logic.process_transaction(tx_data)
-                    logger.info("Transacción procesada por signal_logic")
-                except Exception as e:
-                    logger.error(f"❌ Error en signal_logic.process_transaction: {e}", exc_info=True)
+                inserted = None
+            if inserted is False:
+                logger.debug(f"Transacción duplicada ignorada (evento ya registrado): {tx_data['signature']}")
+                self.tx_counts["duplicates"] += 1
+                return
+            if inserted is not True and tx_data.get("signature") and self._seen_unconfirmed(tx_data):
+                # Reenvío de un evento que la BD aún no ha podido deduplicar
+                logger.debug(f"Transacción duplicada ignorada (pendiente de confirmar en BD): {tx_data['signature']}")
+                self.tx_counts["duplicates"] += 1
+                return
+            if inserted is True:
+                logger.info(f"Transacción guardada en BD: {tx_data['wallet']} {tx_data['type']} {tx_data['token']} ${tx_data['amount_usd']:.2f}")
+            elif inserted == db.TX_SPILLED:
+                logger.info(f"Transacción guardada en journal local: {tx_data['wallet']} {tx_data['type']} {tx_data['token']} ${tx_data['amount_usd']:.2f}")
             
             if self.scoring_system:
                 try:
-                    logger.info(f"Actualizando score para {tx_data['wallet']}...")
-                    self.scoring_system.update_score_on_trade(tx_data["wallet"], tx_data)
-                    logger.info(f"Score actualizado para {tx_data['wallet']}")
+                    # Se puntúa en el siguiente micro-lote junto con el resto de trades recibidos
+                    self.scoring_system.submit_trade(tx_data["wallet"], tx_data)
+                    logger.debug(f"Trade de {tx_data['wallet']} encolado para scoring")
                 except Exception as e:
-                    logger.error(f"❌ Error en scoring_system.update_score_on_trade: {e}", exc_info=True)
+                    logger.error(f"❌ Error en scoring_system.submit_trade: {e}", exc_info=True)
             
             if self.wallet_manager:
                 try:
@@ -349,15 +364,47 @@ class TransactionManager:
                 except Exception as e:
                     logger.error(f"❌ Error en wallet_manager.register_transaction: {e}", exc_info=True)
             
+            # signal_logic consulta DexScreener (límite de tasa y reintentos): se
+            # lanza aparte para que el scoring y el registro de cada trade no
+            # esperen a la red y se hagan en orden de llegada
+            if self.signal_logic:
+                task = asyncio.create_task(self._run_signal_logic(tx_data))
+                self.signal_tasks.add(task)
+                task.add_done_callback(self.signal_tasks.discard)
+            
             self.tx_counts["processed"] += 1
             logger.info(f"✅ Transacción procesada exitosamente: {tx_data['wallet']} {tx_data['type']} {tx_data['token']} ${tx_data['amount_usd']:.2f}")
         except Exception as e:
             logger.error(f"❌ Error en process_transaction: {e}", exc_info=True)
             self.tx_counts["errors"] += 1
 
+    async def _run_signal_logic(self, tx_data):
+        try:
+            logger.info("Enviando transacción a signal_logic...")
+            await self.signal_logic.process_transaction(tx_data)
+            logger.info("Transacción procesada por signal_logic")
+        except Exception as e:
+            logger.error(f"❌ Error en signal_logic.process_transaction: {e}", exc_info=True)
+
+    def _seen_unconfirmed(self, tx_data):
+        """
+        Indica si un evento con firma que no se pudo deduplicar en la BD ya se
+        había recibido, y lo recuerda si no. Conserva los últimos
+        max_unconfirmed_events eventos.
+        """
+        key = (tx_data["signature"], tx_data["wallet"], tx_data["token"], tx_data["type"])
+        if key in self.unconfirmed_events:
+            return True
+        self.unconfirmed_events[key] = None
+        if len(self.unconfirmed_events) > self.max_unconfirmed_events:
+            self.unconfirmed_events.popitem(last=False)
+        return False
+
     async def is_duplicate_transaction(self, tx_data):
         """
         Verifica si una transacción ya ha sido procesada para evitar duplicados.
+        Sólo se usa para transacciones sin firma on-chain; las demás se
+        deduplican en la BD mediante el índice único (signature, wallet, token, tx_type).
         
         Args:
             tx_data: Datos de la transacción.
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# trending_poller.py - Sondeo periódico de tokens en tendencia con índice en memoria respaldado por trending_tokens
+
+import time
+import asyncio
+import logging
+import db
+
+logger = logging.getLogger("trending_poller")
+
+class TrendingPoller:
+    """
+    Mantiene el conjunto de tokens en tendencia sin consultas en el camino caliente.
+
+    - Cada `interval` segundos consulta DexScreener y extiende la caducidad
+      (última vez visto + ttl) de los tokens que siguen en tendencia.
+    - Sólo se insertan en trending_tokens los cambios: tokens que entran en
+      tendencia y, para los que siguen, una fila nueva cada ttl/2 para que
+      la tabla (y load() tras un reinicio) refleje la misma ventana.
+    - Todas las filas de un sondeo se guardan en un único INSERT.
+    """
+
+    def __init__(self, dexscreener_client, interval=300, ttl=6 * 3600, limit=50):
+        """
+        Args:
+            dexscreener_client: Cliente de DexScreener (search_trending_tokens)
+            interval: Segundos entre sondeos
+            ttl: Segundos que un token se considera en tendencia desde la última vez visto
+            limit: Tokens por sondeo
+        """
+        self.dexscreener_client = dexscreener_client
+        self.interval = interval
+        self.ttl = ttl
+        self.limit = limit
+        self.expires = {}  # token -> epoch de caducidad
+        self.persisted_at = {}  # token -> epoch de la última fila guardada
+        self.poll_task = None
+        self.stats = {"polls": 0, "errors": 0, "entered": 0, "rows_saved": 0}
+
+    def is_trending(self, token, now=None):
+        """Consulta O(1) para el camino caliente."""
+        return self.expires.get(token, 0) > (now or time.time())
+
+    def __len__(self):
+        return sum(1 for expiry in self.expires.values() if expiry > time.time())
+
+    def load(self):
+        """Carga los tokens en tendencia dentro de la ventana ttl. Devuelve el número cargado."""
+        try:
+            rows = db.get_recent_trending_tokens(self.ttl / 3600)
+        except Exception as e:
+            logger.error(f"Error cargando tokens en tendencia: {e}")
+            return 0
+        for row in rows:
+            seen_at = float(row["last_seen"])
+            self.expires[row["token"]] = max(self.expires.get(row["token"], 0), seen_at + self.ttl)
+            self.persisted_at[row["token"]] = seen_at
+        logger.info(f"Cargados {len(rows)} tokens en tendencia")
+        return len(rows)
+
+    def apply(self, tokens, now=None):
+        """
+        Actualiza el índice con el resultado de un sondeo (ordenado por relevancia).
+
+        Returns:
+            list: Filas a guardar (token, platforms, discovery_potential)
+        """
+        now = now or time.time()
+        rows = []
+        total = len(tokens)
+        for rank, info in enumerate(tokens):
+            token = info["address"]
+            entered = self.expires.get(token, 0) <= now
+            self.expires[token] = now + self.ttl
+            if entered:
+                self.stats["entered"] += 1
+            if entered or now - self.persisted_at.get(token, 0) >= self.ttl / 2:
+                self.persisted_at[token] = now
+                rows.append({
+                    "token": token,
+                    "platforms": [info.get("source", "dexscreener")],
+                    "discovery_potential": (total - rank) / total,
+                })
+
+        for token in [t for t, expiry in self.expires.items() if expiry <= now]:
+            del self.expires[token]
+            self.persisted_at.pop(token, None)
+        return rows
+
+    async def poll(self):
+        """Ejecuta un sondeo y guarda los cambios."""
+        try:
+            tokens = await self.dexscreener_client.search_trending_tokens(limit=self.limit)
+            self.stats["polls"] += 1
+            rows = self.apply(tokens)
+            if rows:
+                self.stats["rows_saved"] += await asyncio.to_thread(db.save_trending_tokens_batch, rows)
+                logger.debug(f"Trending: {len(rows)} cambios guardados, {len(self)} tokens activos")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error sondeando tokens en tendencia: {e}")
+
+    def start(self):
+        """Inicia el sondeo periódico (requiere un bucle en marcha)."""
+        if self.poll_task is None:
+            self.poll_task = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self):
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+            self.poll_task = None
+
+    def get_stats(self):
+        return dict(self.stats, trending=len(self))
@@ -103,7 +103,10 @@ class WalletManager:
         """
         try:
             # Obtener scores de la base de datos
-            db_scores = db.execute_cached_query("SELECT wallet, score FROM wallet_scores")
+            db_scores = db.execute_cached_query(
+                "SELECT wallet, score FROM wallet_scores",
+                query_class=db.QUERY_ANALYTICS
+            )
             if not db_scores:
                 return
             
@@ -376,6 +379,19 @@ class WalletManager:
         # Devolver copia para evitar modificaciones accidentales
         return dict(self.wallets[address])
     
+    def get_trader_name(self, address: str) -> Optional[str]:
+        """
+        Nombre del trader de una wallet (consulta en memoria, sin copiar).
+        
+        Args:
+            address: Dirección de la wallet
+            
+        Returns:
+            str: Nombre o None si la wallet no existe o no tiene nombre
+        """
+        info = self.wallets.get(address)
+        return info.get("name") or None if info else None
+    
     def get_wallets_by_category(self, category: str = None) -> List[str]:
         """
         Obtiene las wallets de una categoría o todas si no se especifica.
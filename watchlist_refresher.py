@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# watchlist_refresher.py - Refresco concurrente y priorizado de los tokens vigilados
+
+import time
+import math
+import heapq
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger("watchlist_refresher")
+
+class WatchlistRefresher:
+    """
+    Planificador de refrescos de datos de mercado para la watchlist.
+
+    - Cada token tiene su propio intervalo, más corto cuanto más actividad
+      reciente tiene (contador con decaimiento exponencial), entre
+      min_interval y max_interval.
+    - Los vencimientos llevan jitter para no concentrar peticiones.
+    - Como mucho max_concurrency refrescos a la vez.
+    - Antes de lanzar un refresco se espera a que el rate limiter compartido
+      tenga al menos `reserve` permisos libres, para no quitarle presupuesto
+      al procesamiento de transacciones en tiempo real.
+    - Los tokens sin actividad durante idle_ttl salen de la watchlist.
+    """
+
+    def __init__(self, refresh, on_data, rate_limiter=None, max_concurrency=8,
+                 min_interval=60, max_interval=600, jitter=0.2,
+                 activity_half_life=600, idle_ttl=3600, reserve=2):
+        """
+        Args:
+            refresh: Coroutine(token) que obtiene los datos de mercado
+            on_data: Coroutine(token, data) que procesa el resultado
+            rate_limiter: TokenBucket compartido de la API (opcional)
+            max_concurrency: Refrescos simultáneos máximos
+            min_interval: Intervalo para los tokens más activos (segundos)
+            max_interval: Intervalo para tokens sin actividad (segundos)
+            jitter: Fracción aleatoria (+/-) aplicada a cada intervalo
+            activity_half_life: Semivida del contador de actividad (segundos)
+            idle_ttl: Segundos sin actividad tras los que se deja de vigilar
+            reserve: Permisos del rate limiter que se dejan libres
+        """
+        self.refresh = refresh
+        self.on_data = on_data
+        self.rate_limiter = rate_limiter
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.decay_rate = math.log(2) / activity_half_life
+        self.idle_ttl = idle_ttl
+        self.reserve = reserve
+
+        self.tokens = {}  # token -> {"activity", "last_activity", "due"}
+        self.schedule = []  # heap (due, token); entradas obsoletas se descartan al sacarlas
+        self.wakeup = asyncio.Event()
+        self.in_progress = set()
+        self.stats = {"refreshes": 0, "errors": 0, "budget_waits": 0, "expired": 0}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __contains__(self, token):
+        return token in self.tokens
+
+    def record_activity(self, token, weight=1.0, now=None):
+        """Registra actividad en un token (añadiéndolo si no estaba) y adelanta su refresco si procede."""
+        now = now or time.time()
+        state = self.tokens.get(token)
+        if state is None:
+            state = self.tokens[token] = {"activity": 0.0, "last_activity": now, "due": None}
+        state["activity"] = self._decayed_activity(state, now) + weight
+        state["last_activity"] = now
+        due = now + self._interval(state["activity"])
+        if state["due"] is None or due < state["due"]:
+            self._schedule(token, state, due)
+
+    def _decayed_activity(self, state, now):
+        return state["activity"] * math.exp(-self.decay_rate * (now - state["last_activity"]))
+
+    def _interval(self, activity):
+        interval = max(self.min_interval, self.max_interval / (1 + activity))
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, token, state, due):
+        state["due"] = due
+        heapq.heappush(self.schedule, (due, token))
+        self.wakeup.set()
+
+    async def _wait_for_budget(self):
+        if self.rate_limiter is None:
+            return
+        while True:
+            available = self.rate_limiter.available()
+            if available >= self.reserve:
+                return
+            self.stats["budget_waits"] += 1
+            await asyncio.sleep((self.reserve - available) / self.rate_limiter.rate)
+
+    async def _refresh_token(self, token):
+        try:
+            data = await self.refresh(token)
+            self.stats["refreshes"] += 1
+            await self.on_data(token, data)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error refrescando {token}: {e}")
+        finally:
+            self.in_progress.discard(token)
+            self.semaphore.release()
+            state = self.tokens.get(token)
+            if state is not None:
+                now = time.time()
+                self._schedule(token, state, now + self._interval(self._decayed_activity(state, now)))
+
+    async def run(self):
+        """Bucle principal: lanza los refrescos vencidos respetando concurrencia y presupuesto."""
+        logger.info("Iniciando refresco de watchlist")
+        while True:
+            try:
+                now = time.time()
+                if not self.schedule or self.schedule[0][0] > now:
+                    timeout = self.schedule[0][0] - now if self.schedule else None
+                    self.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                due, token = heapq.heappop(self.schedule)
+                state = self.tokens.get(token)
+                if state is None or state["due"] != due or token in self.in_progress:
+                    continue
+                if now - state["last_activity"] > self.idle_ttl:
+                    del self.tokens[token]
+                    self.stats["expired"] += 1
+                    logger.debug(f"Token {token} sin actividad, eliminado de la watchlist")
+                    continue
+
+                await self.semaphore.acquire()
+                await self._wait_for_budget()
+                state["due"] = None
+                self.in_progress.add(token)
+                asyncio.create_task(self._refresh_token(token))
+            except Exception as e:
+                logger.error(f"Error en refresco de watchlist: {e}", exc_info=True)
+                await asyncio.sleep(5)
+
+    def get_stats(self):
+        return dict(self.stats, watched=len(self.tokens), in_progress=len(self.in_progress), scheduled=len(self.schedule))